@@ -0,0 +1,124 @@
+# benchmarks/facilities_benchmark.py
+"""
+Query count and latency of /api/facilities with 10k facilities, comparing the
+previous per-row coordinate lookup with the columnar ST_X/ST_Y fetch.
+
+Both versions are requested through the Flask test client, so routing,
+session handling and JSON encoding are counted on each side. Background
+threads (alert poller, GPS flush, index warmup) are switched off so their
+queries don't land in the measured window.
+
+Run from the project root against a scratch database:
+    python -m benchmarks.facilities_benchmark
+The seeded rows are removed again when the run finishes.
+"""
+import os
+import statistics
+import time
+from flask import jsonify
+from sqlalchemy import event, func, insert
+
+os.environ['BACKGROUND_TASKS'] = '0'
+
+from server.server import app, db, EmergencyFacility, login_required
+
+FACILITY_COUNT = 10000
+RUNS = 5
+NAME_PREFIX = 'benchmark-facility-'
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+@login_required(role=['command', 'admin', 'field'])
+def legacy_facilities():
+    """The per-row implementation /api/facilities used before the columnar fetch"""
+    result = []
+    for facility in EmergencyFacility.query.all():
+        location_data = None
+        if facility.location:
+            try:
+                location_data = {
+                    'lat': float(facility.location.data.split('(')[1].split(')')[0].split(' ')[1]),
+                    'lng': float(facility.location.data.split('(')[1].split(')')[0].split(' ')[0])
+                }
+            except (AttributeError, IndexError, ValueError):
+                location_data = {
+                    'lat': db.session.scalar(func.ST_Y(facility.location)),
+                    'lng': db.session.scalar(func.ST_X(facility.location))
+                }
+        result.append({
+            'id': facility.id,
+            'name': facility.name,
+            'type': facility.type,
+            'location': location_data,
+            'status': facility.status,
+            'contact_info': facility.contact_info,
+            'capacity_overall': facility.capacity_overall,
+            'description': facility.description
+        })
+    return jsonify({'facilities': result, 'total': len(result)})
+
+
+app.add_url_rule('/benchmark/legacy-facilities', 'benchmark_legacy_facilities', legacy_facilities)
+
+
+def seed():
+    rows = [{
+        'name': f'{NAME_PREFIX}{i}',
+        'type': 'shelter',
+        'status': 'operational',
+        'capacity_overall': 100,
+        'location': f'SRID=4326;POINT({80.0 + (i % 100) * 0.005} {12.9 + (i // 100) * 0.005})'
+    } for i in range(FACILITY_COUNT)]
+    db.session.execute(insert(EmergencyFacility), rows)
+    db.session.commit()
+
+
+def cleanup():
+    EmergencyFacility.query.filter(EmergencyFacility.name.like(f'{NAME_PREFIX}%')).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def measure(label, call):
+    timings = []
+    queries = 0
+    for _ in range(RUNS):
+        db.session.expunge_all()
+        with QueryCounter(db.engine) as counter:
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+        queries = counter.count
+    print(f"{label:<10} queries={queries:<6} median={statistics.median(timings) * 1000:.1f} ms")
+
+
+def main():
+    with app.app_context():
+        seed()
+        try:
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['username'] = 'admin'
+                sess['role'] = 'admin'
+            measure('before', lambda: client.get('/benchmark/legacy-facilities'))
+            measure('after', lambda: client.get('/api/facilities'))
+        finally:
+            cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,20 @@
 # main.py
-from server.server import app, socketio
+import os
+import subprocess
+import sys
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    port = int(os.getenv('PORT', '5001'))
+    workers = int(os.getenv('WORKERS', '1'))
+    if workers > 1 and not os.getenv('RAPID_WORKER'):
+        # Multi-worker mode: one process per port (PORT, PORT+1, ...) behind a
+        # load balancer with sticky sessions, sharing SOCKETIO_MESSAGE_QUEUE
+        env = dict(os.environ, RAPID_WORKER='1', FLASK_DEBUG='0')
+        env.setdefault('SOCKETIO_MESSAGE_QUEUE', 'filesystem://')
+        processes = [subprocess.Popen([sys.executable, __file__], env=dict(env, PORT=str(port + n)))
+                     for n in range(workers)]
+        for process in processes:
+            process.wait()
+    else:
+        from server.server import app, socketio
+        socketio.run(app, host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG', '1') == '1')
@@ -2,97 +2,236 @@
 from datetime import datetime
 import time
 import threading
-import requests
-from flask import current_app, jsonify
-from flask_socketio import emit
+from collections import defaultdict
+from flask import current_app, session
+from flask_socketio import emit, join_room, leave_room
+from sqlalchemy import func
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from .weather import provider_from_env, RainfallClient, CachedReading, CircuitBreaker
+from .rainfall_store import store_readings
+from .changes import change_tracker, row_change
+from .risk_engine import RiskEngine, recompute_zone_risk
+from .scaling import AlwaysLeader
+from . import metrics
+
+FORECAST_ACTIONS = {
+    'extreme': 'Evacuate immediately from flood-prone areas',
+    'high': 'Prepare evacuation plans and monitor conditions',
+    'moderate': 'Monitor weather conditions closely',
+    'low': 'Normal monitoring'
+}
 
 env_path = Path(__file__).resolve().parents[1] / '.env'
 load_dotenv(dotenv_path=env_path)
 
+ALERTS_NAMESPACE = '/alerts'
+ROLES = ('admin', 'command', 'field')
+# Roles that get every zone alert as a digest; field devices only get their zones' alerts
+DIGEST_ROLES = ('admin', 'command')
+
+class AlertFanout:
+    """
+    Delivers alerts to the rooms they concern: "zone:<id>" for clients
+    watching a zone (field devices join the zones they are in) and
+    "role:<role>" for signed-in users. An alert identical to one
+    sent within `window` seconds (same zone and severity) is dropped, and all
+    the zone alerts a room gets in one cycle go out as a single event.
+    """
+    def __init__(self, socketio, window=1800):
+        self.socketio = socketio
+        self.window = window
+        self.sent = {}  # (zone_id, severity) -> time last sent
+        self.lock = threading.Lock()
+
+    def _fresh(self, alerts):
+        now = time.monotonic()
+        with self.lock:
+            self.sent = {key: sent for key, sent in self.sent.items() if now - sent < self.window}
+            fresh = []
+            for alert in alerts:
+                key = (alert.get('zone_id'), alert['severity'])
+                if key not in self.sent:
+                    self.sent[key] = now
+                    fresh.append(alert)
+        return fresh
+
+    def send_city_alert(self, alert, roles=ROLES):
+        """City-wide alert for every signed-in role"""
+        if not self._fresh([alert]):
+            return False
+        for role in roles:
+            metrics.emit(self.socketio, 'alert', alert, namespace=ALERTS_NAMESPACE, to=f'role:{role}')
+        return True
+
+    def send_zone_alerts(self, alerts, roles=DIGEST_ROLES):
+        """
+        Zone alerts for the rooms of the zones they concern, plus a digest of all
+        of them for the command/admin role rooms. A client in both kinds of room
+        gets an alert twice; AlertBar drops the repeat.
+        """
+        alerts = self._fresh(alerts)
+        batches = defaultdict(list)
+        for alert in alerts:
+            batches[f"zone:{alert['zone_id']}"].append(alert)
+            for role in roles:
+                batches[f'role:{role}'].append(alert)
+        for room, room_alerts in batches.items():
+            metrics.emit(self.socketio, 'zone_alerts', room_alerts, namespace=ALERTS_NAMESPACE, to=room)
+        return alerts
+
 class AlertService:
-    def __init__(self, app, socketio):
+    def __init__(self, app, socketio, provider=None, election=None):
         self.app = app
         self.socketio = socketio
         self.thread = None
         self.running = False
-        self.latest_rainfall = 0  # Store latest rainfall data
-        self.last_updated = None
+        self.poll_interval = 300  # Seconds between ingestion cycles
+        # Pluggable rainfall source (see server/weather.py); None when no API key is configured
+        self.provider = provider or provider_from_env()
+        # One event loop and HTTP session for every fetch, kept across poll cycles
+        self.rainfall_client = RainfallClient(self.provider) if self.provider else None
+        self.city_location = (13.0827, 80.2707)  # Chennai coordinates
+        # Shared by every call to the provider; the city reading is served stale-while-revalidate
+        self.breaker = CircuitBreaker(
+            threshold=int(os.getenv('WEATHER_FAILURE_THRESHOLD', '3')),
+            backoff=int(os.getenv('WEATHER_BACKOFF', '30')),
+            max_backoff=int(os.getenv('WEATHER_MAX_BACKOFF', '900'))
+        )
+        self.rainfall = CachedReading(self.fetch_city_rainfall, max_age=600, breaker=self.breaker)
+        self.zone_rainfall = {}  # zone id -> mm/h from the last ingestion cycle
+        self.risk_engine = RiskEngine.from_env()
+        self.fanout = AlertFanout(socketio, window=int(os.getenv('ALERT_DEDUP_WINDOW', '1800')))
+        # With several workers only the elected one polls (see server/scaling.py)
+        self.election = election or AlwaysLeader()
+
+    def fetch_city_rainfall(self):
+        """City-wide rainfall straight from the configured provider (raises on failure)"""
+        if not self.provider:
+            raise RuntimeError("No rainfall provider configured")
+        rainfall = self.rainfall_client.fetch({'city': self.city_location})['city']
+        if rainfall is None:
+            raise RuntimeError(f"{self.provider.name} returned no reading")
+        return rainfall
 
     def get_current_rainfall(self):
-        """Fetch rainfall data from OpenWeatherMap"""
+        """Refresh the city reading; None when the provider failed or its circuit is open"""
         with self.app.app_context():
-            try:
-                lat, lon = 13.0827, 80.2707  # Chennai coordinates
-                api_key = os.getenv('OPENWEATHER_API_KEY')
-                if not api_key:
-                    current_app.logger.warning("No OpenWeatherMap API key configured")
-                    return 0
-                    
-                url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                data = response.json()
-                
-                rainfall = data.get("rain", {}).get("1h", 0)
-                
-                # Store the latest data
-                self.latest_rainfall = rainfall
-                self.last_updated = datetime.now()
-                
-                return rainfall
-            except Exception as e:
-                current_app.logger.error(f"Rainfall API error: {str(e)}")
-                return 0
+            rainfall = self.rainfall.refresh()
+            if rainfall is None and self.rainfall.error:
+                current_app.logger.error(f"Rainfall API error: {self.rainfall.error} (circuit {self.breaker.state})")
+            return rainfall
+
+    def zone_locations(self):
+        """A point inside every flood zone (its centroid when that falls inside the polygon)"""
+        from .server import db, FloodRiskZone
+        point = func.ST_PointOnSurface(FloodRiskZone.geometry)
+        rows = db.session.query(FloodRiskZone.id, func.ST_Y(point), func.ST_X(point)).all()
+        return {zone_id: (lat, lon) for zone_id, lat, lon in rows}
+
+    def ingest_zone_rainfall(self):
+        """
+        Fetch rainfall for every flood zone concurrently and store the readings,
+        together with their 1h/6h/24h rollups, in one batch.
+        Returns {zone_id: mm/h} for the zones read.
+        """
+        from .server import db
+        if not self.provider:
+            return {}
+        locations = self.zone_locations()
+        if not locations or not self.breaker.allow():
+            return {}
+
+        readings = self.rainfall_client.fetch(locations)
+        readings = {zone_id: rainfall for zone_id, rainfall in readings.items() if rainfall is not None}
+        if readings:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if readings:
+            store_readings(db.session, readings, datetime.utcnow(), self.provider.name, self.poll_interval)
+            change_tracker.mark_changed(db.session, 'rainfall_readings', 'rainfall_rollups')
+            db.session.commit()
+
+        self.zone_rainfall = readings
+        current_app.logger.info(f"Stored rainfall for {len(readings)}/{len(locations)} zones")
+        return readings
+
+    def recompute_zone_risk(self):
+        """Reclassify all zones from the latest readings and rollups; returns the level changes"""
+        from .server import db
+        changes = recompute_zone_risk(db.session, self.risk_engine, self.zone_rainfall)
+        if changes:
+            change_tracker.record(db.session, *(
+                row_change('flood_risk_zones', zone_id, 'updated', {'risk_level': new_level})
+                for zone_id, _, new_level in changes
+            ))
+            db.session.commit()
+            current_app.logger.info(f"Risk level changed for {len(changes)} zones")
+        return changes
+
+    def zone_alerts(self, risk_changes):
+        """Alerts for zones that escalated to high or extreme risk"""
+        from .server import db, FloodRiskZone
+        escalated = {zone_id: level for zone_id, _, level in risk_changes if level in ('high', 'extreme')}
+        if not escalated:
+            return []
+        names = dict(db.session.query(FloodRiskZone.id, FloodRiskZone.zone_name)
+                     .filter(FloodRiskZone.id.in_(escalated)).all())
+        timestamp = datetime.now().isoformat()
+        return [{
+            'type': 'zone_flood_warning',
+            'zone_id': zone_id,
+            'zone_name': names.get(zone_id),
+            'message': f"{names.get(zone_id, f'Zone {zone_id}')} is now at {level} flood risk",
+            'severity': level,
+            'rain_last_hour': self.zone_rainfall.get(zone_id),
+            'timestamp': timestamp,
+            'recommendation': FORECAST_ACTIONS[level]
+        } for zone_id, level in escalated.items()]
 
     def get_forecast_data(self, rainfall):
         """Generate forecast data based on current rainfall"""
-        if rainfall > 20:
-            return {
-                'risk': 'extreme',
-                'action': 'Evacuate immediately from flood-prone areas'
-            }
-        elif rainfall > 10:
-            return {
-                'risk': 'high', 
-                'action': 'Prepare evacuation plans and monitor conditions'
-            }
-        elif rainfall > 5:
-            return {
-                'risk': 'moderate',
-                'action': 'Monitor weather conditions closely'
-            }
-        else:
-            return {
-                'risk': 'low',
-                'action': 'Normal monitoring'
-            }
+        risk = self.risk_engine.classify_one(rainfall)
+        return {
+            'risk': risk,
+            'action': FORECAST_ACTIONS[risk]
+        }
 
     def get_rainfall_data(self):
-        """Get current rainfall data for API endpoint"""
-        # If data is older than 10 minutes, fetch fresh data
-        if (not self.last_updated or 
-            (datetime.now() - self.last_updated).total_seconds() > 600):
-            self.get_current_rainfall()
-        
+        """
+        Rainfall data for the API endpoint. Answers from the cached reading
+        straight away; a stale reading is refreshed in the background.
+        """
+        reading = self.rainfall.get()
+        rainfall = reading['value']
         return {
-            'rain_last_hour': self.latest_rainfall,
-            'forecast': self.get_forecast_data(self.latest_rainfall),
-            'last_updated': self.last_updated.isoformat() if self.last_updated else None
+            'rain_last_hour': rainfall,
+            'forecast': self.get_forecast_data(rainfall) if rainfall is not None else None,
+            'last_updated': reading['last_updated'],
+            'stale': reading['stale'],
+            'provider_error': reading['error'],
+            'circuit': reading['circuit'],
+            'retry_at': reading['retry_at']
         }
 
     def run(self):
         """Main monitoring loop"""
         self.running = True
         while self.running:
+            leader = self.election.acquire()
+            metrics.ALERT_LEADER.set(1 if leader else 0)
+            if not leader:
+                time.sleep(self.election.retry_interval)
+                continue
             with self.app.app_context():
+                started = time.perf_counter()
                 try:
                     rainfall = self.get_current_rainfall()
                     current_app.logger.info(f"Current rainfall: {rainfall}mm/h")
                         
-                    if rainfall > 10:
+                    if rainfall is not None and rainfall > 10:
                         alert_msg = {
                             'type': 'flood_warning',
                             'message': f'Heavy rainfall detected: {rainfall}mm/h',
@@ -100,11 +239,21 @@ class AlertService:
                             'timestamp': datetime.now().isoformat(),
                             'recommendation': 'Prepare evacuation plans' if rainfall < 20 else 'Evacuate immediately'
                         }
-                        self.socketio.emit('alert', alert_msg, namespace='/alerts')
+                        self.fanout.send_city_alert(alert_msg)
+
+                    readings = self.ingest_zone_rainfall()
+                    risk_changes = self.recompute_zone_risk()
+                    self.fanout.send_zone_alerts(self.zone_alerts(risk_changes))
+
+                    metrics.ALERT_CYCLES.inc(outcome='ok')
+                    metrics.ALERT_CYCLE_SECONDS.observe(time.perf_counter() - started)
+                    metrics.ALERT_ZONES_READ.set(len(readings))
+                    metrics.ALERT_LAST_SUCCESS.set(time.time())
                         
-                    time.sleep(300)  # Check every 5 minutes
+                    time.sleep(self.poll_interval)  # Check every 5 minutes
                 except Exception as e:
                     current_app.logger.error(f"Alert service error: {str(e)}")
+                    metrics.ALERT_CYCLES.inc(outcome='error')
                     time.sleep(60)  # Wait before retrying on error
 
     def start(self):
@@ -119,18 +268,22 @@ class AlertService:
     def stop(self):
         """Stop the alert service"""
         self.running = False
+        self.election.release()
+        if self.rainfall_client:
+            self.rainfall_client.close()
         if self.thread:
             self.thread.join(timeout=5)
 
 # Global alert service instance
 alert_service = None
 
-def init_alert_service(app, socketio):
-    """Initialize the alert service"""
+def init_alert_service(app, socketio, election=None, start=True):
+    """Initialize the alert service; start=False builds it without the polling thread"""
     global alert_service
     if alert_service is None:
-        alert_service = AlertService(app, socketio)
-        alert_service.start()
+        alert_service = AlertService(app, socketio, election=election)
+        if start:
+            alert_service.start()
 
 def register_socket_events(socketio):
     """Register socket events"""
@@ -142,3 +295,26 @@ def register_socket_events(socketio):
     def handle_disconnect():
         emit('status', {'message': 'Disconnected from alert service'})
 
+    @socketio.on('connect', namespace=ALERTS_NAMESPACE)
+    def handle_alerts_connect():
+        # Signed-in clients get the alerts meant for their role
+        role = session.get('role')
+        if role in ROLES:
+            join_room(f'role:{role}')
+        emit('status', {'message': 'Connected to alert service', 'role': role})
+
+    @socketio.on('subscribe_zones', namespace=ALERTS_NAMESPACE)
+    def handle_subscribe_zones(data):
+        """{"zones": [ids]}: zones in the client's viewport or assignment"""
+        zones = [zone for zone in (data or {}).get('zones', []) if isinstance(zone, int)]
+        for zone in zones:
+            join_room(f'zone:{zone}')
+        emit('subscribed', {'zones': zones})
+
+    @socketio.on('unsubscribe_zones', namespace=ALERTS_NAMESPACE)
+    def handle_unsubscribe_zones(data):
+        zones = [zone for zone in (data or {}).get('zones', []) if isinstance(zone, int)]
+        for zone in zones:
+            leave_room(f'zone:{zone}')
+        emit('unsubscribed', {'zones': zones})
+
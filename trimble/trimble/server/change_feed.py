@@ -0,0 +1,77 @@
+# server/change_feed.py
+from collections import defaultdict
+from flask import session
+from flask_socketio import emit, join_room, leave_room
+from . import metrics
+
+NAMESPACE = '/changes'
+
+# Tables published on the feed and the column linking their rows to a facility
+FEED_TABLES = {
+    'emergency_facilities': 'id',
+    'supply_items': 'facility_id',
+    'vehicles': 'home_facility_id',
+    'personnel': 'base_facility_id',
+    'response_actions': None
+}
+
+
+def rooms_for(change):
+    """
+    Rooms a delta is delivered to: its layer (e.g. "layer:vehicles") and, for
+    facility-owned rows, the owning facility (e.g. "facility:12").
+    """
+    rooms = [f"layer:{change['entity']}"]
+    facility_key = FEED_TABLES[change['entity']]
+    if facility_key:
+        facility_id = change['id'] if facility_key == 'id' else change['refs'].get(facility_key)
+        if facility_id is not None:
+            rooms.append(f"facility:{facility_id}")
+    return rooms
+
+
+def is_valid_room(room):
+    kind, _, key = str(room).partition(':')
+    if kind == 'layer':
+        return key in FEED_TABLES
+    return kind == 'facility' and key.isdigit()
+
+
+def register_change_feed(socketio, tracker):
+    """
+    Pushes committed row deltas to subscribed clients so pages can patch their
+    state instead of polling. Clients emit "subscribe" with
+    {"rooms": ["layer:vehicles", "facility:3"]} and receive "changes" events
+    holding a list of deltas (entity, id, op, fields, values).
+    """
+    @socketio.on('connect', namespace=NAMESPACE)
+    def handle_connect():
+        if 'username' not in session:
+            return False
+        emit('status', {'message': 'Connected to change feed'})
+
+    @socketio.on('subscribe', namespace=NAMESPACE)
+    def handle_subscribe(data):
+        rooms = [room for room in (data or {}).get('rooms', []) if is_valid_room(room)]
+        for room in rooms:
+            join_room(room)
+        emit('subscribed', {'rooms': rooms})
+
+    @socketio.on('unsubscribe', namespace=NAMESPACE)
+    def handle_unsubscribe(data):
+        rooms = [room for room in (data or {}).get('rooms', []) if is_valid_room(room)]
+        for room in rooms:
+            leave_room(room)
+        emit('unsubscribed', {'rooms': rooms})
+
+    @tracker.subscribe_rows
+    def publish(changes):
+        # One message per room per commit, however many rows it touched
+        batches = defaultdict(list)
+        for change in changes:
+            if change['entity'] not in FEED_TABLES:
+                continue
+            for room in rooms_for(change):
+                batches[room].append(change)
+        for room, deltas in batches.items():
+            metrics.emit(socketio, 'changes', deltas, namespace=NAMESPACE, to=room)
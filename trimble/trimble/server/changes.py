@@ -0,0 +1,245 @@
+# server/changes.py
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel carrying the tables each commit touched to the other processes
+NOTIFY_CHANNEL = 'rapid_changes'
+
+
+def _json_value(value):
+    """Plain JSON-friendly version of a column value (None for geometries and blobs)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return None
+
+
+def row_change(entity, record_id, op, values=None, refs=None):
+    """Delta in the shape published to row subscribers"""
+    values = {key: _json_value(value) for key, value in (values or {}).items()}
+    return {
+        'entity': entity,
+        'id': record_id,
+        'op': op,
+        'fields': sorted(values),
+        'values': values,
+        'refs': refs or {}
+    }
+
+
+def describe_change(obj, op):
+    """
+    Row-level delta of a flushed object: table, primary key, operation, the
+    changed columns with their new values, and the row's foreign keys (refs)
+    so listeners can route it without another query.
+    """
+    state = inspect(obj)
+    mapper = state.mapper
+    values = {}
+    refs = {}
+    for column in obj.__table__.columns:
+        key = mapper.get_property_by_column(column).key
+        if column.foreign_keys:
+            refs[column.name] = _json_value(state.attrs[key].loaded_value)
+        if op == 'updated' and not state.attrs[key].history.has_changes():
+            continue
+        if op == 'deleted' and not column.primary_key:
+            continue
+        values[column.name] = state.attrs[key].loaded_value
+    return row_change(obj.__table__.name, getattr(obj, 'id', None), op, values, refs)
+
+
+class ChangeTracker:
+    """
+    Keeps a version counter per table, bumped whenever a commit writes to it.
+    Caches key their entries on these versions, and callbacks registered with
+    subscribe() are told which tables each commit touched. Callbacks registered
+    with subscribe_rows() get the row-level deltas (see describe_change).
+
+    Versions live in process memory. enable_notifications() sends the changed
+    tables over Postgres NOTIFY inside each writing transaction and listens for
+    other processes' commits (other workers, CLI commands such as import-geodata),
+    so every process invalidates.
+    """
+
+    def __init__(self):
+        # Changes with every process start so versions from a previous run never match
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.versions = {}
+        self.subscribers = []
+        self.row_subscribers = []
+        self.lock = threading.Lock()
+        self.installed = False
+        self.engine = None
+
+    def install(self):
+        """Hook into every SQLAlchemy session"""
+        if self.installed:
+            return
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        self.installed = True
+
+    def subscribe(self, callback):
+        """Register callback(tables) to run after each commit that changed rows"""
+        self.subscribers.append(callback)
+        return callback
+
+    def subscribe_rows(self, callback):
+        """Register callback(changes) to receive the row deltas of each commit"""
+        self.row_subscribers.append(callback)
+        return callback
+
+    def version(self, table):
+        return self.versions.get(table, 0)
+
+    def token(self, *tables, versions=None):
+        """
+        Opaque string that changes whenever any of the tables change. versions
+        ({table: version}) pins tables to the versions some cached data was built at.
+        """
+        versions = versions or {}
+        return '-'.join([self.boot_id] + [str(versions[t] if t in versions else self.version(t)) for t in tables])
+
+    def enable_notifications(self, engine, listen=True):
+        """
+        Share changes with other processes through Postgres LISTEN/NOTIFY.
+        listen=False only sends, for short-lived processes such as CLI commands.
+        """
+        if self.engine is not None:
+            return
+        self.engine = engine
+        if listen:
+            threading.Thread(target=self._listen, name='change-listener', daemon=True).start()
+
+    def mark_changed(self, session, *tables):
+        """Record writes made with raw SQL so they are published on commit"""
+        session.info.setdefault('changed_tables', set()).update(tables)
+        self._notify(session, tables)
+
+    def record(self, session, *changes, tables=None):
+        """
+        Queue row deltas for writes that bypassed the ORM unit of work. The tables
+        marked changed default to the deltas' entities; pass tables to mark others.
+        """
+        session.info.setdefault('row_changes', []).extend(changes)
+        self.mark_changed(session, *(tables if tables is not None else {change['entity'] for change in changes}))
+
+    def bump(self, *tables):
+        """Publish changes made outside of a session transaction"""
+        self._bump(tables)
+        if self.engine is not None and tables:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                       {'channel': NOTIFY_CHANNEL, 'payload': self._payload(tables)})
+            except Exception as e:
+                logger.error(f"Error notifying workers of changes to {sorted(tables)}: {e}")
+
+    def _payload(self, tables):
+        return json.dumps({'origin': self.boot_id, 'tables': sorted(tables)})
+
+    def _notify(self, session, tables):
+        """
+        Queue a NOTIFY in the session's transaction: Postgres delivers it only
+        if the transaction commits, exactly when the local bump happens.
+        """
+        if self.engine is None:
+            return
+        notified = session.info.setdefault('notified_tables', set())
+        pending = set(tables) - notified
+        if not pending:
+            return
+        session.connection().execute(text("SELECT pg_notify(:channel, :payload)"),
+                                     {'channel': NOTIFY_CHANNEL, 'payload': self._payload(pending)})
+        notified.update(pending)
+
+    def _listen(self):
+        """Apply other workers' commits to the local versions, reconnecting on failure"""
+        while True:
+            connection = None
+            try:
+                # Detached: a LISTENing connection must never go back to the pool
+                connection = self.engine.raw_connection()
+                connection.detach()
+                pg = connection.driver_connection
+                pg.autocommit = True
+                pg.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Anything missed while disconnected: invalidate everything
+                self._bump(set(self.versions))
+                while True:
+                    if select.select([pg], [], [], 60) == ([], [], []):
+                        continue
+                    pg.poll()
+                    remote = set()
+                    while pg.notifies:
+                        message = json.loads(pg.notifies.pop(0).payload)
+                        if message['origin'] != self.boot_id:
+                            remote.update(message['tables'])
+                    if remote:
+                        self._bump(remote)
+            except Exception as e:
+                logger.error(f"Change listener error, reconnecting: {e}")
+                time.sleep(5)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _bump(self, tables):
+        tables = set(tables)
+        if not tables:
+            return
+        with self.lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+        for callback in self.subscribers:
+            callback(tables)
+
+    def _after_flush(self, session, flush_context):
+        tables = session.info.setdefault('changed_tables', set())
+        changes = session.info.setdefault('row_changes', [])
+        for objects, op in ((session.new, 'created'), (session.dirty, 'updated'), (session.deleted, 'deleted')):
+            for obj in objects:
+                if getattr(obj, '__table__', None) is None:
+                    continue
+                if op == 'updated' and not session.is_modified(obj, include_collections=False):
+                    continue
+                tables.add(obj.__table__.name)
+                if self.row_subscribers:
+                    changes.append(describe_change(obj, op))
+        self._notify(session, tables)
+
+    def _after_commit(self, session):
+        tables = session.info.pop('changed_tables', None)
+        changes = session.info.pop('row_changes', None)
+        session.info.pop('notified_tables', None)
+        if tables:
+            self._bump(tables)
+        if changes:
+            for callback in self.row_subscribers:
+                callback(changes)
+
+    def _after_rollback(self, session):
+        session.info.pop('changed_tables', None)
+        session.info.pop('row_changes', None)
+        session.info.pop('notified_tables', None)
+
+
+change_tracker = ChangeTracker()
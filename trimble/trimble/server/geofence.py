@@ -0,0 +1,84 @@
+# server/geofence.py
+import logging
+import threading
+from collections import defaultdict
+from .alert_service import ALERTS_NAMESPACE
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Zones whose boundaries are watched
+GEOFENCE_LEVELS = ('high', 'extreme')
+
+
+class GeofenceEngine:
+    """
+    Tracks which high/extreme-risk zones each vehicle is inside, from the GPS
+    fixes accepted by GpsBuffer. Every batch is checked against the spatial
+    index's zone tree in a single query; 'geofence' events are emitted on the
+    alerts namespace only when a vehicle enters or leaves a zone, to the zone's
+    room and the command/admin role rooms.
+    """
+
+    def __init__(self, index, socketio, levels=GEOFENCE_LEVELS):
+        self.index = index
+        self.socketio = socketio
+        self.levels = set(levels)
+        self.lock = threading.Lock()
+        self.inside = {} # vehicle id -> {zone id: zone}
+        self.last_fix = {} # vehicle id -> recorded_at of the last fix evaluated
+
+    def evaluate(self, fixes):
+        """GpsBuffer listener: fixes are (vehicle_id, lat, lng, recorded_at, speed, heading)"""
+        if not fixes:
+            return []
+        from .server import db
+        self.index.refresh(db.session)
+        fixes = sorted(fixes, key=lambda fix: (fix[0], fix[3]))
+        containing = self.index.zones_for_points([fix[1] for fix in fixes], [fix[2] for fix in fixes], self.levels)
+
+        transitions = []
+        with self.lock:
+            for fix, zones in zip(fixes, containing):
+                vehicle_id, lat, lng, recorded_at = fix[:4]
+                last = self.last_fix.get(vehicle_id)
+                if last is not None and recorded_at < last:
+                    continue # Late fix: the vehicle has already moved on
+                self.last_fix[vehicle_id] = recorded_at
+                before = self.inside.get(vehicle_id, {})
+                for event, changed in (('exit', before.keys() - zones.keys()), ('enter', zones.keys() - before.keys())):
+                    for zone_id in changed:
+                        zone = zones.get(zone_id) or before[zone_id]
+                        transitions.append({
+                            'event': event,
+                            'vehicle_id': vehicle_id,
+                            'zone_id': zone_id,
+                            'zone_name': zone['zone_name'],
+                            'risk_level': zone['risk_level'],
+                            'lat': lat,
+                            'lng': lng,
+                            'recorded_at': recorded_at.isoformat()
+                        })
+                if zones:
+                    self.inside[vehicle_id] = zones
+                else:
+                    self.inside.pop(vehicle_id, None)
+        if transitions:
+            self.publish(transitions)
+        return transitions
+
+    def publish(self, transitions):
+        """One 'geofence' message per room per batch"""
+        batches = defaultdict(list)
+        for transition in transitions:
+            batches[f"zone:{transition['zone_id']}"].append(transition)
+        for room, items in batches.items():
+            metrics.emit(self.socketio, 'geofence', items, namespace=ALERTS_NAMESPACE, to=room)
+        for role in ('command', 'admin'):
+            metrics.emit(self.socketio, 'geofence', transitions, namespace=ALERTS_NAMESPACE, to=f'role:{role}')
+        logger.info(f"{len(transitions)} geofence transitions")
+
+    def vehicles_inside(self):
+        """Current state: {vehicle id: [zones]}"""
+        with self.lock:
+            return {vehicle_id: list(zones.values()) for vehicle_id, zones in self.inside.items()}
@@ -0,0 +1,225 @@
+# server/gps.py
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from flask import session
+from sqlalchemy import text
+from .changes import change_tracker, row_change
+
+logger = logging.getLogger(__name__)
+
+GPS_NAMESPACE = '/gps'
+
+# Fixes held between flushes; past this, new batches are refused until the next flush
+MAX_BUFFERED_FIXES = 200_000
+# A batch the database keeps rejecting is dropped after this many flushes
+MAX_FLUSH_ATTEMPTS = 5
+# vehicles.id is a Postgres integer
+MAX_VEHICLE_ID = 2 ** 31 - 1
+
+
+def parse_fix(fix):
+    """
+    (vehicle_id, lat, lng, recorded_at, speed, heading) from a fix such as
+    {"vehicle_id": 3, "lat": 13.08, "lng": 80.27, "timestamp": "2024-11-30T10:15:02Z",
+     "speed": 12.5, "heading": 270}, or None when it is invalid. timestamp may be an
+    ISO string or epoch seconds and defaults to now; times are naive UTC.
+    """
+    if not isinstance(fix, dict):
+        return None
+    if isinstance(fix.get('vehicle_id'), bool):
+        return None
+    try:
+        vehicle_id = int(fix['vehicle_id'])
+        lat = float(fix['lat'])
+        lng = float(fix['lng'])
+        stamp = fix.get('timestamp')
+        if stamp is None:
+            recorded_at = datetime.utcnow()
+        elif isinstance(stamp, (int, float)):
+            recorded_at = datetime.fromtimestamp(stamp, timezone.utc).replace(tzinfo=None)
+        else:
+            recorded_at = datetime.fromisoformat(str(stamp).replace('Z', '+00:00'))
+            if recorded_at.tzinfo is not None:
+                recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+        speed = None if fix.get('speed') is None else float(fix['speed'])
+        heading = None if fix.get('heading') is None else float(fix['heading'])
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        return None
+    # Anything Postgres would refuse has to stop here, or it fails the whole flush
+    if not 0 < vehicle_id <= MAX_VEHICLE_ID:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    if any(value is not None and not math.isfinite(value) for value in (speed, heading)):
+        return None
+    return vehicle_id, lat, lng, recorded_at, speed, heading
+
+
+class GpsBuffer:
+    """
+    Collects GPS fixes in memory and writes them in bulk. Every fix goes to the
+    append-only vehicle_positions history; each vehicle's current_location only
+    takes its latest fix, and never one older than a fix already stored. A flush
+    is two statements however many fixes arrived. Listeners registered with
+    subscribe() see each written batch, on the flushing thread.
+    """
+
+    def __init__(self, max_buffered=MAX_BUFFERED_FIXES, max_attempts=MAX_FLUSH_ATTEMPTS):
+        self.max_buffered = max_buffered
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.history = []
+        self.retry = [] # [(failed attempts, fixes)] batches waiting to be written again, oldest first
+        self.dropped = 0
+        self.listeners = []
+        self.thread = None
+
+    def subscribe(self, callback):
+        """Register callback(fixes) to run after every written batch"""
+        self.listeners.append(callback)
+        return callback
+
+    def buffered(self):
+        return len(self.history) + sum(len(fixes) for _, fixes in self.retry)
+
+    def add(self, fixes):
+        """Buffer a batch of raw fixes; returns (accepted, rejected) or None when the buffer is full"""
+        parsed = [parse_fix(fix) for fix in fixes]
+        valid = [fix for fix in parsed if fix is not None]
+        with self.lock:
+            if self.buffered() + len(valid) > self.max_buffered:
+                return None
+            self.history.extend(valid)
+        return len(valid), len(parsed) - len(valid)
+
+    def flush(self, session):
+        """Write everything buffered so far; returns the number of fixes written"""
+        with self.lock:
+            batches = self.retry + ([(0, self.history)] if self.history else [])
+            self.history, self.retry = [], []
+        history = [fix for _, fixes in batches for fix in fixes]
+        if not history:
+            return 0
+        latest = {}
+        for fix in history:
+            current = latest.get(fix[0])
+            if current is None or fix[3] >= current[3]:
+                latest[fix[0]] = fix
+        try:
+            columns = list(zip(*history))
+            session.execute(text("""
+                INSERT INTO vehicle_positions (vehicle_id, recorded_at, location, speed, heading)
+                SELECT f.vehicle_id, f.recorded_at, ST_SetSRID(ST_MakePoint(f.lng, f.lat), 4326), f.speed, f.heading
+                FROM unnest(CAST(:ids AS integer[]), CAST(:lats AS float8[]), CAST(:lngs AS float8[]),
+                            CAST(:times AS timestamp[]), CAST(:speeds AS float8[]), CAST(:headings AS float8[]))
+                     AS f(vehicle_id, lat, lng, recorded_at, speed, heading)
+                JOIN vehicles v ON v.id = f.vehicle_id
+            """), {'ids': list(columns[0]), 'lats': list(columns[1]), 'lngs': list(columns[2]),
+                   'times': list(columns[3]), 'speeds': list(columns[4]), 'headings': list(columns[5])})
+
+            # A fix that arrives late must not move a vehicle back: skip it when the
+            # history (indexed on vehicle_id, recorded_at) already holds a newer one.
+            # last_updated is left alone: it dates edits of the vehicle record, which
+            # ?since= syncs and the vehicles ETags follow; positions are versioned on their own
+            fixes = list(latest.values())
+            updated = session.execute(text("""
+                UPDATE vehicles v
+                SET current_location = ST_SetSRID(ST_MakePoint(f.lng, f.lat), 4326)
+                FROM unnest(CAST(:ids AS integer[]), CAST(:lats AS float8[]), CAST(:lngs AS float8[]),
+                            CAST(:times AS timestamp[]))
+                     AS f(id, lat, lng, recorded_at)
+                WHERE v.id = f.id
+                  AND NOT EXISTS (SELECT 1 FROM vehicle_positions p
+                                  WHERE p.vehicle_id = f.id AND p.recorded_at > f.recorded_at)
+                RETURNING v.id, v.home_facility_id
+            """), {'ids': [fix[0] for fix in fixes], 'lats': [fix[1] for fix in fixes],
+                   'lngs': [fix[2] for fix in fixes], 'times': [fix[3] for fix in fixes]}).all()
+            # Deltas still go out on the vehicles layer of the change feed, but only
+            # vehicle_positions is marked changed: caches built on vehicles (dashboard
+            # summary, resource lists) are not invalidated by every flush
+            change_tracker.record(session, *(
+                row_change('vehicles', row.id, 'updated', {
+                    'current_lat': latest[row.id][1],
+                    'current_lng': latest[row.id][2]
+                }, {'home_facility_id': row.home_facility_id})
+                for row in updated
+            ), tables=('vehicle_positions',))
+            session.commit()
+        except Exception:
+            session.rollback()
+            self._requeue(batches)
+            raise
+
+        for callback in self.listeners:
+            try:
+                callback(history)
+            except Exception as e:
+                logger.error(f"GPS listener error: {e}")
+        return len(history)
+
+    def _requeue(self, batches):
+        """Put a failed flush back for the next one, dropping batches that failed max_attempts times"""
+        retry, dropped = [], 0
+        for attempts, fixes in batches:
+            if attempts + 1 >= self.max_attempts:
+                dropped += len(fixes)
+            else:
+                retry.append((attempts + 1, fixes))
+        with self.lock:
+            # Oldest first, within the buffer limit
+            room = max(0, self.max_buffered - len(self.history))
+            for attempts, fixes in retry:
+                if len(fixes) > room:
+                    dropped += len(fixes) - room
+                    fixes = fixes[:room]
+                if fixes:
+                    self.retry.append((attempts, fixes))
+                room -= len(fixes)
+            self.dropped += dropped
+        if dropped:
+            logger.error(f"Dropped {dropped} GPS fixes that could not be written after {self.max_attempts} attempts "
+                         f"or did not fit in the buffer")
+
+    def start(self, app, db, interval=1.0):
+        """Flush every `interval` seconds in a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                with app.app_context():
+                    try:
+                        written = self.flush(db.session)
+                        if written:
+                            logger.debug(f"Flushed {written} GPS fixes")
+                    except Exception as e:
+                        logger.error(f"GPS flush error: {e}")
+                    finally:
+                        db.session.remove()
+
+        self.thread = threading.Thread(target=run, name='gps-flush', daemon=True)
+        self.thread.start()
+
+
+def register_gps_events(socketio, buffer):
+    """Devices may also stream fixes over Socket.IO: emit('positions', {"fixes": [...]}) on /gps"""
+
+    @socketio.on('connect', namespace=GPS_NAMESPACE)
+    def handle_gps_connect():
+        if 'username' not in session:
+            return False
+
+    @socketio.on('positions', namespace=GPS_NAMESPACE)
+    def handle_positions(data):
+        fixes = (data or {}).get('fixes') if isinstance(data, dict) else None
+        if not isinstance(fixes, list):
+            return {'error': 'fixes must be a list'}
+        result = buffer.add(fixes)
+        if result is None:
+            return {'error': 'GPS buffer full, retry shortly'}
+        accepted, rejected = result
+        return {'accepted': accepted, 'rejected': rejected}
@@ -0,0 +1,155 @@
+# server/grid_aggregate.py
+import math
+import threading
+import time
+import numpy as np
+from sqlalchemy import text
+from .cache import LRUCache
+
+# Tables the grid counts; any write to them invalidates cached grids
+GRID_TABLES = ('emergency_facilities', 'vehicles', 'personnel', 'supply_items', 'vehicle_positions')
+# GPS flushes move vehicles every second; their new positions are picked up at most this often
+POSITIONS_MAX_AGE = 30
+
+MIN_CELL_SIZE = 0.001 # degrees, roughly 100 m
+MAX_CELL_SIZE = 1.0
+# Bounds on the response: a bbox may span at most MAX_GRID_CELLS cells, and a
+# request without one (the whole dataset) needs cells of at least MIN_UNBOUNDED_CELL_SIZE
+MAX_GRID_CELLS = 10_000
+MIN_UNBOUNDED_CELL_SIZE = 0.1
+
+METRICS = ('facilities', 'shelters', 'available_vehicles', 'personnel', 'supply_units')
+
+
+class GridPoints:
+    """
+    Everything the grid counts as flat coordinate/weight arrays, loaded in two
+    queries: facilities with their personnel and supply totals, then available
+    vehicles. Vehicles with a GPS position are placed there, the rest at their
+    home facility; personnel and supplies sit at their facility.
+    """
+
+    def __init__(self, session):
+        facilities = session.execute(text("""
+            SELECT f.id, ST_Y(f.location) AS lat, ST_X(f.location) AS lng, f.type,
+                   (SELECT count(*) FROM personnel p WHERE p.base_facility_id = f.id) AS personnel,
+                   (SELECT COALESCE(sum(s.quantity_current), 0) FROM supply_items s WHERE s.facility_id = f.id) AS supply_units
+            FROM emergency_facilities f
+            WHERE f.location IS NOT NULL
+        """)).all()
+        vehicles = session.execute(text("""
+            SELECT COALESCE(ST_Y(v.current_location), ST_Y(f.location)) AS lat,
+                   COALESCE(ST_X(v.current_location), ST_X(f.location)) AS lng
+            FROM vehicles v LEFT JOIN emergency_facilities f ON f.id = v.home_facility_id
+            WHERE v.status = 'available' AND COALESCE(v.current_location, f.location) IS NOT NULL
+        """)).all()
+        self.facility_lat = np.array([row.lat for row in facilities], dtype=float)
+        self.facility_lng = np.array([row.lng for row in facilities], dtype=float)
+        self.shelter = np.array([row.type == 'shelter' for row in facilities], dtype=float)
+        self.personnel = np.array([row.personnel for row in facilities], dtype=float)
+        self.supply_units = np.array([row.supply_units for row in facilities], dtype=float)
+        self.vehicle_lat = np.array([row.lat for row in vehicles], dtype=float)
+        self.vehicle_lng = np.array([row.lng for row in vehicles], dtype=float)
+
+
+def bin_points(lat, lng, cell_size):
+    """Integer (column, row) of the square cell each point falls in"""
+    return np.floor(lng / cell_size).astype(np.int64), np.floor(lat / cell_size).astype(np.int64)
+
+
+def grid_span(bbox, cell_size):
+    """Number of grid cells of cell_size a bbox = [minLng, minLat, maxLng, maxLat] touches"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    columns = math.floor(max_lng / cell_size) - math.floor(min_lng / cell_size) + 1
+    rows = math.floor(max_lat / cell_size) - math.floor(min_lat / cell_size) + 1
+    return max(0, columns) * max(0, rows)
+
+
+def build_grid(points, cell_size):
+    """
+    Totals per non-empty cell for the whole dataset: (columns, rows, {metric: array}).
+    Both point sets are binned, keyed on the cell and summed with bincount.
+    """
+    facility_cols, facility_rows = bin_points(points.facility_lat, points.facility_lng, cell_size)
+    vehicle_cols, vehicle_rows = bin_points(points.vehicle_lat, points.vehicle_lng, cell_size)
+    cols = np.concatenate([facility_cols, vehicle_cols])
+    rows = np.concatenate([facility_rows, vehicle_rows])
+    if not len(cols):
+        return cols, rows, {metric: np.zeros(0) for metric in METRICS}
+    cells, inverse = np.unique(np.column_stack((cols, rows)), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    facility_cells, vehicle_cells = inverse[:len(facility_cols)], inverse[len(facility_cols):]
+    count = len(cells)
+    totals = {
+        'facilities': np.bincount(facility_cells, minlength=count),
+        'shelters': np.bincount(facility_cells, weights=points.shelter, minlength=count),
+        'available_vehicles': np.bincount(vehicle_cells, minlength=count),
+        'personnel': np.bincount(facility_cells, weights=points.personnel, minlength=count),
+        'supply_units': np.bincount(facility_cells, weights=points.supply_units, minlength=count)
+    }
+    return cells[:, 0], cells[:, 1], totals
+
+
+class GridAggregator:
+    """
+    Square-grid totals for the map's zoomed-out views. The point arrays are
+    cached per data version and each resolution's grid on top of them, so a
+    request only filters precomputed cells to its bbox. GPS position updates
+    alone reload the points at most every POSITIONS_MAX_AGE seconds; grid()
+    and cells() return the table versions the points were loaded at.
+    """
+
+    def __init__(self, tracker, maxsize=64):
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.points = None
+        self.points_versions = None
+        self.points_loaded = None
+        self.grids = LRUCache(maxsize)
+
+    def _outdated(self, versions):
+        if self.points_versions is None:
+            return True
+        changed = {table for table in GRID_TABLES if versions[table] != self.points_versions[table]}
+        if changed == {'vehicle_positions'}:
+            return time.monotonic() - self.points_loaded > POSITIONS_MAX_AGE
+        return bool(changed)
+
+    def grid(self, session, cell_size):
+        """(columns, rows, totals) for the cell size, and the versions it was built at"""
+        versions = {table: self.tracker.version(table) for table in GRID_TABLES}
+        with self.lock:
+            if self._outdated(versions):
+                self.points = GridPoints(session)
+                self.points_versions = versions
+                self.points_loaded = time.monotonic()
+                self.grids.clear()
+            points, versions = self.points, self.points_versions
+        key = (tuple(versions[table] for table in GRID_TABLES), cell_size)
+        grid = self.grids.get(key)
+        if grid is None:
+            grid = build_grid(points, cell_size)
+            self.grids.set(key, grid)
+        return grid, versions
+
+    def cells(self, session, cell_size, bbox=None):
+        """
+        Non-empty cells (optionally within bbox = [minLng, minLat, maxLng, maxLat]),
+        and the versions they were built at
+        """
+        (cols, rows, totals), versions = self.grid(session, cell_size)
+        selected = np.ones(len(cols), dtype=bool)
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            selected = (((cols + 1) * cell_size > min_lng) & (cols * cell_size < max_lng)
+                        & ((rows + 1) * cell_size > min_lat) & (rows * cell_size < max_lat))
+        cells = []
+        for index in np.flatnonzero(selected).tolist():
+            west, south = cols[index] * cell_size, rows[index] * cell_size
+            cell = {
+                'bounds': [round(west, 6), round(south, 6), round(west + cell_size, 6), round(south + cell_size, 6)],
+                'center': {'lat': round(south + cell_size / 2, 6), 'lng': round(west + cell_size / 2, 6)}
+            }
+            cell.update({metric: int(totals[metric][index]) for metric in METRICS})
+            cells.append(cell)
+        return cells, versions
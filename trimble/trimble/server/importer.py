@@ -0,0 +1,277 @@
+# server/importer.py
+import csv
+import io
+import logging
+import math
+import geopandas as gpd
+import numpy as np
+import pyogrio
+import shapely
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_INTEGER = 2 ** 31 - 1 # Postgres integer columns
+
+# Target table, staged attribute columns and the UPDATE/INSERT merging each staged chunk
+IMPORT_TARGETS = {
+    'zones': {
+        'table': 'flood_risk_zones',
+        'columns': ['zone_name', 'risk_level', 'description'],
+        'update': """
+            UPDATE flood_risk_zones z
+            SET geometry = s.geom,
+                risk_level = COALESCE(s.risk_level, z.risk_level),
+                description = COALESCE(s.description, z.description),
+                last_updated = (now() AT TIME ZONE 'utc')
+            FROM (SELECT DISTINCT ON (zone_name) * FROM import_staging ORDER BY zone_name) s
+            WHERE z.zone_name = s.zone_name
+        """,
+        'insert': """
+            INSERT INTO flood_risk_zones (zone_name, geometry, risk_level, description, water_level, last_updated)
+            SELECT DISTINCT ON (s.zone_name) s.zone_name, s.geom, COALESCE(s.risk_level, %(default_risk)s),
+                   s.description, 0, (now() AT TIME ZONE 'utc')
+            FROM import_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM flood_risk_zones z WHERE z.zone_name = s.zone_name)
+            ORDER BY s.zone_name
+        """
+    },
+    'facilities': {
+        'table': 'emergency_facilities',
+        'columns': ['name', 'type', 'status', 'capacity_overall', 'contact_info', 'description'],
+        'update': """
+            UPDATE emergency_facilities f
+            SET location = s.geom,
+                status = COALESCE(s.status, f.status),
+                capacity_overall = COALESCE(s.capacity_overall, f.capacity_overall),
+                contact_info = COALESCE(s.contact_info, f.contact_info),
+                description = COALESCE(s.description, f.description),
+                last_updated = (now() AT TIME ZONE 'utc')
+            FROM (SELECT DISTINCT ON (name, type) * FROM import_staging ORDER BY name, type) s
+            WHERE f.name = s.name AND f.type = s.type
+        """,
+        'insert': """
+            INSERT INTO emergency_facilities (name, type, location, status, capacity_overall, contact_info, description, last_updated)
+            SELECT DISTINCT ON (s.name, s.type) s.name, s.type, s.geom, COALESCE(s.status, 'operational'),
+                   s.capacity_overall, s.contact_info, s.description, (now() AT TIME ZONE 'utc')
+            FROM import_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM emergency_facilities f WHERE f.name = s.name AND f.type = s.type)
+            ORDER BY s.name, s.type
+        """
+    }
+}
+
+# Limits of the target varchar columns: a longer value would abort the whole import in the merge
+COLUMN_LIMITS = {
+    'zones': {'zone_name': 255, 'risk_level': 50},
+    'facilities': {'name': 255, 'type': 50, 'status': 50, 'contact_info': 255}
+}
+
+STAGING_TABLES = {
+    'zones': """
+        CREATE TEMP TABLE import_staging (
+            zone_name text NOT NULL, risk_level text, description text, geom geometry(Polygon, 4326) NOT NULL
+        ) ON COMMIT DROP
+    """,
+    'facilities': """
+        CREATE TEMP TABLE import_staging (
+            name text NOT NULL, type text NOT NULL, status text, capacity_overall integer,
+            contact_info text, description text, geom geometry(Point, 4326) NOT NULL
+        ) ON COMMIT DROP
+    """
+}
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, layer=None):
+    """
+    Yields GeoDataFrames of at most chunk_size features, reprojected to EPSG:4326.
+    The source is opened once and read as a stream of Arrow record batches, so
+    formats without random access such as GeoJSON are parsed a single time.
+    Only one chunk is held in memory at a time. Rows are indexed by their
+    position in the source (from 0), which is how rejected features are reported.
+    """
+    with pyogrio.open_arrow(path, layer=layer, batch_size=chunk_size, use_pyarrow=True) as (meta, reader):
+        geometry_name = meta['geometry_name'] or 'wkb_geometry'
+        crs = meta['crs']
+        if crs is None:
+            logger.warning(f"{path} has no CRS, assuming EPSG:4326")
+            crs = 'EPSG:4326'
+        offset = 0
+        for batch in reader:
+            if not batch.num_rows:
+                continue
+            geometry = shapely.from_wkb(batch.column(geometry_name).to_numpy(zero_copy_only=False))
+            attributes = batch.to_pandas().drop(columns=[geometry_name])
+            attributes.index += offset
+            offset += batch.num_rows
+            chunk = gpd.GeoDataFrame(attributes, geometry=gpd.GeoSeries(geometry, crs=crs, index=attributes.index))
+            if chunk.crs.to_epsg() != 4326:
+                chunk = chunk.to_crs(4326)
+            yield chunk
+
+
+def _clean(value):
+    """NaN/None -> None so the CSV cell is read back as NULL"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def _integer(value):
+    """Whole number from an attribute such as 120, 120.0, "120" or "1,200"; None when it isn't one"""
+    if value is None:
+        return None
+    try:
+        number = float(value.replace(',', '').strip()) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number) or not 0 <= number <= MAX_INTEGER:
+        return None
+    return int(round(number))
+
+
+def _reject(chunk, mask, reason, rejected):
+    """Drop the features where mask is set, recording (feature number, reason) for each in rejected"""
+    mask = np.asarray(mask, dtype=bool)
+    rejected.extend((int(number), reason) for number in chunk.index[mask])
+    return chunk[~mask]
+
+
+def _validate(chunk, target, fields, rejected, geom_types=None, name_lengths=None):
+    """
+    Drop the features the merge could not store, so one bad feature doesn't abort
+    the import: no geometry or one of another type, no name, or a value longer
+    than its column. name_lengths overrides the length of the staged names.
+    """
+    name_column = 'zone_name' if target == 'zones' else 'name'
+    name_field = fields[name_column]
+    chunk = _reject(chunk, chunk.geometry.isna() | chunk.geometry.is_empty, 'no geometry', rejected)
+    if geom_types:
+        chunk = _reject(chunk, ~chunk.geometry.geom_type.isin(geom_types),
+                        f"geometry is not a {' or '.join(geom_types)}", rejected)
+    chunk = _reject(chunk, [_clean(value) is None or not str(value).strip() for value in chunk[name_field]],
+                    f"no {name_field}", rejected)
+    for column, limit in COLUMN_LIMITS[target].items():
+        source = fields.get(column)
+        if not source:
+            continue
+        if column == name_column and name_lengths is not None:
+            lengths = name_lengths(chunk)
+        else:
+            lengths = [0 if _clean(value) is None else len(str(value)) for value in chunk[source]]
+        chunk = _reject(chunk, np.asarray(lengths) > limit, f"{source} longer than {limit} characters", rejected)
+    return chunk
+
+
+def check_fields(chunk, fields):
+    """Raise ValueError when a mapped attribute is missing from the source"""
+    missing = [source for source in fields.values() if source and source not in chunk.columns]
+    if missing:
+        available = ', '.join(column for column in chunk.columns if column != chunk.geometry.name)
+        raise ValueError(f"Source has no attribute {', '.join(map(repr, missing))} (available: {available})")
+
+
+def _column(frame, source):
+    """Values of a source attribute as a list (all None when the attribute isn't mapped)"""
+    if not source:
+        return [None] * len(frame)
+    return [_clean(value) for value in frame[source].tolist()]
+
+
+def prepare_zones(chunk, fields, rejected):
+    """
+    Staged columns and polygons of a zones chunk. Multi-part polygons are split
+    into numbered parts ("Ward 12 #2"), as flood_risk_zones.geometry holds single polygons.
+    Unusable features are dropped and added to rejected.
+    """
+    def name_lengths(chunk):
+        # The longest staged name of each feature, numbered suffix included
+        counts = shapely.get_num_geometries(chunk.geometry.to_numpy())
+        return [len(str(name)) + (len(f" #{count}") if count > 1 else 0)
+                for name, count in zip(chunk[fields['zone_name']], counts)]
+
+    chunk = _validate(chunk, 'zones', fields, rejected, ['Polygon', 'MultiPolygon'], name_lengths)
+    parts = chunk.explode(index_parts=True)
+    sources = parts.index.get_level_values(0)
+    multi = sources.duplicated(keep=False)
+    names = [f"{name} #{number + 1}" if is_multi else str(name)
+             for name, number, is_multi in zip(parts[fields['zone_name']], parts.index.get_level_values(1), multi)]
+    columns = {
+        'zone_name': names,
+        'risk_level': _column(parts, fields.get('risk_level')),
+        'description': _column(parts, fields.get('description'))
+    }
+    return columns, parts.geometry
+
+
+def prepare_facilities(chunk, fields, default_type, rejected):
+    """
+    Staged columns and points of a facilities chunk (non-point shapes use a point
+    on their surface). Unusable features are dropped and added to rejected.
+    """
+    chunk = _validate(chunk, 'facilities', fields, rejected)
+    points = chunk.geometry.where(chunk.geometry.geom_type == 'Point', chunk.geometry.representative_point())
+    columns = {column: _column(chunk, fields.get(column)) for column in IMPORT_TARGETS['facilities']['columns']}
+    columns['type'] = [value or default_type for value in columns['type']]
+    capacities = [_integer(value) for value in columns['capacity_overall']]
+    # Unusable capacities are imported as NULL (an existing facility keeps its capacity) and reported
+    rejected = [(name, raw) for name, raw, value in zip(columns['name'], columns['capacity_overall'], capacities)
+                if raw is not None and value is None]
+    if rejected:
+        examples = ', '.join(f"{name!s}: {raw!r}" for name, raw in rejected[:5])
+        logger.warning(f"Ignored {len(rejected)} capacity values that are not whole numbers ({examples})")
+    columns['capacity_overall'] = capacities
+    return columns, points
+
+
+def copy_chunk(cursor, target, columns, geometries):
+    """Stream one chunk into import_staging with COPY (geometry as hex EWKB)"""
+    names = IMPORT_TARGETS[target]['columns']
+    ewkb = shapely.to_wkb(shapely.set_srid(geometries.to_numpy(), 4326), hex=True, include_srid=True)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(zip(*[columns[name] for name in names], ewkb))
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY import_staging ({', '.join(names)}, geom) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(ewkb)
+
+
+def import_geodata(connection, path, target, fields, chunk_size=DEFAULT_CHUNK_SIZE, layer=None,
+                   default_type='shelter', default_risk='low'):
+    """
+    Bulk-load a GeoJSON/GeoPackage/Shapefile into flood_risk_zones or
+    emergency_facilities. Each chunk is COPYed into a temporary staging table
+    and merged with one UPDATE and one INSERT, all in a single transaction.
+    connection is a raw DB-API (psycopg2) connection. Features that cannot be
+    stored are skipped; returns the rows staged and the skipped features as
+    (feature number, reason). A mapped attribute missing from the source raises ValueError.
+    """
+    config = IMPORT_TARGETS[target]
+    total = 0
+    rejected = []
+    for column, default in (('type', default_type), ('risk_level', default_risk)):
+        limit = COLUMN_LIMITS['facilities' if column == 'type' else 'zones'][column]
+        if len(default) > limit:
+            raise ValueError(f"Default {column} {default!r} is longer than {limit} characters")
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(STAGING_TABLES[target])
+            for chunk in read_chunks(path, chunk_size, layer):
+                check_fields(chunk, fields)
+                skipped = len(rejected)
+                if target == 'zones':
+                    columns, geometries = prepare_zones(chunk, fields, rejected)
+                else:
+                    columns, geometries = prepare_facilities(chunk, fields, default_type, rejected)
+                for number, reason in rejected[skipped:skipped + 5]:
+                    logger.warning(f"Skipped feature {number} of {path}: {reason}")
+                total += copy_chunk(cursor, target, columns, geometries)
+                cursor.execute(config['update'])
+                cursor.execute(config['insert'], {'default_risk': default_risk})
+                cursor.execute("TRUNCATE import_staging")
+                logger.info(f"Imported {total} features into {config['table']}")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return total, rejected
@@ -0,0 +1,213 @@
+# server/metrics.py
+"""
+Process metrics in the Prometheus text format, without a client library:
+request latency, response sizes and SQL queries per endpoint, Socket.IO
+broadcasts (sent through emit()) and connected clients, and the AlertService loop. Served on /metrics.
+"""
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# A request issuing more queries than this is logged as a likely N+1 pattern
+SQL_QUERY_WARN_THRESHOLD = int(os.getenv('SQL_QUERY_WARN_THRESHOLD', '20'))
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        registry.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Gauge(Metric):
+    """A settable value, or one read at scrape time from collect() -> {label tuple: value}"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), collect=None):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def render(self):
+        if self.collect is not None:
+            try:
+                items = list(self.collect().items())
+            except Exception as e:
+                logger.warning(f"Could not collect {self.name}: {e}")
+                items = []
+        else:
+            with self.lock:
+                items = list(self.values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self.lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+registry = []
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    return '\n'.join(line for metric in registry for line in metric.render()) + '\n'
+
+
+REQUEST_SECONDS = Histogram('rapid_http_request_duration_seconds', 'HTTP request latency',
+                            ('method', 'endpoint', 'status'))
+RESPONSE_BYTES = Histogram('rapid_http_response_size_bytes', 'HTTP response body size',
+                           ('method', 'endpoint'), SIZE_BUCKETS)
+REQUEST_QUERIES = Histogram('rapid_http_request_sql_queries', 'SQL queries issued per HTTP request',
+                            ('method', 'endpoint'), QUERY_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('rapid_http_request_sql_duration_seconds', 'Time spent in SQL per HTTP request',
+                                ('method', 'endpoint'))
+N_PLUS_ONE_WARNINGS = Counter('rapid_sql_query_threshold_exceeded_total',
+                              f'Requests issuing more than {SQL_QUERY_WARN_THRESHOLD} SQL queries', ('method', 'endpoint'))
+SQL_SECONDS = Histogram('rapid_sql_query_duration_seconds', 'Duration of every SQL statement')
+SOCKETIO_EMITS = Counter('rapid_socketio_emits_total', 'Socket.IO events broadcast by the server', ('namespace', 'event'))
+ALERT_CYCLES = Counter('rapid_alert_cycles_total', 'AlertService polling cycles', ('outcome',))
+ALERT_CYCLE_SECONDS = Histogram('rapid_alert_cycle_duration_seconds', 'AlertService polling cycle duration',
+                                buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+ALERT_ZONES_READ = Gauge('rapid_alert_zones_read', 'Zones with a rainfall reading in the last cycle')
+ALERT_LAST_SUCCESS = Gauge('rapid_alert_last_success_timestamp_seconds', 'Unix time of the last successful cycle')
+ALERT_LEADER = Gauge('rapid_alert_leader', '1 when this process runs the AlertService poller')
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    SQL_SECONDS.observe(elapsed)
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+
+def emit(socketio, event_name, *args, **kwargs):
+    """socketio.emit(), counted in rapid_socketio_emits_total; used for every server-initiated broadcast"""
+    SOCKETIO_EMITS.inc(namespace=kwargs.get('namespace') or '/', event=event_name)
+    return socketio.emit(event_name, *args, **kwargs)
+
+
+def install(app, socketio):
+    """Instrument requests, every SQLAlchemy engine and Socket.IO client counts"""
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_started' not in g:
+            return response
+        endpoint = _endpoint()
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                method=request.method, endpoint=endpoint, status=response.status_code)
+        if not response.is_streamed:
+            RESPONSE_BYTES.observe(response.calculate_content_length() or 0, method=request.method, endpoint=endpoint)
+        REQUEST_QUERIES.observe(g.sql_queries, method=request.method, endpoint=endpoint)
+        REQUEST_SQL_SECONDS.observe(g.sql_seconds, method=request.method, endpoint=endpoint)
+        if g.sql_queries > SQL_QUERY_WARN_THRESHOLD:
+            N_PLUS_ONE_WARNINGS.inc(method=request.method, endpoint=endpoint)
+            logger.warning(f"{request.method} {endpoint} issued {g.sql_queries} SQL queries "
+                           f"({g.sql_seconds * 1000:.1f} ms), possible N+1 pattern")
+        return response
+
+    def connected_clients():
+        # Every client of a namespace is in its None room
+        rooms = socketio.server.manager.rooms
+        return {(namespace,): len(members.get(None, {})) for namespace, members in list(rooms.items())}
+
+    Gauge('rapid_socketio_connected_clients', 'Socket.IO clients connected to this process', ('namespace',),
+          collect=connected_clients)
@@ -0,0 +1,91 @@
+# server/rainfall_store.py
+from datetime import datetime, timedelta
+import threading
+from sqlalchemy import text
+
+# Rollup resolutions kept up to date on every insert, in hours
+ROLLUP_STEPS = {'1h': 1, '6h': 6, '24h': 24}
+
+_partitions_ready = set()
+_partitions_lock = threading.Lock()
+
+
+def bucket_start(moment, hours):
+    """Start of the UTC bucket of `hours` width containing moment (naive UTC)"""
+    seconds = hours * 3600
+    epoch = (moment - datetime(1970, 1, 1)).total_seconds()
+    return datetime(1970, 1, 1) + timedelta(seconds=int(epoch // seconds) * seconds)
+
+
+def ensure_partition(session, moment):
+    """
+    Create the daily rainfall_readings partition holding moment, once per
+    process. Committed straight away so the partition survives a failed insert.
+    """
+    day = moment.date()
+    if day in _partitions_ready:
+        return
+    with _partitions_lock:
+        if day in _partitions_ready:
+            return
+        session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS rainfall_readings_{day:%Y%m%d} PARTITION OF rainfall_readings "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        ))
+        session.commit()
+        _partitions_ready.add(day)
+
+
+def store_readings(session, readings, observed_at, provider, sample_seconds):
+    """
+    Insert one ingestion cycle ({zone_id: mm/h}) into the partitioned raw table
+    and fold it into every rollup with a single upsert. Each reading stands for
+    sample_seconds of rain at its rate, which is what the rollups accumulate.
+    The caller commits.
+    """
+    if not readings:
+        return
+    ensure_partition(session, observed_at)
+    zone_ids = list(readings)
+    rates = [float(readings[zone_id]) for zone_id in zone_ids]
+    session.execute(text("""
+        INSERT INTO rainfall_readings (zone_id, observed_at, rain_1h, provider)
+        SELECT zone_id, :observed_at, rain_1h, :provider
+        FROM unnest(CAST(:zone_ids AS integer[]), CAST(:rates AS float8[])) AS r(zone_id, rain_1h)
+        ON CONFLICT DO NOTHING
+    """), {'observed_at': observed_at, 'provider': provider, 'zone_ids': zone_ids, 'rates': rates})
+
+    steps = list(ROLLUP_STEPS.values())
+    session.execute(text("""
+        INSERT INTO rainfall_rollups (zone_id, step_hours, bucket_start, rain_mm, max_rate, samples)
+        SELECT r.zone_id, s.step_hours, s.bucket_start, r.rain_1h * :sample_hours, r.rain_1h, 1
+        FROM unnest(CAST(:zone_ids AS integer[]), CAST(:rates AS float8[])) AS r(zone_id, rain_1h)
+        CROSS JOIN unnest(CAST(:steps AS integer[]), CAST(:starts AS timestamp[])) AS s(step_hours, bucket_start)
+        ON CONFLICT (zone_id, step_hours, bucket_start) DO UPDATE SET
+            rain_mm = rainfall_rollups.rain_mm + EXCLUDED.rain_mm,
+            max_rate = GREATEST(rainfall_rollups.max_rate, EXCLUDED.max_rate),
+            samples = rainfall_rollups.samples + 1
+    """), {
+        'zone_ids': zone_ids,
+        'rates': rates,
+        'sample_hours': sample_seconds / 3600.0,
+        'steps': steps,
+        'starts': [bucket_start(observed_at, hours) for hours in steps]
+    })
+
+
+def rainfall_history(session, zone_id, start, end, hours):
+    """Rollup buckets of one zone between start and end (naive UTC), oldest first"""
+    rows = session.execute(text("""
+        SELECT bucket_start, rain_mm, max_rate, samples
+        FROM rainfall_rollups
+        WHERE zone_id = :zone_id AND step_hours = :hours
+          AND bucket_start >= :start AND bucket_start < :end
+        ORDER BY bucket_start
+    """), {'zone_id': zone_id, 'hours': hours, 'start': bucket_start(start, hours), 'end': end})
+    return [{
+        'bucket_start': row.bucket_start.isoformat(),
+        'rain_mm': round(row.rain_mm, 2),
+        'max_rate': row.max_rate,
+        'samples': row.samples
+    } for row in rows]
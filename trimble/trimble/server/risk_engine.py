@@ -0,0 +1,134 @@
+# server/risk_engine.py
+from datetime import datetime, timedelta
+import json
+import os
+import numpy as np
+from sqlalchemy import text
+
+RISK_LEVELS = np.array(['low', 'moderate', 'high', 'extreme'])
+
+# Rainfall (mm) above which a zone reaches moderate, high and extreme risk, per
+# window: 'rate' is the latest mm/h reading (same cut-offs as the old forecast),
+# the others are accumulations; 24h follows the IMD heavy / very heavy /
+# extremely heavy rainfall categories
+DEFAULT_THRESHOLDS = {
+    'rate': (5, 10, 20),
+    '6h': (40, 70, 120),
+    '24h': (64.5, 115.5, 204.5)
+}
+
+
+class RiskEngine:
+    """
+    Classifies flood risk for every zone at once from rainfall arrays. A zone
+    takes the highest level reached in any window.
+    """
+
+    def __init__(self, thresholds=None):
+        """thresholds overrides some or all of DEFAULT_THRESHOLDS; raises ValueError if invalid"""
+        thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.thresholds = {window: self._validate(window, values) for window, values in thresholds.items()}
+
+    @staticmethod
+    def _validate(window, values):
+        """One ascending cut-off per level above low, as classify()'s searchsorted needs"""
+        if window not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown risk threshold window {window!r} (expected one of {', '.join(DEFAULT_THRESHOLDS)})")
+        try:
+            values = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Risk thresholds for {window} must be numbers, got {values!r}")
+        if values.shape != (len(RISK_LEVELS) - 1,) or not np.isfinite(values).all() or (np.diff(values) <= 0).any():
+            raise ValueError(f"Risk thresholds for {window} must be {len(RISK_LEVELS) - 1} ascending numbers "
+                             f"(moderate, high, extreme), got {values.tolist()}")
+        return values
+
+    @classmethod
+    def from_env(cls):
+        """
+        Thresholds can be overridden with RISK_THRESHOLDS='{"rate": [5, 10, 20], ...}';
+        windows left out keep their defaults. Raises ValueError if the override is invalid.
+        """
+        raw = os.getenv('RISK_THRESHOLDS')
+        if not raw:
+            return cls()
+        try:
+            thresholds = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"RISK_THRESHOLDS is not valid JSON: {e}")
+        if not isinstance(thresholds, dict):
+            raise ValueError('RISK_THRESHOLDS must be a JSON object of window -> thresholds')
+        try:
+            return cls(thresholds)
+        except ValueError as e:
+            raise ValueError(f"Invalid RISK_THRESHOLDS: {e}")
+
+    def classify(self, windows):
+        """
+        windows maps window name -> float array (one value per zone, NaN = no data).
+        Returns the level index (into RISK_LEVELS) of every zone.
+        """
+        levels = None
+        for window, values in windows.items():
+            # Number of thresholds strictly below the value: 0 = low ... 3 = extreme
+            window_levels = np.searchsorted(self.thresholds[window], np.nan_to_num(values), side='left')
+            levels = window_levels if levels is None else np.maximum(levels, window_levels)
+        return levels
+
+    def classify_one(self, rainfall):
+        """Risk level name for a single mm/h reading"""
+        return RISK_LEVELS[self.classify({'rate': np.array([rainfall], dtype=float)})[0]]
+
+
+def load_accumulations(session, zone_ids, now):
+    """6h and 24h rainfall totals per zone (aligned with zone_ids) from the hourly rollups"""
+    totals_6h = np.full(len(zone_ids), np.nan)
+    totals_24h = np.full(len(zone_ids), np.nan)
+    rows = session.execute(text("""
+        SELECT zone_id,
+               SUM(rain_mm) FILTER (WHERE bucket_start >= :since_6h) AS total_6h,
+               SUM(rain_mm) AS total_24h
+        FROM rainfall_rollups
+        WHERE step_hours = 1 AND bucket_start >= :since_24h
+        GROUP BY zone_id
+    """), {'since_6h': now - timedelta(hours=6), 'since_24h': now - timedelta(hours=24)}).all()
+    if rows:
+        ids, total_6h, total_24h = (np.array(column, dtype=float) for column in zip(*rows))
+        positions = np.searchsorted(zone_ids, ids)
+        found = (positions < len(zone_ids)) & (zone_ids[np.minimum(positions, len(zone_ids) - 1)] == ids)
+        totals_6h[positions[found]] = total_6h[found]
+        totals_24h[positions[found]] = total_24h[found]
+    return totals_6h, totals_24h
+
+
+def recompute_zone_risk(session, engine, latest_rates):
+    """
+    Reclassify every zone with readings in one vectorized pass and write back
+    only the zones whose level changed, with a single UPDATE. latest_rates is
+    {zone_id: mm/h} from the last ingestion cycle. The caller commits.
+    Returns [(zone_id, old_level, new_level)] for the changed zones.
+    """
+    rows = session.execute(text("SELECT id, risk_level FROM flood_risk_zones ORDER BY id")).all()
+    if not rows:
+        return []
+    zone_ids = np.array([row.id for row in rows])
+    current = np.array([row.risk_level for row in rows], dtype=object)
+
+    rates = np.array([latest_rates.get(zone_id, np.nan) for zone_id in zone_ids.tolist()], dtype=float)
+    totals_6h, totals_24h = load_accumulations(session, zone_ids, datetime.utcnow())
+    has_data = ~(np.isnan(rates) & np.isnan(totals_6h) & np.isnan(totals_24h))
+
+    levels = RISK_LEVELS[engine.classify({'rate': rates, '6h': totals_6h, '24h': totals_24h})]
+    changed = has_data & (levels != current)
+    if not changed.any():
+        return []
+
+    ids = zone_ids[changed].tolist()
+    new_levels = levels[changed].tolist()
+    session.execute(text("""
+        UPDATE flood_risk_zones z
+        SET risk_level = u.risk_level, last_updated = (now() AT TIME ZONE 'utc')
+        FROM unnest(CAST(:ids AS integer[]), CAST(:levels AS text[])) AS u(id, risk_level)
+        WHERE z.id = u.id
+    """), {'ids': ids, 'levels': new_levels})
+    return list(zip(ids, current[changed].tolist(), new_levels))
@@ -0,0 +1,140 @@
+# server/scaling.py
+"""
+Pieces needed to run several server processes side by side:
+
+- SOCKETIO_MESSAGE_QUEUE: message queue shared by the workers so an emit from
+  one process reaches clients connected to any other (redis://, amqp://, or
+  filesystem:///some/dir as a broker-free stand-in for local runs and tests).
+- ALERT_LEADER_ELECTION: which process runs the AlertService poller;
+  "advisory" (Postgres advisory lock, the default in multi-worker mode),
+  "file:/path/to/lockfile", or "none" (every process polls).
+
+Each worker is a separate `python main.py` on its own PORT behind a load
+balancer with sticky sessions.
+"""
+import logging
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError: # Windows: file: election is unavailable, the rest works
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key for pg_try_advisory_lock
+ALERT_SERVICE_LOCK_KEY = 72_701_001
+
+
+def socketio_client_manager(url, channel='rapid-socketio'):
+    """python-socketio client manager for a message queue URL (None = single process)"""
+    if not url:
+        return None
+    import socketio
+    if url.startswith(('redis://', 'rediss://')):
+        return socketio.RedisManager(url, channel=channel)
+    if url.startswith('filesystem://'):
+        folder = url[len('filesystem://'):] or os.path.join(tempfile.gettempdir(), 'rapid-socketio')
+        os.makedirs(folder, exist_ok=True)
+        # control_folder holds the fanout bindings; kombu's default is ./control in the working directory
+        return socketio.KombuManager('filesystem://', channel=channel, connection_options={
+            'transport_options': {'data_folder_in': folder, 'data_folder_out': folder,
+                                  'control_folder': os.path.join(folder, 'control')}
+        })
+    return socketio.KombuManager(url, channel=channel)
+
+
+class AlwaysLeader:
+    """Single-process mode: this process always runs the poller"""
+    retry_interval = 0
+
+    def acquire(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class AdvisoryLockElection:
+    """
+    Leader is whichever process holds a session-level Postgres advisory lock.
+    The lock lives on a dedicated connection, so it is released as soon as the
+    leader dies or loses its connection and a standby can take over.
+    """
+    retry_interval = 30
+
+    def __init__(self, engine, key=ALERT_SERVICE_LOCK_KEY):
+        self.engine = engine
+        self.key = key
+        self.connection = None
+        self.leader = False
+
+    def acquire(self):
+        try:
+            if self.connection is None:
+                # Detached from the pool so closing it really releases the lock
+                self.connection = self.engine.raw_connection()
+                self.connection.detach()
+            cursor = self.connection.cursor()
+            if self.leader:
+                # Still holding the lock as long as its connection is alive
+                cursor.execute("SELECT 1")
+            else:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                self.leader = bool(cursor.fetchone()[0])
+                if self.leader:
+                    logger.info("Acquired alert service leadership")
+            self.connection.commit()
+            return self.leader
+        except Exception as e:
+            logger.warning(f"Leader election failed, standing by: {e}")
+            self.release()
+            return False
+
+    def release(self):
+        self.leader = False
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class FileLockElection:
+    """Leader election through an exclusive flock, for processes on one host and tests (POSIX only)"""
+    retry_interval = 5
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("ALERT_LEADER_ELECTION=file: needs flock, which this platform lacks; use advisory")
+        self.path = path
+        self.handle = None
+
+    def acquire(self):
+        if self.handle is not None:
+            return True
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+    def release(self):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+def election_from_env(engine, multi_worker):
+    mode = os.getenv('ALERT_LEADER_ELECTION', 'advisory' if multi_worker else 'none')
+    if mode == 'advisory':
+        return AdvisoryLockElection(engine)
+    if mode.startswith('file:'):
+        return FileLockElection(mode[len('file:'):])
+    return AlwaysLeader()
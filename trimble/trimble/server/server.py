@@ -1,9 +1,12 @@
-from flask import Flask, jsonify, request, session,Blueprint
+from flask import Flask, jsonify, request, session,Blueprint, abort, g
 from flask_sqlalchemy import SQLAlchemy
 from geoalchemy2 import Geometry
-from sqlalchemy import func, text, cast, Integer, case
+from sqlalchemy import func, text, cast, Integer, case, select, Text, JSON, and_, event, tuple_, insert, update, delete
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError, DataError
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from urllib.parse import quote_plus
 from pathlib import Path
@@ -14,16 +17,37 @@ from flask_socketio import SocketIO
 from functools import wraps
 import json 
 import pytz
+import hashlib
+import hmac
+import base64
+import threading
+import click
+from .changes import change_tracker, row_change
+from .cache import LRUCache
+from .scaling import socketio_client_manager, election_from_env
+from .spatial_index import SpatialIndex
+from .shelter_allocation import AllocationCache, allocate, EVACUATION_LEVELS
+from .gps import GpsBuffer, register_gps_events
+from .geofence import GeofenceEngine
+from .grid_aggregate import (GridAggregator, GRID_TABLES, MIN_CELL_SIZE, MAX_CELL_SIZE, MAX_GRID_CELLS,
+                             MIN_UNBOUNDED_CELL_SIZE, grid_span)
+from .supply_forecast import SupplyForecaster, summarize_by_facility
+from . import metrics
 bp = Blueprint('facilities', __name__)
 app = Flask(__name__)
 
-CORS(app, supports_credentials=True, origins=["http://localhost:3000"]) 
+CORS(app, supports_credentials=True, origins=["http://localhost:3000"],
+     expose_headers=['X-Next-Cursor', 'X-Sync-Cursor'])
 
 # Load configuration
 env_path = Path(__file__).resolve().parents[1] / '.env'
 load_dotenv(dotenv_path=env_path)
 logger = logging.getLogger(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Multi-worker mode: workers relay Socket.IO emits through this queue (see server/scaling.py)
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=socketio_client_manager(SOCKETIO_MESSAGE_QUEUE))
+# Alert poller, GPS flush and index warmup threads; off for flask CLI commands and with BACKGROUND_TASKS=0
+BACKGROUND_TASKS = os.getenv('BACKGROUND_TASKS', '1') != '0' and click.get_current_context(silent=True) is None
 
 # Database configuration
 DB_USER = os.getenv('DB_USER')
@@ -41,6 +65,14 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = os.environ.get('FLASK_SECRET_KEY') # Provide a fallback for local testing
 # Initialize extensions with app
 db = SQLAlchemy(app)
+# Per-table versions used to invalidate caches after writes
+change_tracker.install()
+# Request, SQL and Socket.IO instrumentation served on /metrics
+metrics.install(app, socketio)
+# Commits made by other workers and by CLI commands (e.g. import-geodata) must invalidate this
+# process's caches too; CLI commands only send their changes
+with app.app_context():
+    change_tracker.enable_notifications(db.engine, listen=click.get_current_context(silent=True) is None)
 
 # Database Models 
 class FloodRiskZone(db.Model):
@@ -70,6 +102,105 @@ class FloodRiskZone(db.Model):
             'geometry': json.loads(geojson) if geojson else None
         }
 
+    @classmethod
+    def geojson_payload(cls, bbox=None, zoom=None):
+        """
+        Renders the matching zones as one JSON document ({"zones": [...]}) built
+        entirely in PostGIS. The whole collection costs a single query and the
+        text is handed back as-is, without being parsed again in Python.
+
+        bbox (min_lng, min_lat, max_lng, max_lat) limits the result to zones
+        intersecting the view; zoom swaps in the precomputed simplified
+        geometry for that zoom bucket.
+        """
+        geometry = cls.geometry
+        bucket = zone_zoom_bucket(zoom)
+        if bucket is not None:
+            ensure_simplified_zones(bucket)
+            geometry = SimplifiedFloodRiskZone.geometry
+
+        zone = func.json_build_object(
+            'id', cls.id,
+            'zone_name', cls.zone_name,
+            'risk_level', cls.risk_level,
+            'water_level', cls.water_level,
+            'last_updated', cls.last_updated,
+            'description', cls.description,
+            'geometry', cast(func.ST_AsGeoJSON(geometry), JSON)
+        )
+        payload = func.json_build_object(
+            'zones', func.coalesce(func.json_agg(aggregate_order_by(zone, cls.id)), cast('[]', JSON))
+        )
+        query = select(cast(payload, Text)).select_from(cls)
+        if bucket is not None:
+            query = query.join(SimplifiedFloodRiskZone, and_(
+                SimplifiedFloodRiskZone.zone_id == cls.id,
+                SimplifiedFloodRiskZone.zoom_bucket == bucket
+            ))
+        if bbox:
+            query = query.where(func.ST_Intersects(geometry, func.ST_MakeEnvelope(*bbox, 4326)))
+        return db.session.scalar(query)
+
+class SimplifiedFloodRiskZone(db.Model):
+    __tablename__ = 'flood_risk_zones_simplified'
+    zone_id = db.Column(db.Integer, db.ForeignKey('flood_risk_zones.id', ondelete='CASCADE'), primary_key=True)
+    zoom_bucket = db.Column(db.Integer, primary_key=True)
+    # Simplified copy of FloodRiskZone.geometry for one zoom bucket (GiST indexed)
+    geometry = db.Column(Geometry('GEOMETRY', srid=4326), nullable=False)
+    source_updated = db.Column(db.DateTime) # FloodRiskZone.last_updated the copy was built from
+
+# Lowest zoom level of each simplification bucket. Zooms at or above
+# ZONE_FULL_RESOLUTION_ZOOM are served from the original polygons.
+ZONE_ZOOM_BUCKETS = (0, 2, 4, 6, 8, 10, 12, 14)
+ZONE_FULL_RESOLUTION_ZOOM = 16
+
+_simplified_buckets_ready = set()
+_simplified_buckets_lock = threading.Lock()
+
+def zone_zoom_bucket(zoom):
+    """Map a web-map zoom level to its simplification bucket (None = full resolution)"""
+    if zoom is None or zoom >= ZONE_FULL_RESOLUTION_ZOOM:
+        return None
+    return max(b for b in ZONE_ZOOM_BUCKETS if b <= max(zoom, 0))
+
+def zone_simplify_tolerance(bucket):
+    """Roughly one 256px tile pixel, in degrees, at the bucket's coarsest zoom"""
+    return 360.0 / (256 * 2 ** bucket)
+
+def ensure_simplified_zones(bucket):
+    """
+    Builds (or refreshes) the simplified geometries of one zoom bucket. Only
+    zones that are missing or whose last_updated moved on are rewritten, and
+    each process does this once per bucket until invalidate_simplified_zones().
+    """
+    if bucket in _simplified_buckets_ready:
+        return
+    with _simplified_buckets_lock:
+        if bucket in _simplified_buckets_ready:
+            return
+        db.session.execute(text("""
+            INSERT INTO flood_risk_zones_simplified (zone_id, zoom_bucket, geometry, source_updated)
+            SELECT z.id, :bucket, ST_SimplifyPreserveTopology(z.geometry, :tolerance), z.last_updated
+            FROM flood_risk_zones z
+            LEFT JOIN flood_risk_zones_simplified s
+                ON s.zone_id = z.id AND s.zoom_bucket = :bucket
+            WHERE s.zone_id IS NULL OR s.source_updated IS DISTINCT FROM z.last_updated
+            ON CONFLICT (zone_id, zoom_bucket) DO UPDATE
+                SET geometry = EXCLUDED.geometry, source_updated = EXCLUDED.source_updated
+        """), {'bucket': bucket, 'tolerance': zone_simplify_tolerance(bucket)})
+        db.session.commit()
+        _simplified_buckets_ready.add(bucket)
+
+def invalidate_simplified_zones():
+    """Forget which buckets are current so the next request re-checks them"""
+    with _simplified_buckets_lock:
+        _simplified_buckets_ready.clear()
+
+@change_tracker.subscribe
+def _on_zones_changed(tables):
+    if 'flood_risk_zones' in tables:
+        invalidate_simplified_zones()
+
 class EmergencyFacility(db.Model):
     __tablename__ = 'emergency_facilities'
     id = db.Column(db.Integer, primary_key=True)
@@ -80,7 +211,10 @@ class EmergencyFacility(db.Model):
     contact_info = db.Column(db.String(255))
     capacity_overall = db.Column(db.Integer)
     description = db.Column(db.Text)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Coordinates computed by PostGIS in the same SELECT; only loaded when asked for
+    lat = db.column_property(func.ST_Y(location), deferred=True, group='coordinates')
+    lng = db.column_property(func.ST_X(location), deferred=True, group='coordinates')
     
     personnel = db.relationship('Personnel', backref='facility', lazy=True)
     vehicles = db.relationship('Vehicle', backref='facility', lazy=True)
@@ -96,7 +230,7 @@ class Personnel(db.Model):
     status = db.Column(db.String(50), default='available')
     current_assignment = db.Column(db.String(255))
     contact_number = db.Column(db.String(20))
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
@@ -108,7 +242,10 @@ class Vehicle(db.Model):
     status = db.Column(db.String(50), default='available')
     capacity_load = db.Column(db.String(100))
     assigned_to = db.Column(db.String(255))
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Coordinates computed by PostGIS in the same SELECT; only loaded when asked for
+    current_lat = db.column_property(func.ST_Y(current_location), deferred=True, group='coordinates')
+    current_lng = db.column_property(func.ST_X(current_location), deferred=True, group='coordinates')
 
 class SupplyItem(db.Model):
     __tablename__ = 'supply_items'
@@ -119,7 +256,7 @@ class SupplyItem(db.Model):
     quantity_capacity = db.Column(db.Integer)
     unit = db.Column(db.String(20))
     status = db.Column(db.String(50), default='adequate')
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class ResponseAction(db.Model):
     __tablename__ = 'response_actions'
@@ -130,8 +267,210 @@ class ResponseAction(db.Model):
     timeframe = db.Column(db.String(100))
     importance=db.Column(db.String(100))
     status = db.Column(db.String(50), default='active') # 'active', 'pending', 'completed'
-    created_at = db.Column(db.DateTime, default=datetime.now(pytz.utc))
-    updated_at = db.Column(db.DateTime, default=datetime.now(pytz.utc), onupdate=datetime.now(pytz.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc), onupdate=lambda: datetime.now(pytz.utc), index=True)
+    # Keyset pagination walks (created_at, id) newest first, optionally within one filter value
+    __table_args__ = (
+        db.Index('ix_response_actions_created_id', 'created_at', 'id'),
+        db.Index('ix_response_actions_status_created_id', 'status', 'created_at', 'id'),
+        db.Index('ix_response_actions_team_created_id', 'team', 'created_at', 'id'),
+        db.Index('ix_response_actions_importance_created_id', 'importance', 'created_at', 'id'),
+    )
+
+class RainfallReading(db.Model):
+    """
+    Rainfall observed at a flood zone, one row per zone per ingestion cycle.
+    Range partitioned by day on observed_at (see rainfall_store.ensure_partition).
+    """
+    __tablename__ = 'rainfall_readings'
+    zone_id = db.Column(db.Integer, db.ForeignKey('flood_risk_zones.id', ondelete='CASCADE'), primary_key=True)
+    observed_at = db.Column(db.DateTime, primary_key=True)
+    rain_1h = db.Column(db.Float, nullable=False) # mm over the last hour
+    provider = db.Column(db.String(50))
+    __table_args__ = {'postgresql_partition_by': 'RANGE (observed_at)'}
+
+class RainfallRollup(db.Model):
+    """Per-zone rainfall accumulated into 1, 6 and 24 hour buckets, maintained on insert"""
+    __tablename__ = 'rainfall_rollups'
+    zone_id = db.Column(db.Integer, db.ForeignKey('flood_risk_zones.id', ondelete='CASCADE'), primary_key=True)
+    step_hours = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    rain_mm = db.Column(db.Float, nullable=False, default=0.0) # Accumulated rainfall in the bucket
+    max_rate = db.Column(db.Float, nullable=False, default=0.0) # Highest mm/h reading in the bucket
+    samples = db.Column(db.Integer, nullable=False, default=0)
+
+class VehiclePosition(db.Model):
+    """Append-only GPS track of every fix received (see server/gps.py)"""
+    __tablename__ = 'vehicle_positions'
+    id = db.Column(db.BigInteger, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id', ondelete='CASCADE'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False) # Device time of the fix (UTC)
+    received_at = db.Column(db.DateTime, nullable=False, server_default=text("(now() AT TIME ZONE 'utc')"))
+    location = db.Column(Geometry('POINT', srid=4326), nullable=False)
+    speed = db.Column(db.Float)
+    heading = db.Column(db.Float)
+    __table_args__ = (
+        db.Index('ix_vehicle_positions_vehicle_recorded', 'vehicle_id', 'recorded_at'),
+    )
+
+class SupplyQuantityChange(db.Model):
+    """Append-only log of supply quantity changes, the input of the depletion forecast"""
+    __tablename__ = 'supply_quantity_changes'
+    id = db.Column(db.BigInteger, primary_key=True)
+    supply_item_id = db.Column(db.Integer, nullable=False) # No foreign key: history outlives the item
+    facility_id = db.Column(db.Integer)
+    quantity_before = db.Column(db.Integer) # NULL when the item was created
+    quantity_after = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    source = db.Column(db.String(20)) # 'api' or 'bulk'
+    __table_args__ = (
+        db.Index('ix_supply_quantity_changes_item_changed', 'supply_item_id', 'changed_at'),
+        db.Index('ix_supply_quantity_changes_changed', 'changed_at'), # forecast refreshes read recent rows
+    )
+
+class DeletedRecord(db.Model):
+    """Tombstone left behind by a DELETE so ?since= sync can report it"""
+    __tablename__ = 'deleted_records'
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(100), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    facility_id = db.Column(db.Integer) # Owning facility, for per-facility resource lists
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        db.Index('ix_deleted_records_table_deleted_at', 'table_name', 'deleted_at'),
+    )
+
+# Tables whose deletes are tombstoned, with the column naming the owning facility
+SYNC_TABLES = {
+    'emergency_facilities': None,
+    'supply_items': 'facility_id',
+    'vehicles': 'home_facility_id',
+    'personnel': 'base_facility_id',
+    'response_actions': None
+}
+# Rows are stamped before their transaction commits, so each sync window
+# reaches back a little to catch commits that landed after the last cursor
+SYNC_CURSOR_OVERLAP = timedelta(seconds=30)
+
+@event.listens_for(db.session, 'before_flush')
+def record_tombstones(session, flush_context, instances):
+    for obj in session.deleted:
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name not in SYNC_TABLES:
+            continue
+        facility_key = SYNC_TABLES[table_name]
+        session.add(DeletedRecord(
+            table_name=table_name,
+            record_id=obj.id,
+            facility_id=getattr(obj, facility_key) if facility_key else None
+        ))
+
+def parse_iso_datetime(value):
+    """datetime.fromisoformat() that also takes a trailing Z (Python < 3.11 rejects it); raises ValueError"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+def parse_sync_cursor():
+    """
+    Reads ?since=<cursor> from the request. Returns (since, cursor): since is the
+    aware UTC datetime to sync from (None for a full listing) and cursor is the
+    value the client should send next time. Raises ValueError for a bad cursor.
+    Cursors are ISO timestamps ending in Z: a "+00:00" offset turns into a space
+    when a client puts it in a query string without encoding it.
+    """
+    cursor = datetime.utcnow().isoformat() + 'Z'
+    since = request.args.get('since')
+    if not since:
+        return None, cursor
+    since = parse_iso_datetime(since)
+    if since.tzinfo is None:
+        since = pytz.utc.localize(since)
+    return since.astimezone(pytz.utc) - SYNC_CURSOR_OVERLAP, cursor
+
+def naive_utc(value):
+    """Aware datetime -> naive UTC, to compare with the datetime.utcnow() stamped columns"""
+    return value.astimezone(pytz.utc).replace(tzinfo=None)
+
+def log_supply_quantities(entries, source):
+    """
+    Append quantity changes to supply_quantity_changes in the current transaction.
+    entries are (supply_item_id, facility_id, quantity_before, quantity_after);
+    unchanged quantities are skipped.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        'supply_item_id': supply_id,
+        'facility_id': facility_id,
+        'quantity_before': before,
+        'quantity_after': after,
+        'changed_at': now,
+        'source': source
+    } for supply_id, facility_id, before, after in entries if after is not None and after != before]
+    if rows:
+        db.session.execute(insert(SupplyQuantityChange), rows)
+        change_tracker.mark_changed(db.session, 'supply_quantity_changes')
+
+def deleted_since(table_name, since, facility_id=None):
+    """Ids of rows deleted from table_name after since"""
+    query = db.session.query(DeletedRecord.record_id).filter(
+        DeletedRecord.table_name == table_name,
+        DeletedRecord.deleted_at > naive_utc(since)
+    )
+    if facility_id is not None:
+        query = query.filter(DeletedRecord.facility_id == facility_id)
+    return [record_id for record_id, in query]
+
+@app.cli.command('init-db')
+def init_db():
+    """Create missing tables and indexes (existing tables are left untouched)"""
+    db.create_all()
+    # create_all skips tables that already exist, so indexes added to them later are created here
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    print("Database schema is up to date")
+
+@app.cli.command('import-geodata')
+@click.argument('path')
+@click.option('--target', type=click.Choice(['zones', 'facilities']), required=True)
+@click.option('--layer', default=None, help='Layer name for multi-layer sources such as GeoPackage')
+@click.option('--chunk-size', default=5000, show_default=True)
+@click.option('--name-field', default='name', show_default=True, help='Attribute holding the zone/facility name')
+@click.option('--risk-field', default=None, help='Zones: attribute holding the risk level')
+@click.option('--default-risk', default='low', show_default=True)
+@click.option('--type-field', default=None, help='Facilities: attribute holding the facility type')
+@click.option('--default-type', default='shelter', show_default=True)
+@click.option('--status-field', default=None)
+@click.option('--capacity-field', default=None)
+@click.option('--contact-field', default=None)
+@click.option('--description-field', default=None)
+def import_geodata_command(path, target, layer, chunk_size, name_field, risk_field, default_risk, type_field,
+                           default_type, status_field, capacity_field, contact_field, description_field):
+    """Stream a GeoJSON/GeoPackage/Shapefile into flood_risk_zones or emergency_facilities"""
+    from .importer import import_geodata, IMPORT_TARGETS
+    if target == 'zones':
+        fields = {'zone_name': name_field, 'risk_level': risk_field, 'description': description_field}
+    else:
+        fields = {'name': name_field, 'type': type_field, 'status': status_field, 'capacity_overall': capacity_field,
+                  'contact_info': contact_field, 'description': description_field}
+    connection = db.engine.raw_connection()
+    try:
+        count, rejected = import_geodata(connection, path, target, fields, chunk_size=chunk_size, layer=layer,
+                                         default_type=default_type, default_risk=default_risk)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        connection.close()
+    # COPY bypasses the ORM, so publish the change by hand; the NOTIFY reaches the running server's caches and tiles
+    change_tracker.bump(IMPORT_TARGETS[target]['table'])
+    print(f"Imported {count} features into {IMPORT_TARGETS[target]['table']}")
+    if rejected:
+        print(f"Skipped {len(rejected)} features:")
+        for number, reason in rejected[:20]:
+            print(f"  feature {number}: {reason}")
+        if len(rejected) > 20:
+            print(f"  ... and {len(rejected) - 20} more")
 
 # --- API Endpoints ---
 @app.route('/login', methods=['POST'])
@@ -259,50 +598,86 @@ def login_required(role=None):
         return wrapped
     return decorator
 
+# Conditional GET support: the ETag is derived from the change versions of the tables a view reads
+def etag_versioned(*tables, extra=None):
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            def make_etag(versions=None):
+                parts = [change_tracker.token(*tables, versions=versions), request.full_path]
+                if extra:
+                    parts.append(extra())
+                return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()[:20]
+
+            etag = make_etag()
+            # Unchanged since the client's copy: answer without running the view at all
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                # Views serving cached data set g.etag_versions to the versions it was built at,
+                # so a payload older than the current versions never carries their ETag
+                if 'etag_versions' in g:
+                    etag = make_etag(g.pop('etag_versions'))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapped
+    return decorator
+
 
 @app.route('/api/facilities', methods=['GET'])
 @login_required(role=[ 'command', 'admin','field'])  # All authenticated users can view facilities
+@etag_versioned('emergency_facilities')
 def get_facilities_by_type():
     """
     Retrieves a list of all emergency facilities.
     Supports optional filtering by type (e.g., /api/facilities?type=Hospital).
+    With ?since=<cursor> only facilities changed or deleted after the cursor are returned.
     """
     facility_type = request.args.get('type')
     try:
-        query = EmergencyFacility.query
+        since, cursor = parse_sync_cursor()
+    except ValueError:
+        return jsonify({'error': 'Invalid since cursor'}), 400
+    try:
+        # One query: coordinates come back as columns next to the facility fields
+        query = db.session.query(
+            EmergencyFacility.id,
+            EmergencyFacility.name,
+            EmergencyFacility.type,
+            EmergencyFacility.status,
+            EmergencyFacility.contact_info,
+            EmergencyFacility.capacity_overall,
+            EmergencyFacility.description,
+            EmergencyFacility.lat,
+            EmergencyFacility.lng
+        )
         if facility_type:
                 query = query.filter(func.lower(EmergencyFacility.type) == facility_type.lower())        
-        facilities = query.all()
-        result = []
-        for facility in facilities:
-            location_data = None
-            if facility.location:
-                try:
-                    location_data = {
-                        'lat': float(facility.location.data.split('(')[1].split(')')[0].split(' ')[1]),
-                        'lng': float(facility.location.data.split('(')[1].split(')')[0].split(' ')[0])
-                    }
-                except (AttributeError, IndexError, ValueError):
-                    location_data = {
-                        'lat': db.session.scalar(func.ST_Y(facility.location)),
-                        'lng': db.session.scalar(func.ST_X(facility.location))
-                    }
-            
-            result.append({
-                'id': facility.id,
-                'name': facility.name,
-                'type': facility.type,
-                'location': location_data,
-                'status': facility.status,
-                'contact_info': facility.contact_info,
-                'capacity_overall': facility.capacity_overall,
-                'description': facility.description
-            })
+        if since:
+            query = query.filter(EmergencyFacility.last_updated > naive_utc(since))
+        result = [{
+            'id': row.id,
+            'name': row.name,
+            'type': row.type,
+            'location': {'lat': row.lat, 'lng': row.lng} if row.lat is not None else None,
+            'status': row.status,
+            'contact_info': row.contact_info,
+            'capacity_overall': row.capacity_overall,
+            'description': row.description
+        } for row in query]
         
-        return jsonify({
+        payload = {
             'facilities': result,
-            'total': len(result)
-        })
+            'total': len(result),
+            'cursor': cursor
+        }
+        if since:
+            payload['deleted'] = deleted_since('emergency_facilities', since)
+        return jsonify(payload)
     except Exception as e:
         logging.error(f"Error fetching facilities: {e}")
         return jsonify({
@@ -313,223 +688,621 @@ def get_facilities_by_type():
 
 @app.route('/api/high-risk-zones', methods=['GET'])
 @login_required(role=['command', 'admin'])  # All authenticated users can view risk zones
+@etag_versioned('flood_risk_zones')
 def get_high_risk_zones():
     """
     Retrieves all flood risk zones from the database and returns them as GeoJSON.
+    The response body is rendered by PostGIS in a single query.
+    Supports optional viewport filtering and simplification:
+    /api/high-risk-zones?bbox=minLng,minLat,maxLng,maxLat&zoom=12
     """
+    bbox = request.args.get('bbox')
+    zoom = request.args.get('zoom', type=int)
+    if bbox:
+        try:
+            bbox = [float(v) for v in bbox.split(',')]
+            if len(bbox) != 4:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'bbox must be minLng,minLat,maxLng,maxLat'}), 400
     try:
-        zones = FloodRiskZone.query.all()
-        zones_data = [zone.serialize() for zone in zones]
-        return jsonify({'zones': zones_data}), 200
+        payload = FloodRiskZone.geojson_payload(bbox=bbox, zoom=zoom)
+        return app.response_class(payload, mimetype='application/json'), 200
     except Exception as e:
-        print(f"Error fetching high-risk zones: {e}")
+        logger.error(f"Error fetching high-risk zones: {e}")
         return jsonify({'error': 'Failed to retrieve flood risk zones', 'details': str(e)}), 500
     
+# Vector tile layers: source SQL (rows inside the tile, geometry clipped by ST_AsMVTGeom) and who may read them
+TILE_LAYERS = {
+    'zones': {
+        'table': 'flood_risk_zones',
+        'roles': ['command', 'admin'],
+        'sql': """
+            SELECT id, zone_name, risk_level, water_level,
+                   ST_AsMVTGeom(ST_Transform(geometry, 3857), bounds.envelope, 4096, 64, true) AS geom
+            FROM flood_risk_zones, bounds
+            WHERE geometry && ST_Transform(bounds.envelope, 4326)
+        """
+    },
+    'facilities': {
+        'table': 'emergency_facilities',
+        'roles': ['command', 'admin', 'field'],
+        'sql': """
+            SELECT id, name, type, status, capacity_overall,
+                   ST_AsMVTGeom(ST_Transform(location, 3857), bounds.envelope, 4096, 64, true) AS geom
+            FROM emergency_facilities, bounds
+            WHERE location && ST_Transform(bounds.envelope, 4326)
+        """
+    }
+}
+MAX_TILE_ZOOM = 22
+tile_cache = LRUCache(4096)
+
+def render_vector_tile(layer, z, x, y):
+    """One Mapbox Vector Tile rendered by PostGIS in a single query"""
+    row = db.session.execute(text(f"""
+        WITH bounds AS (SELECT ST_TileEnvelope(:z, :x, :y) AS envelope)
+        SELECT ST_AsMVT(tile, :layer, 4096, 'geom') FROM ({TILE_LAYERS[layer]['sql']}) AS tile
+    """), {'z': z, 'x': x, 'y': y, 'layer': layer}).scalar()
+    return bytes(row) if row is not None else b''
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+@login_required(role=['command', 'admin', 'field'])
+def get_vector_tile(layer, z, x, y):
+    """Vector tiles for map layers: /tiles/zones/12/2930/1906.mvt"""
+    config = TILE_LAYERS.get(layer)
+    if config is None:
+        abort(404)
+    if session.get('role') not in config['roles']:
+        return jsonify({"error": "Unauthorized"}), 403
+    if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'error': 'Tile coordinates out of range'}), 400
+    key = (layer, change_tracker.token(config['table']), z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        try:
+            tile = render_vector_tile(layer, z, x, y)
+        except Exception as e:
+            logger.error(f"Error rendering {layer} tile {z}/{x}/{y}: {e}")
+            return jsonify({'error': 'Failed to render tile', 'details': str(e)}), 500
+        tile_cache.set(key, tile)
+    return app.response_class(tile, mimetype='application/vnd.mapbox-vector-tile')
+
+grid_aggregator = GridAggregator(change_tracker)
+
+@app.route('/api/aggregate/grid', methods=['GET'])
+@login_required(role=['command', 'admin', 'field'])
+@etag_versioned(*GRID_TABLES)
+def get_aggregate_grid():
+    """
+    Facilities, shelters, available vehicles, personnel and supply units summed
+    per square grid cell, for zoomed-out map views:
+    /api/aggregate/grid?bbox=minLng,minLat,maxLng,maxLat&res=0.01 (cell size in degrees)
+    The bbox may span at most MAX_GRID_CELLS cells; without a bbox res must be
+    at least MIN_UNBOUNDED_CELL_SIZE, which is also its default there.
+    """
+    bbox = request.args.get('bbox')
+    cell_size = request.args.get('res', default=0.01 if bbox else MIN_UNBOUNDED_CELL_SIZE, type=float)
+    if cell_size is None or not (MIN_CELL_SIZE <= cell_size <= MAX_CELL_SIZE):
+        return jsonify({'error': f'res must be between {MIN_CELL_SIZE} and {MAX_CELL_SIZE} degrees'}), 400
+    if bbox:
+        try:
+            bbox = [float(v) for v in bbox.split(',')]
+            # Also rules out NaN and infinite bounds, which grid_span cannot count
+            if len(bbox) != 4 or not (-180 <= bbox[0] <= bbox[2] <= 180 and -90 <= bbox[1] <= bbox[3] <= 90):
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'bbox must be minLng,minLat,maxLng,maxLat'}), 400
+        span = grid_span(bbox, cell_size)
+        if span > MAX_GRID_CELLS:
+            return jsonify({'error': f'bbox spans {span} cells at res={cell_size}, more than {MAX_GRID_CELLS}; '
+                                     f'use a larger res'}), 400
+    elif cell_size < MIN_UNBOUNDED_CELL_SIZE:
+        return jsonify({'error': f'res must be at least {MIN_UNBOUNDED_CELL_SIZE} degrees without a bbox'}), 400
+    try:
+        cells, g.etag_versions = grid_aggregator.cells(db.session, round(cell_size, 6), bbox)
+        return jsonify({'res': cell_size, 'cells': cells})
+    except Exception as e:
+        logger.error(f"Error aggregating grid: {e}")
+        return jsonify({'error': 'Failed to aggregate resources', 'details': str(e)}), 500
+
+# Burn rates and time-to-stockout from the supply quantity log
+supply_forecaster = SupplyForecaster(change_tracker)
+
+@app.route('/api/supplies/forecast', methods=['GET'])
+@login_required(role=['command', 'admin'])
+def get_supply_forecast():
+    """
+    Supply items ordered by expected stockout: /api/supplies/forecast?facility_id=3&horizon_hours=72
+    (horizon_hours keeps only items running out within that many hours)
+    """
+    facility_id = request.args.get('facility_id', type=int)
+    horizon = request.args.get('horizon_hours', type=float)
+    try:
+        items = supply_forecaster.forecast(db.session)
+        if facility_id is not None:
+            items = [item for item in items if item['facility_id'] == facility_id]
+        if horizon is not None:
+            items = [item for item in items if item['hours_to_stockout'] is not None and item['hours_to_stockout'] <= horizon]
+        return jsonify({'items': items, 'facilities': summarize_by_facility(items)})
+    except Exception as e:
+        logger.error(f"Error forecasting supplies: {e}")
+        return jsonify({'error': 'Failed to forecast supplies', 'details': str(e)}), 500
+
+# Scrapers authenticate with a bearer token (METRICS_TOKEN); without one only admins can read /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Process metrics in the Prometheus text format"""
+    token = METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')
+    if not token:
+        if 'username' not in session:
+            return jsonify({"error": "Authentication required"}), 401
+        if session.get('role') != 'admin':
+            return jsonify({"error": "Unauthorized"}), 403
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# In-process spatial index for point-in-zone and nearest-facility lookups
+spatial_index = SpatialIndex(change_tracker)
+
+def warm_spatial_index():
+    with app.app_context():
+        try:
+            spatial_index.refresh(db.session)
+        except Exception as e:
+            logger.warning(f"Spatial index not built at startup: {e}")
+        finally:
+            db.session.remove()
+
+if BACKGROUND_TASKS:
+    threading.Thread(target=warm_spatial_index, name='spatial-index-warmup', daemon=True).start()
+
+def parse_lat_lng():
+    """lat/lng query parameters, or None when missing or out of range"""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+@app.route('/api/zones/at', methods=['GET'])
+@login_required(role=['command', 'admin', 'field'])
+def get_zones_at():
+    """Flood zones containing a point: /api/zones/at?lat=13.08&lng=80.27"""
+    point = parse_lat_lng()
+    if point is None:
+        return jsonify({'error': 'lat and lng are required'}), 400
+    try:
+        spatial_index.refresh(db.session)
+        return jsonify({'zones': spatial_index.zones_at(*point)})
+    except Exception as e:
+        logger.error(f"Error looking up zones at {point}: {e}")
+        return jsonify({'error': 'Failed to look up zones', 'details': str(e)}), 500
+
+@app.route('/api/facilities/nearest', methods=['GET'])
+@login_required(role=['command', 'admin', 'field'])
+def get_nearest_facilities():
+    """Nearest operational facilities: /api/facilities/nearest?lat=&lng=&type=hospital&k=5"""
+    point = parse_lat_lng()
+    if point is None:
+        return jsonify({'error': 'lat and lng are required'}), 400
+    k = min(max(request.args.get('k', default=5, type=int), 1), 100)
+    try:
+        spatial_index.refresh(db.session)
+        facilities = spatial_index.nearest_facilities(*point, facility_type=request.args.get('type') or None, k=k)
+        return jsonify({'facilities': facilities})
+    except Exception as e:
+        logger.error(f"Error finding facilities near {point}: {e}")
+        return jsonify({'error': 'Failed to find nearest facilities', 'details': str(e)}), 500
+
+# Zone x shelter distances are cached until zones or facilities change
+allocation_cache = AllocationCache(change_tracker)
+
+@app.route('/api/evacuation/allocate', methods=['POST'])
+@login_required(role=['command', 'admin'])
+def allocate_shelters():
+    """
+    Assign evacuees to operational shelters within capacity, nearest first.
+    Body: {"populations": {"<zone_id>": people, ...}, "levels": ["high", "extreme"]}
+    Only zones currently at one of the levels are evacuated.
+    """
+    data = request.get_json(silent=True) or {}
+    populations = data.get('populations')
+    levels = data.get('levels', list(EVACUATION_LEVELS))
+    if not isinstance(populations, dict) or not isinstance(levels, list):
+        return jsonify({'error': 'populations must be an object of zone id -> people and levels a list'}), 400
+    try:
+        populations = {int(zone_id): int(people) for zone_id, people in populations.items()}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'populations must map zone ids to whole numbers of people'}), 400
+    if any(people < 0 for people in populations.values()):
+        return jsonify({'error': 'populations cannot be negative'}), 400
+    try:
+        problem = allocation_cache.get(db.session)
+        return jsonify(allocate(problem, populations, levels))
+    except Exception as e:
+        logger.error(f"Error allocating shelters: {e}")
+        return jsonify({'error': 'Failed to allocate shelters', 'details': str(e)}), 500
+
+# GPS fixes are buffered in memory and written in bulk once a second
+gps_buffer = GpsBuffer()
+if BACKGROUND_TASKS:
+    gps_buffer.start(app, db, interval=float(os.getenv('GPS_FLUSH_INTERVAL', '1.0')))
+
+# Enter/exit events for vehicles crossing high/extreme zone boundaries
+geofence = GeofenceEngine(spatial_index, socketio)
+gps_buffer.subscribe(geofence.evaluate)
+
+@app.route('/api/vehicles/positions', methods=['POST'])
+@login_required(role=['command', 'admin', 'field'])
+def ingest_vehicle_positions():
+    """
+    Accepts a batch of GPS fixes: {"fixes": [{"vehicle_id", "lat", "lng", "timestamp", "speed", "heading"}]}.
+    Fixes are stored asynchronously; invalid ones are counted as rejected.
+    """
+    data = request.get_json(silent=True) or {}
+    fixes = data.get('fixes')
+    if not isinstance(fixes, list):
+        return jsonify({'error': 'fixes must be a list'}), 400
+    result = gps_buffer.add(fixes)
+    if result is None:
+        return jsonify({'error': 'GPS buffer full, retry shortly'}), 503, {'Retry-After': '1'}
+    accepted, rejected = result
+    return jsonify({'accepted': accepted, 'rejected': rejected}), 202
+
+@app.route('/api/geofence/vehicles', methods=['GET'])
+@login_required(role=['command', 'admin'])
+def get_geofenced_vehicles():
+    """Vehicles currently inside high/extreme-risk zones, as seen by the geofence engine"""
+    return jsonify({'vehicles': [{'vehicle_id': vehicle_id, 'zones': zones}
+                                 for vehicle_id, zones in geofence.vehicles_inside().items()]})
+
 from .alert_service import init_alert_service, register_socket_events, alert_service
 
-# Initialize alert service
-init_alert_service(app, socketio)
+# Initialize alert service (only the elected worker polls)
+with app.app_context():
+    init_alert_service(app, socketio, election_from_env(db.engine, bool(SOCKETIO_MESSAGE_QUEUE)),
+                       start=BACKGROUND_TASKS)
 
 # Register socket events
 register_socket_events(socketio)
 
+# Push row deltas on the /changes namespace after each commit
+from .change_feed import register_change_feed
+register_change_feed(socketio, change_tracker)
+
+# GPS fixes streamed over Socket.IO on /gps
+register_gps_events(socketio, gps_buffer)
+
+def rainfall_version():
+    from .alert_service import alert_service
+    return alert_service.rainfall.version() if alert_service else None
+
 @app.route('/api/rainfall', methods=['GET'])
 @login_required(role=['command', 'admin'])
+@etag_versioned(extra=rainfall_version)
 def get_rainfall():
     from .alert_service import alert_service
     if alert_service is None:
         return {"error": "Alert service not initialized"}, 500
     return alert_service.get_rainfall_data()
 
+# Loads a facility's personnel, vehicles (with coordinates) and supplies in one SELECT per collection
+FACILITY_RESOURCES_OPTIONS = (
+    selectinload(EmergencyFacility.personnel),
+    selectinload(EmergencyFacility.vehicles).undefer_group('coordinates'),
+    selectinload(EmergencyFacility.supplies)
+)
+MAX_BATCH_FACILITIES = 100
+
+def serialize_facility_resources(facility):
+    """Personnel, vehicle and supply details of an eagerly loaded facility"""
+    personnel_data = [{
+        'id': p.id,
+        'name': p.name,
+        'role': p.role,
+        'skills': p.skills,
+        'status': p.status,
+        'current_assignment': p.current_assignment,
+        'contact': p.contact_number
+    } for p in facility.personnel]
+    
+    vehicles_data = [{
+        'id': v.id,
+        'type': v.vehicle_type,
+        'license_plate': v.license_plate,
+        'current_location': {'lat': v.current_lat, 'lng': v.current_lng} if v.current_lat is not None else None,
+        'status': v.status,
+        'capacity': v.capacity_load,
+        'assigned_to': v.assigned_to
+    } for v in facility.vehicles]
+    
+    supplies_data = [{
+        'id': s.id,
+        'name': s.item_name,
+        'quantity_current': s.quantity_current,
+        'quantity_capacity': s.quantity_capacity,
+        'unit': s.unit,
+        'status': s.status
+    } for s in facility.supplies]
+    
+    return {
+        'facility_id': facility.id,
+        'facility_name': facility.name,
+        'facility_type': facility.type,
+        'personnel': personnel_data,
+        'vehicles': vehicles_data,
+        'supplies': supplies_data
+    }
+
+@app.route('/api/rainfall/history', methods=['GET'])
+@login_required(role=['command', 'admin'])
+@etag_versioned('rainfall_rollups')
+def get_rainfall_history():
+    """
+    Rainfall of one zone served from the rollups, e.g.
+    /api/rainfall/history?zone=4&from=2024-11-30T00:00&to=2024-12-01T00:00&step=1h
+    step is 1h, 6h or 24h; the range defaults to the last 48 buckets (times are UTC).
+    """
+    from .rainfall_store import ROLLUP_STEPS, rainfall_history
+    zone_id = request.args.get('zone', type=int)
+    step = request.args.get('step', '1h')
+    if zone_id is None:
+        return jsonify({'error': 'zone is required'}), 400
+    if step not in ROLLUP_STEPS:
+        return jsonify({'error': f"step must be one of {', '.join(ROLLUP_STEPS)}"}), 400
+    try:
+        end = parse_iso_datetime(request.args['to']) if request.args.get('to') else datetime.utcnow()
+        start = parse_iso_datetime(request.args['from']) if request.args.get('from') \
+            else end - timedelta(hours=48 * ROLLUP_STEPS[step])
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 timestamps'}), 400
+    if start.tzinfo:
+        start = naive_utc(start)
+    if end.tzinfo:
+        end = naive_utc(end)
+
+    try:
+        return jsonify({
+            'zone_id': zone_id,
+            'step': step,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'buckets': rainfall_history(db.session, zone_id, start, end, ROLLUP_STEPS[step])
+        })
+    except Exception as e:
+        logger.error(f"Error fetching rainfall history for zone {zone_id}: {e}")
+        return jsonify({'error': 'Failed to retrieve rainfall history', 'details': str(e)}), 500
+
 @app.route('/api/facilities/<int:facility_id>/resources', methods=['GET'])
 @login_required(role=['command', 'admin'])  # Only command/admin can view detailed resources
+@etag_versioned('emergency_facilities', 'personnel', 'vehicles', 'supply_items', 'vehicle_positions')
 def get_facility_resources(facility_id):
     """
     Retrieves detailed personnel, vehicle, and supply information for a specific facility.
     """
     try:
-        facility = EmergencyFacility.query.get_or_404(facility_id)
-        
-        personnel_data = [{
-            'id': p.id,
-            'name': p.name,
-            'role': p.role,
-            'skills': p.skills,
-            'status': p.status,
-            'current_assignment': p.current_assignment,
-            'contact': p.contact_number
-        } for p in facility.personnel]
-        
-        vehicles_data = []
-        for v in facility.vehicles:
-            vehicle_location = None
-            if v.current_location:
-                try:
-                    vehicle_location = {
-                        'lat': db.session.scalar(func.ST_Y(v.current_location)),
-                        'lng': db.session.scalar(func.ST_X(v.current_location))
-                    }
-                except:
-                    vehicle_location = None
-            
-            vehicles_data.append({
-                'id': v.id,
-                'type': v.vehicle_type,
-                'license_plate': v.license_plate,
-                'current_location': vehicle_location,
-                'status': v.status,
-                'capacity': v.capacity_load,
-                'assigned_to': v.assigned_to
-            })
-        
-        supplies_data = [{
-            'id': s.id,
-            'name': s.item_name,
-            'quantity_current': s.quantity_current,
-            'quantity_capacity': s.quantity_capacity,
-            'unit': s.unit,
-            'status': s.status
-        } for s in facility.supplies]
-        
+        facility = EmergencyFacility.query.options(*FACILITY_RESOURCES_OPTIONS).filter_by(id=facility_id).first_or_404()
+        return jsonify(serialize_facility_resources(facility))
+    except Exception as e:
+        logging.error(f"Error fetching resources for facility {facility_id}: {e}")
+        return jsonify({'error': 'Failed to retrieve facility resources', 'details': str(e)}), 500
+
+@app.route('/api/facilities/resources', methods=['GET'])
+@login_required(role=['command', 'admin'])
+@etag_versioned('emergency_facilities', 'personnel', 'vehicles', 'supply_items', 'vehicle_positions')
+def get_facilities_resources_batch():
+    """
+    Retrieves resources for several facilities at once (e.g., /api/facilities/resources?ids=1,2,3).
+    Costs the same four queries whatever the number of facilities.
+    """
+    try:
+        facility_ids = [int(v) for v in request.args.get('ids', '').split(',') if v.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of facility ids'}), 400
+    if not facility_ids:
+        return jsonify({'error': 'At least one facility id is required'}), 400
+    if len(facility_ids) > MAX_BATCH_FACILITIES:
+        return jsonify({'error': f'At most {MAX_BATCH_FACILITIES} facilities per request'}), 400
+
+    try:
+        facilities = EmergencyFacility.query.options(*FACILITY_RESOURCES_OPTIONS) \
+            .filter(EmergencyFacility.id.in_(facility_ids)).order_by(EmergencyFacility.id).all()
         return jsonify({
-            'facility_id': facility.id,
-            'facility_name': facility.name,
-            'facility_type': facility.type,
-            'personnel': personnel_data,
-            'vehicles': vehicles_data,
-            'supplies': supplies_data
+            'facilities': [serialize_facility_resources(f) for f in facilities],
+            'missing': sorted(set(facility_ids) - {f.id for f in facilities})
         })
     except Exception as e:
-        logging.error(f"Error fetching resources for facility {facility_id}: {e}")
+        logging.error(f"Error fetching resources for facilities {facility_ids}: {e}")
         return jsonify({'error': 'Failed to retrieve facility resources', 'details': str(e)}), 500
     
 #---api endpoints for resources.js---
+def summarize_supplies():
+    supplies_summary_raw = db.session.query(
+        SupplyItem.item_name,
+        func.sum(SupplyItem.quantity_current).label('current'),
+        func.sum(SupplyItem.quantity_capacity).label('total')
+    ).group_by(SupplyItem.item_name).all()
+
+    supplies_data = []
+    for item_name, current, total in supplies_summary_raw:
+        current = current or 0
+        total = total or 0
+        percentage = (current / total * 100) if total > 0 else 0
+        status = 'adequate'
+        if percentage < 60:
+            status = 'low'
+        if percentage < 30:
+            status = 'critical'
+        
+        supplies_data.append({
+            'name': item_name,
+            'current': current,
+            'total': total,
+            'unit': 'units',
+            'status': status,
+            'percentage': round(percentage, 2),
+            'needsReplenishment': True if status in ['low', 'critical'] else False
+        })
+    return supplies_data
+
+def summarize_vehicles():
+    vehicles_summary_raw = db.session.query(
+        Vehicle.vehicle_type,
+        func.count(Vehicle.id).label('total'),
+        func.sum(case((Vehicle.status == 'available', 1), else_=0)).label('available_count')
+    ).group_by(Vehicle.vehicle_type).all()
+    
+    vehicles_data = []
+    for vehicle_type, total, available_count in vehicles_summary_raw:
+        available_count = available_count or 0
+        total = total or 0
+        percentage = (available_count / total * 100) if total > 0 else 0
+        status = 'adequate'
+        if percentage < 60:
+            status = 'low'
+        if percentage < 30:
+            status = 'critical'
+        
+        vehicles_data.append({
+            'name': vehicle_type,
+            'current': available_count,
+            'total': total,
+            'unit': 'vehicles',
+            'status': status,
+            'percentage': round(percentage, 2)
+        })
+    return vehicles_data
+
+def summarize_personnel():
+    personnel_summary_raw = db.session.query(
+        Personnel.role,
+        func.count(Personnel.id).label('total'),
+        func.sum(case((Personnel.status == 'available', 1), else_=0)).label('available_count')
+    ).group_by(Personnel.role).all()
+
+    personnel_data = []
+    for role, total, available_count in personnel_summary_raw:
+        available_count = available_count or 0
+        total = total or 0
+        percentage = (available_count / total * 100) if total > 0 else 0
+        status = 'adequate'
+        if percentage < 60:
+            status = 'low'
+        if percentage < 30:
+            status = 'critical'
+        
+        personnel_data.append({
+            'name': role,
+            'current': available_count,
+            'total': total,
+            'unit': 'people',
+            'status': status,
+            'percentage': round(percentage, 2),
+            'needsReplenishment': True if status in ['low', 'critical'] else False
+        })
+    return personnel_data
+
+def summarize_shelters():
+    # Counts and operational capacity in a single pass over the shelters
+    operational = EmergencyFacility.status == 'operational'
+    total_shelter_facilities, operational_shelter_facilities, total_shelter_capacity_result = db.session.query(
+        func.count(EmergencyFacility.id),
+        func.sum(case((operational, 1), else_=0)),
+        func.sum(case((operational, EmergencyFacility.capacity_overall), else_=0))
+    ).filter(EmergencyFacility.type == 'shelter').one()
+    operational_shelter_facilities = operational_shelter_facilities or 0
+    total_shelter_capacity_result = total_shelter_capacity_result or 0
+
+    shelter_percentage = (operational_shelter_facilities / total_shelter_facilities * 100) if total_shelter_facilities > 0 else 0
+    shelter_status = 'adequate'
+    if shelter_percentage < 60:
+        shelter_status = 'low'
+    return [
+        {
+            'name': 'Evacuation Centers',
+            'current': operational_shelter_facilities,
+            'total': total_shelter_facilities,
+            'unit': 'centers',
+            'status': shelter_status,
+            'percentage': round(shelter_percentage, 2)
+        },
+        {
+            'name': 'Capacity (People)',
+            'current': total_shelter_capacity_result,
+            'total': total_shelter_capacity_result,
+            'unit': 'people',
+            'status': 'adequate',
+            'percentage': 100
+        }
+    ]
+
+class DashboardSummaryCache:
+    """
+    Holds the /api/resourcessummary payload in memory. A commit touching a
+    section's table marks only that section dirty, and the next read rebuilds
+    just the dirty sections. One request rebuilds at a time; concurrent readers
+    keep getting the previous payload instead of queueing on the base tables.
+    get() also returns the table versions each section was built at.
+    """
+    def __init__(self, sections):
+        self.sections = sections # name -> (table, builder)
+        self.data = {} # name -> (table version, payload)
+        self.dirty = set(sections)
+        self.lock = threading.Lock()
+
+    def invalidate(self, tables):
+        for name, (table, _) in self.sections.items():
+            if table in tables:
+                self.dirty.add(name)
+
+    def get(self):
+        if self.dirty:
+            # Only wait for the lock when there is nothing to serve yet
+            if self.lock.acquire(blocking=len(self.data) < len(self.sections)):
+                try:
+                    for name in list(self.dirty):
+                        # Cleared first so a commit landing mid-rebuild marks it dirty again
+                        self.dirty.discard(name)
+                        table, builder = self.sections[name]
+                        # Read before building: the payload is at least this version, never older
+                        version = change_tracker.version(table)
+                        try:
+                            self.data[name] = (version, builder())
+                        except Exception:
+                            self.dirty.add(name)
+                            raise
+                finally:
+                    self.lock.release()
+        data = dict(self.data)
+        versions = {self.sections[name][0]: version for name, (version, _) in data.items()}
+        return {name: payload for name, (_, payload) in data.items()}, versions
+
+dashboard_summary = DashboardSummaryCache({
+    'supplies': ('supply_items', summarize_supplies),
+    'vehicles': ('vehicles', summarize_vehicles),
+    'personnel': ('personnel', summarize_personnel),
+    'shelters': ('emergency_facilities', summarize_shelters)
+})
+change_tracker.subscribe(dashboard_summary.invalidate)
+
 @app.route('/api/resourcessummary', methods=['GET'])
 @login_required(role=['field','command', 'admin'])  
+@etag_versioned('supply_items', 'vehicles', 'personnel', 'emergency_facilities')
 def get_dashboard_summary():
     """
     Provides aggregated summaries for the dashboard: supplies, vehicles, personnel, and shelters.
     This replaces the hardcoded frontend data.
+    Served from DashboardSummaryCache, which only re-queries sections changed since the last read.
     """
     try:
-        # --- Supplies Summary ---
-        supplies_summary_raw = db.session.query(
-            SupplyItem.item_name,
-            func.sum(SupplyItem.quantity_current).label('current'),
-            func.sum(SupplyItem.quantity_capacity).label('total')
-        ).group_by(SupplyItem.item_name).all()
-
-        supplies_data = []
-        for item_name, current, total in supplies_summary_raw:
-            current = current or 0
-            total = total or 0
-            percentage = (current / total * 100) if total > 0 else 0
-            status = 'adequate'
-            if percentage < 60:
-                status = 'low'
-            if percentage < 30:
-                status = 'critical'
-            
-            supplies_data.append({
-                'name': item_name,
-                'current': current,
-                'total': total,
-                'unit': 'units',
-                'status': status,
-                'percentage': round(percentage, 2),
-                'needsReplenishment': True if status in ['low', 'critical'] else False
-            })
-
-        # --- Vehicles Summary ---
-        vehicles_summary_raw = db.session.query(
-            Vehicle.vehicle_type,
-            func.count(Vehicle.id).label('total'),
-            func.sum(case((Vehicle.status == 'available', 1), else_=0)).label('available_count')
-        ).group_by(Vehicle.vehicle_type).all()
-        
-        vehicles_data = []
-        for vehicle_type, total, available_count in vehicles_summary_raw:
-            available_count = available_count or 0
-            total = total or 0
-            percentage = (available_count / total * 100) if total > 0 else 0
-            status = 'adequate'
-            if percentage < 60:
-                status = 'low'
-            if percentage < 30:
-                status = 'critical'
-            
-            vehicles_data.append({
-                'name': vehicle_type,
-                'current': available_count,
-                'total': total,
-                'unit': 'vehicles',
-                'status': status,
-                'percentage': round(percentage, 2)
-            })
-
-        # --- Personnel Summary ---
-        personnel_summary_raw = db.session.query(
-            Personnel.role,
-            func.count(Personnel.id).label('total'),
-            func.sum(case((Personnel.status == 'available', 1), else_=0)).label('available_count')
-        ).group_by(Personnel.role).all()
-
-        personnel_data = []
-        for role, total, available_count in personnel_summary_raw:
-            available_count = available_count or 0
-            total = total or 0
-            percentage = (available_count / total * 100) if total > 0 else 0
-            status = 'adequate'
-            if percentage < 60:
-                status = 'low'
-            if percentage < 30:
-                status = 'critical'
-            
-            personnel_data.append({
-                'name': role,
-                'current': available_count,
-                'total': total,
-                'unit': 'people',
-                'status': status,
-                'percentage': round(percentage, 2),
-                'needsReplenishment': True if status in ['low', 'critical'] else False
-            })
-
-        # --- Shelters Summary ---
-        total_shelter_facilities = EmergencyFacility.query.filter_by(type='shelter').count()
-        operational_shelter_facilities = EmergencyFacility.query.filter_by(type='shelter', status='operational').count()
-        total_shelter_capacity_result = db.session.query(
-            func.sum(EmergencyFacility.capacity_overall)
-        ).filter(EmergencyFacility.type == 'shelter', EmergencyFacility.status == 'operational').scalar() or 0
-
-        shelter_percentage = (operational_shelter_facilities / total_shelter_facilities * 100) if total_shelter_facilities > 0 else 0
-        shelter_status = 'adequate'
-        if shelter_percentage < 60:
-            shelter_status = 'low'
-        shelters_data = [
-            {
-                'name': 'Evacuation Centers',
-                'current': operational_shelter_facilities,
-                'total': total_shelter_facilities,
-                'unit': 'centers',
-                'status': shelter_status,
-                'percentage': round(shelter_percentage, 2)
-            },
-            {
-                'name': 'Capacity (People)',
-                'current': total_shelter_capacity_result,
-                'total': total_shelter_capacity_result,
-                'unit': 'people',
-                'status': 'adequate',
-                'percentage': 100
-            }
-        ]
-
+        summary, g.etag_versions = dashboard_summary.get()
         return jsonify({
-            'supplies': supplies_data,
-            'vehicles': vehicles_data,
-            'personnel': personnel_data,
-            'shelters': shelters_data
+            'supplies': summary['supplies'],
+            'vehicles': summary['vehicles'],
+            'personnel': summary['personnel'],
+            'shelters': summary['shelters']
         })
 
     except Exception as e:
@@ -538,6 +1311,7 @@ def get_dashboard_summary():
     
 @app.route('/api/resources/facilities', methods=['GET'])
 @login_required(role=['command', 'admin','field']) 
+@etag_versioned('emergency_facilities')
 def get_facilities():
     """Get all facilities grouped by type"""
     try:
@@ -583,11 +1357,22 @@ def get_facilities():
 
 @app.route('/api/resources/supplies/<int:facility_id>', methods=['GET'])
 @login_required(role=['command', 'admin','field']) 
+@etag_versioned('emergency_facilities', 'supply_items')
 def get_facility_supplies(facility_id):
-    """Get all supplies for a specific facility"""
+    """
+    Get all supplies for a specific facility.
+    With ?since=<cursor> only rows changed or deleted after the cursor are returned.
+    """
+    try:
+        since, cursor = parse_sync_cursor()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since cursor'}), 400
     try:
         facility = EmergencyFacility.query.get_or_404(facility_id)
-        supplies = SupplyItem.query.filter_by(facility_id=facility_id).all()
+        query = SupplyItem.query.filter_by(facility_id=facility_id)
+        if since:
+            query = query.filter(SupplyItem.last_updated > naive_utc(since))
+        supplies = query.all()
         
         supplies_data = []
         for supply in supplies:
@@ -601,15 +1386,19 @@ def get_facility_supplies(facility_id):
                 'last_updated': supply.last_updated.isoformat() if supply.last_updated else None
             })
         
-        return jsonify({
+        payload = {
             'success': True,
             'facility': {
                 'id': facility.id,
                 'name': facility.name,
                 'type': facility.type
             },
-            'supplies': supplies_data
-        })
+            'supplies': supplies_data,
+            'cursor': cursor
+        }
+        if since:
+            payload['deleted'] = deleted_since('supply_items', since, facility_id)
+        return jsonify(payload)
     
     except Exception as e:
         logging.error(f"Error fetching supplies for facility {facility_id}: {str(e)}")
@@ -633,6 +1422,8 @@ def add_supply_item():
         )
         
         db.session.add(new_supply)
+        db.session.flush()
+        log_supply_quantities([(new_supply.id, new_supply.facility_id, None, new_supply.quantity_current)], 'api')
         db.session.commit()
         
         return jsonify({
@@ -659,6 +1450,7 @@ def update_supply_item(supply_id):
     try:
         supply = SupplyItem.query.get_or_404(supply_id)
         data = request.json
+        quantity_before = supply.quantity_current
         
         supply.item_name = data.get('item_name', supply.item_name)
         supply.quantity_current = data.get('quantity_current', supply.quantity_current)
@@ -666,6 +1458,7 @@ def update_supply_item(supply_id):
         supply.unit = data.get('unit', supply.unit)
         supply.status = data.get('status', supply.status)
         supply.last_updated = datetime.utcnow()
+        log_supply_quantities([(supply.id, supply.facility_id, quantity_before, supply.quantity_current)], 'api')
         
         db.session.commit()
         
@@ -694,11 +1487,22 @@ def delete_supply_item(supply_id):
 
 @app.route('/api/resources/vehicles/<int:facility_id>', methods=['GET'])
 @login_required(role=['command', 'admin','field']) 
+@etag_versioned('emergency_facilities', 'vehicles')
 def get_facility_vehicles(facility_id):
-    """Get all vehicles for a specific facility"""
+    """
+    Get all vehicles for a specific facility.
+    With ?since=<cursor> only rows changed or deleted after the cursor are returned.
+    """
+    try:
+        since, cursor = parse_sync_cursor()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since cursor'}), 400
     try:
         facility = EmergencyFacility.query.get_or_404(facility_id)
-        vehicles = Vehicle.query.filter_by(home_facility_id=facility_id).all()
+        query = Vehicle.query.filter_by(home_facility_id=facility_id)
+        if since:
+            query = query.filter(Vehicle.last_updated > naive_utc(since))
+        vehicles = query.all()
         
         vehicles_data = []
         for vehicle in vehicles:
@@ -712,15 +1516,19 @@ def get_facility_vehicles(facility_id):
                 'last_updated': vehicle.last_updated.isoformat() if vehicle.last_updated else None
             })
         
-        return jsonify({
+        payload = {
             'success': True,
             'facility': {
                 'id': facility.id,
                 'name': facility.name,
                 'type': facility.type
             },
-            'vehicles': vehicles_data
-        })
+            'vehicles': vehicles_data,
+            'cursor': cursor
+        }
+        if since:
+            payload['deleted'] = deleted_since('vehicles', since, facility_id)
+        return jsonify(payload)
     
     except Exception as e:
         logging.error(f"Error fetching vehicles for facility {facility_id}: {str(e)}")
@@ -805,11 +1613,22 @@ def delete_vehicle(vehicle_id):
 
 @app.route('/api/resources/personnel/<int:facility_id>', methods=['GET'])
 @login_required(role=['command', 'admin','field']) 
+@etag_versioned('emergency_facilities', 'personnel')
 def get_facility_personnel(facility_id):
-    """Get all personnel for a specific facility"""
+    """
+    Get all personnel for a specific facility.
+    With ?since=<cursor> only rows changed or deleted after the cursor are returned.
+    """
+    try:
+        since, cursor = parse_sync_cursor()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since cursor'}), 400
     try:
         facility = EmergencyFacility.query.get_or_404(facility_id)
-        personnel = Personnel.query.filter_by(base_facility_id=facility_id).all()
+        query = Personnel.query.filter_by(base_facility_id=facility_id)
+        if since:
+            query = query.filter(Personnel.last_updated > naive_utc(since))
+        personnel = query.all()
         
         personnel_data = []
         for person in personnel:
@@ -824,15 +1643,19 @@ def get_facility_personnel(facility_id):
                 'last_updated': person.last_updated.isoformat() if person.last_updated else None
             })
         
-        return jsonify({
+        payload = {
             'success': True,
             'facility': {
                 'id': facility.id,
                 'name': facility.name,
                 'type': facility.type
             },
-            'personnel': personnel_data
-        })
+            'personnel': personnel_data,
+            'cursor': cursor
+        }
+        if since:
+            payload['deleted'] = deleted_since('personnel', since, facility_id)
+        return jsonify(payload)
     
     except Exception as e:
         logging.error(f"Error fetching personnel for facility {facility_id}: {str(e)}")
@@ -918,8 +1741,213 @@ def delete_personnel(personnel_id):
         logging.error(f"Error deleting personnel {personnel_id}: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+#---bulk endpoints for supplies, vehicles and personnel---
+BULK_MAX_ITEMS = 5000
+# Per resource kind: model, the column the request's facility_id maps to, and writable fields
+BULK_RESOURCES = {
+    'supplies': {
+        'model': SupplyItem,
+        'facility_key': 'facility_id',
+        'required': ['item_name'],
+        'fields': ['item_name', 'quantity_current', 'quantity_capacity', 'unit', 'status'],
+        'integers': ['quantity_current', 'quantity_capacity'],
+        'defaults': {'quantity_current': 0, 'unit': 'units', 'status': 'adequate'}
+    },
+    'vehicles': {
+        'model': Vehicle,
+        'facility_key': 'home_facility_id',
+        'required': ['vehicle_type'],
+        'fields': ['vehicle_type', 'license_plate', 'status', 'capacity_load', 'assigned_to'],
+        'integers': [],
+        'defaults': {'status': 'available'}
+    },
+    'personnel': {
+        'model': Personnel,
+        'facility_key': 'base_facility_id',
+        'required': ['name', 'role'],
+        'fields': ['name', 'role', 'skills', 'status', 'current_assignment', 'contact_number'],
+        'integers': [],
+        'defaults': {'status': 'available'}
+    }
+}
+
+def is_integer(value):
+    """JSON integers only: bool is an int subclass, but true must not be taken as 1"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def validate_bulk_item(config, item, creating):
+    """Returns the column values for one bulk item (with its id when updating), or raises ValueError"""
+    if not isinstance(item, dict):
+        raise ValueError('Item must be an object')
+    values = {field: item[field] for field in config['fields'] if field in item}
+    if creating:
+        missing = [field for field in ['facility_id'] + config['required'] if not item.get(field)]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        values = {**config['defaults'], **values}
+    else:
+        if not is_integer(item.get('id')):
+            raise ValueError('id is required')
+        empty = [field for field in config['required'] if field in values and not values[field]]
+        if empty:
+            raise ValueError(f"Fields cannot be empty: {', '.join(empty)}")
+        # Bulk UPDATE matches rows on the primary key in each parameter set
+        values['id'] = item['id']
+    if 'facility_id' in item:
+        if not is_integer(item['facility_id']):
+            raise ValueError('facility_id must be an integer')
+        values[config['facility_key']] = item['facility_id']
+    for field in config['integers']:
+        value = values.get(field)
+        if value is not None and (not is_integer(value) or value < 0):
+            raise ValueError(f'{field} must be a non-negative integer')
+    values['last_updated'] = datetime.utcnow()
+    return values
+
+def find_rejected_bulk_rows(write, rows):
+    """
+    Replays a batch the database rejected one row at a time, each in a savepoint,
+    and returns {position: error} for the rows that fail. Rows that succeed stay
+    applied, so a duplicate inside the batch is reported on its second occurrence;
+    the caller rolls the whole transaction back afterwards.
+    """
+    errors = {}
+    for position, row in enumerate(rows):
+        savepoint = db.session.begin_nested()
+        try:
+            write([row])
+            savepoint.commit()
+        except (IntegrityError, DataError) as e:
+            savepoint.rollback()
+            errors[position] = str(e.orig).strip().splitlines()[0]
+    return errors
+
+@app.route('/api/resources/<kind>/bulk', methods=['POST', 'PATCH', 'DELETE'])
+@login_required(role=['command', 'admin'])
+def bulk_resources(kind):
+    """
+    Creates (POST {"items": [...]}), updates (PATCH {"items": [{"id": ..}, ...]}) or
+    deletes (DELETE {"ids": [...]}) many supplies, vehicles or personnel at once.
+    The whole batch is validated first and written in one transaction with
+    executemany; the response reports a result per item, in request order.
+    Items the database refuses (e.g. a duplicate license_plate) come back with
+    status 'rejected' and a 409, and nothing is written.
+    """
+    config = BULK_RESOURCES.get(kind)
+    if not config:
+        return jsonify({'success': False, 'error': f'Unknown resource type: {kind}'}), 404
+    model = config['model']
+    table = model.__tablename__
+    facility_column = getattr(model, config['facility_key'])
+    data = request.get_json(silent=True) or {}
+    entries = data.get('ids' if request.method == 'DELETE' else 'items')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'error': 'A non-empty ids/items list is required'}), 400
+    if len(entries) > BULK_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'At most {BULK_MAX_ITEMS} items per request'}), 400
+    # The write statement per method; replayed row by row if the database rejects the batch
+    write = {
+        'POST': lambda batch: db.session.execute(insert(model), batch),
+        'PATCH': lambda batch: db.session.execute(update(model), batch),
+        'DELETE': lambda batch: db.session.execute(delete(model).where(model.id.in_(batch)))
+    }[request.method]
+
+    try:
+        # --- Validate the whole batch before writing anything ---
+        results = [{'index': i} for i in range(len(entries))]
+        rows = []
+        if request.method == 'DELETE':
+            for result, record_id in zip(results, entries):
+                if not is_integer(record_id):
+                    result.update(status='invalid', error='id must be an integer')
+                else:
+                    rows.append(record_id)
+        else:
+            for result, item in zip(results, entries):
+                try:
+                    rows.append(validate_bulk_item(config, item, creating=request.method == 'POST'))
+                except ValueError as e:
+                    result.update(status='invalid', error=str(e))
+
+        facility_ids = {row[config['facility_key']] for row in rows if isinstance(row, dict) and config['facility_key'] in row}
+        if facility_ids:
+            known = {fid for fid, in db.session.query(EmergencyFacility.id).filter(EmergencyFacility.id.in_(facility_ids))}
+            for result, item in zip(results, entries):
+                if 'status' not in result and item.get('facility_id') not in (None, *known):
+                    result.update(status='invalid', error=f"Facility {item['facility_id']} not found")
+
+        existing = {}
+        if request.method != 'POST':
+            ids = rows if request.method == 'DELETE' else [row['id'] for row in rows]
+            existing = dict(db.session.query(model.id, facility_column).filter(model.id.in_(ids)).all())
+            for result, entry in zip(results, entries):
+                if 'status' in result:
+                    continue
+                record_id = entry if request.method == 'DELETE' else entry['id']
+                if record_id not in existing:
+                    result.update(status='not_found', error=f'{kind} {record_id} not found')
+
+        if any('status' in result for result in results):
+            return jsonify({'success': False, 'error': 'Batch rejected, nothing was written', 'results': results}), 400
+
+        # --- Write everything in one transaction ---
+        if request.method == 'POST':
+            new_ids = db.session.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows).all()
+            changes = [row_change(table, new_id, 'created', row, {config['facility_key']: row[config['facility_key']]})
+                       for new_id, row in zip(new_ids, rows)]
+            for result, new_id in zip(results, new_ids):
+                result.update(status='created', id=new_id)
+            if model is SupplyItem:
+                log_supply_quantities([(new_id, row['facility_id'], None, row['quantity_current'])
+                                       for new_id, row in zip(new_ids, rows)], 'bulk')
+        elif request.method == 'PATCH':
+            if model is SupplyItem:
+                quantities = dict(db.session.query(SupplyItem.id, SupplyItem.quantity_current)
+                                  .filter(SupplyItem.id.in_([row['id'] for row in rows])))
+                log_supply_quantities([(row['id'], row.get('facility_id', existing[row['id']]), quantities[row['id']], row['quantity_current'])
+                                       for row in rows if 'quantity_current' in row], 'bulk')
+            write(rows)
+            changes = [row_change(table, row['id'], 'updated', {k: v for k, v in row.items() if k != 'id'},
+                                  {config['facility_key']: row.get(config['facility_key'], existing[row['id']])})
+                       for row in rows]
+            for result, row in zip(results, rows):
+                result.update(status='updated', id=row['id'])
+        else:
+            write(rows)
+            db.session.execute(insert(DeletedRecord), [
+                {'table_name': table, 'record_id': record_id, 'facility_id': existing[record_id]} for record_id in rows
+            ])
+            changes = [row_change(table, record_id, 'deleted', {'id': record_id}, {config['facility_key']: existing[record_id]})
+                       for record_id in rows]
+            for result, record_id in zip(results, rows):
+                result.update(status='deleted', id=record_id)
+
+        change_tracker.record(db.session, *changes)
+        db.session.commit()
+        return jsonify({'success': True, 'results': results})
+
+    except (IntegrityError, DataError) as e:
+        # e.g. a duplicate license_plate: find which items the database refuses
+        db.session.rollback()
+        try:
+            errors = find_rejected_bulk_rows(write, rows)
+        finally:
+            db.session.rollback()
+        results = [{'index': i} for i in range(len(entries))]
+        for position, error in errors.items():
+            results[position].update(status='rejected', error=error)
+        logging.warning(f"Bulk {request.method} of {kind} rejected by the database: {str(e.orig).strip()}")
+        return jsonify({'success': False, 'error': 'Batch rejected, nothing was written',
+                        'details': None if errors else str(e.orig).strip(), 'results': results}), 409
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in bulk {request.method} of {kind}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/resources/shelters', methods=['GET'])
 @login_required(role=['command', 'admin','field']) 
+@etag_versioned('emergency_facilities')
 def get_shelters():
     """Get all shelter facilities"""
     try:
@@ -1022,23 +2050,79 @@ def delete_shelter(shelter_id):
         return jsonify({'success': False, 'error': str(e)}), 500
     
 #---api endpoints for response.js---
+def serialize_response_action(action):
+    return {
+        "id": action.id,
+        "title": action.title,
+        "team": action.team,
+        "location": action.location,
+        "timeframe": action.timeframe,
+        "status": action.status,
+        "created_at": action.created_at.isoformat(),
+        "updated_at": action.updated_at.isoformat()
+    }
+
+RESPONSE_ACTIONS_PAGE_SIZE = 100
+RESPONSE_ACTIONS_MAX_PAGE_SIZE = 500
+
+def encode_page_cursor(action):
+    raw = f"{action.created_at.isoformat()}|{action.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor):
+    """(created_at, id) of the last action on the previous page; raises ValueError"""
+    try:
+        created_at, action_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except Exception:
+        raise ValueError('Invalid page cursor')
+    return datetime.fromisoformat(created_at), int(action_id)
+
 @app.route('/api/response-actions', methods=['GET'])
 @login_required(role=['command', 'admin', 'field']) # Field can view, command/admin can manage
+@etag_versioned('response_actions')
 def get_response_actions():
-    """Get all response actions."""
+    """
+    Get response actions, newest first.
+    Filters: ?status=active,pending&team=Team Alpha&importance=high (comma separated values allowed).
+    Paginated by keyset on (created_at, id): ?limit=100&after=<cursor>, where the cursor
+    for the next page is returned in the X-Next-Cursor header (absent on the last page).
+    With ?since=<cursor> only actions changed or deleted after the cursor are returned.
+    """
     try:
-        # You could add filtering here based on request.args (e.g., status='active', team='Team Alpha')
-        actions = ResponseAction.query.order_by(ResponseAction.created_at.desc()).all()
-        return jsonify([{
-            "id": action.id,
-            "title": action.title,
-            "team": action.team,
-            "location": action.location,
-            "timeframe": action.timeframe,
-            "status": action.status,
-            "created_at": action.created_at.isoformat(),
-            "updated_at": action.updated_at.isoformat()
-        } for action in actions])
+        since, cursor = parse_sync_cursor()
+        limit = min(request.args.get('limit', RESPONSE_ACTIONS_PAGE_SIZE, type=int), RESPONSE_ACTIONS_MAX_PAGE_SIZE)
+        after = decode_page_cursor(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        return jsonify({"error": "Invalid since or after cursor"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    try:
+        query = ResponseAction.query
+        for field in ('status', 'team', 'importance'):
+            values = [v for v in request.args.get(field, '').split(',') if v]
+            if values:
+                query = query.filter(getattr(ResponseAction, field).in_(values))
+        if since:
+            query = query.filter(ResponseAction.updated_at > naive_utc(since))
+            actions = query.order_by(ResponseAction.created_at.desc(), ResponseAction.id.desc()).all()
+            return jsonify({
+                "actions": [serialize_response_action(action) for action in actions],
+                "deleted": deleted_since('response_actions', since),
+                "cursor": cursor
+            })
+
+        if after:
+            query = query.filter(tuple_(ResponseAction.created_at, ResponseAction.id) < tuple_(*after))
+        # One extra row tells whether another page exists
+        actions = query.order_by(ResponseAction.created_at.desc(), ResponseAction.id.desc()).limit(limit + 1).all()
+        has_more = len(actions) > limit
+        actions = actions[:limit]
+
+        response = jsonify([serialize_response_action(action) for action in actions])
+        response.headers['X-Sync-Cursor'] = cursor
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_page_cursor(actions[-1])
+        return response
     except Exception as e:
         logger.error(f"Error fetching response actions: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1061,16 +2145,7 @@ def add_response_action():
         )
         db.session.add(new_action)
         db.session.commit()
-        return jsonify({
-            "id": new_action.id,
-            "title": new_action.title,
-            "team": new_action.team,
-            "location": new_action.location,
-            "timeframe": new_action.timeframe,
-            "status": new_action.status,
-            "created_at": new_action.created_at.isoformat(),
-            "updated_at": new_action.updated_at.isoformat()
-        }), 201
+        return jsonify(serialize_response_action(new_action)), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error adding response action: {e}")
@@ -1094,16 +2169,7 @@ def update_response_action(action_id):
         action.updated_at = datetime.now(pytz.utc) # Manually update updated_at if not handled by onupdate
 
         db.session.commit()
-        return jsonify({
-            "id": action.id,
-            "title": action.title,
-            "team": action.team,
-            "location": action.location,
-            "timeframe": action.timeframe,
-            "status": action.status,
-            "created_at": action.created_at.isoformat(),
-            "updated_at": action.updated_at.isoformat()
-        })
+        return jsonify(serialize_response_action(action))
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating response action {action_id}: {e}")
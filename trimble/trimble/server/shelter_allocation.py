@@ -0,0 +1,142 @@
+# server/shelter_allocation.py
+import threading
+import numpy as np
+from sqlalchemy import text
+
+EARTH_RADIUS_KM = 6371.0
+
+# Zones evacuated when the request doesn't say otherwise
+EVACUATION_LEVELS = ('high', 'extreme')
+
+# Each zone competes for its nearest CANDIDATE_SHELTERS shelters only; zones left
+# with people after that are repaired against their nearest shelters that still have room
+CANDIDATE_SHELTERS = 20
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2):
+    """Great-circle distances (km) between every point of the first set and every point of the second"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lng1, lat2, lng2))
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class AllocationProblem:
+    """Zones, operational shelters and the zone x shelter distance matrix at one data version"""
+
+    def __init__(self, session):
+        zones = session.execute(text("""
+            SELECT id, zone_name, risk_level,
+                   ST_Y(ST_PointOnSurface(geometry)) AS lat, ST_X(ST_PointOnSurface(geometry)) AS lng
+            FROM flood_risk_zones ORDER BY id
+        """)).all()
+        shelters = session.execute(text("""
+            SELECT id, name, capacity_overall, ST_Y(location) AS lat, ST_X(location) AS lng
+            FROM emergency_facilities
+            WHERE type = 'shelter' AND status = 'operational' AND capacity_overall > 0 AND location IS NOT NULL
+            ORDER BY id
+        """)).all()
+        self.zone_ids = np.array([zone.id for zone in zones], dtype=np.int64)
+        self.zone_names = [zone.zone_name for zone in zones]
+        self.zone_levels = np.array([zone.risk_level for zone in zones], dtype=object)
+        self.shelter_ids = np.array([shelter.id for shelter in shelters], dtype=np.int64)
+        self.shelter_names = [shelter.name for shelter in shelters]
+        self.capacity = np.array([shelter.capacity_overall for shelter in shelters], dtype=np.int64)
+        self.distances = haversine_matrix(
+            [zone.lat for zone in zones], [zone.lng for zone in zones],
+            [shelter.lat for shelter in shelters], [shelter.lng for shelter in shelters]
+        )
+
+
+class AllocationCache:
+    """Keeps the latest AllocationProblem, rebuilt only when zones or facilities change"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.token = None
+        self.problem = None
+
+    def get(self, session):
+        token = self.tracker.token('flood_risk_zones', 'emergency_facilities')
+        with self.lock:
+            if self.token != token:
+                self.problem = AllocationProblem(session)
+                self.token = token
+            return self.problem
+
+
+def allocate(problem, populations, levels=EVACUATION_LEVELS):
+    """
+    Assign evacuees of the zones at the given risk levels to shelters within
+    capacity, keeping total person-km low. populations is {zone_id: people}.
+
+    Least-cost greedy: (zone, shelter) pairs over each zone's nearest candidate
+    shelters are filled in order of distance. Repair rounds then place people
+    still waiting (their candidates filled up) in their nearest candidate
+    shelters among those with room left, until nobody waits or no room is left.
+    Returns {'assignments', 'unassigned', 'shelters', totals}.
+    """
+    demand = np.array([populations.get(int(zone_id), 0) for zone_id in problem.zone_ids], dtype=np.int64)
+    demand[~np.isin(problem.zone_levels, list(levels))] = 0
+    # Plain lists: the fill loop touches single elements, which numpy makes slow
+    waiting_people = demand.tolist()
+    room = problem.capacity.tolist()
+    totals = {'waiting': int(demand.sum()), 'room': int(problem.capacity.sum())}
+    assigned = {}
+
+    def fill(zones, shelters):
+        for zone, shelter in zip(zones.tolist(), shelters.tolist()):
+            if waiting_people[zone] == 0 or room[shelter] == 0:
+                continue
+            people = min(waiting_people[zone], room[shelter])
+            waiting_people[zone] -= people
+            room[shelter] -= people
+            assigned[(zone, shelter)] = assigned.get((zone, shelter), 0) + people
+            totals['waiting'] -= people
+            totals['room'] -= people
+            if not totals['waiting'] or not totals['room']:
+                return
+
+    def fill_nearest(zones, shelters):
+        """Fill each zone's k nearest of the given shelters, closest pairs first"""
+        distances = problem.distances[np.ix_(zones, shelters)]
+        k = min(CANDIDATE_SHELTERS, len(shelters))
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=None, kind='stable')
+        fill(zones[order // k], shelters[candidates.ravel()[order]])
+
+    evacuating = np.flatnonzero(demand)
+    if len(evacuating) and len(room):
+        fill_nearest(evacuating, np.arange(len(room)))
+        # Repair: every round assigns at least the closest remaining pair, so this ends
+        while totals['waiting'] and totals['room']:
+            fill_nearest(np.flatnonzero(waiting_people), np.flatnonzero(room))
+
+    demand = np.array(waiting_people, dtype=np.int64)
+    remaining = np.array(room, dtype=np.int64)
+    assignments = [{
+        'zone_id': int(problem.zone_ids[zone]),
+        'zone_name': problem.zone_names[zone],
+        'shelter_id': int(problem.shelter_ids[shelter]),
+        'shelter_name': problem.shelter_names[shelter],
+        'people': people,
+        'distance_km': round(float(problem.distances[zone, shelter]), 3)
+    } for (zone, shelter), people in sorted(assigned.items())]
+    used = problem.capacity - remaining
+    return {
+        'assignments': assignments,
+        'unassigned': [{'zone_id': int(problem.zone_ids[zone]), 'zone_name': problem.zone_names[zone], 'people': int(demand[zone])}
+                       for zone in np.flatnonzero(demand).tolist()],
+        'shelters': [{
+            'shelter_id': int(problem.shelter_ids[shelter]),
+            'shelter_name': problem.shelter_names[shelter],
+            'capacity': int(problem.capacity[shelter]),
+            'assigned': int(used[shelter])
+        } for shelter in np.flatnonzero(used).tolist()],
+        'total_assigned': int(used.sum()),
+        'total_unassigned': int(demand.sum()),
+        'total_person_km': round(sum(a['people'] * a['distance_km'] for a in assignments), 1)
+    }
@@ -0,0 +1,214 @@
+# server/spatial_index.py
+import logging
+import threading
+from collections import defaultdict
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Changed rows are kept in a small overlay next to the (immutable) trees; past
+# this many the trees are rebuilt instead
+MAX_OVERLAY = 256
+
+ZONES_SQL = """
+    SELECT id, zone_name, risk_level, ST_AsBinary(geometry) AS wkb
+    FROM flood_risk_zones
+"""
+FACILITIES_SQL = """
+    SELECT id, name, type, status, ST_Y(location) AS lat, ST_X(location) AS lng
+    FROM emergency_facilities
+"""
+
+
+def unit_vectors(lat, lng):
+    """Points on the unit sphere, so straight-line KD-tree distance orders like great-circle distance"""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lng = np.radians(np.asarray(lng, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def _zone_record(row):
+    geometry = shapely.from_wkb(bytes(row.wkb))
+    shapely.prepare(geometry)
+    return {'id': row.id, 'zone_name': row.zone_name, 'risk_level': row.risk_level, 'geometry': geometry}
+
+
+def _facility_record(row):
+    return {
+        'id': row.id, 'name': row.name, 'type': row.type, 'status': row.status,
+        'lat': row.lat, 'lng': row.lng, 'xyz': unit_vectors([row.lat], [row.lng])[0]
+    }
+
+
+class SpatialIndex:
+    """
+    In-process index answering point-in-zone (STRtree over zone polygons) and
+    nearest-facility (KD-trees over operational facilities, one per type plus
+    one for all types) lookups without a database round trip.
+
+    Rows written through the ORM or change_tracker.record() are reloaded by id
+    into an overlay on the next lookup; any other write to the tables (raw SQL,
+    imports, other workers) triggers a full rebuild.
+    """
+    tables = ('flood_risk_zones', 'emergency_facilities')
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.built_versions = None # table -> tracker version the trees reflect
+        self.accounted = defaultdict(int) # table -> commits since then whose rows are in dirty
+        self.dirty = {table: set() for table in self.tables}
+        self.zone_tree = None
+        self.zone_records = []
+        self.zone_overlay = {} # zone id -> record, or None when deleted
+        self.facility_groups = {} # type (None = all) -> (KD-tree, facility ids)
+        self.facility_records = {}
+        self.facility_overlay = {}
+        tracker.subscribe_rows(self._on_rows)
+
+    def _on_rows(self, changes):
+        with self.lock:
+            touched = set()
+            for change in changes:
+                if change['entity'] in self.dirty and change['id'] is not None:
+                    self.dirty[change['entity']].add(change['id'])
+                    touched.add(change['entity'])
+            for table in touched:
+                self.accounted[table] += 1
+
+    def _needs_rebuild(self):
+        if self.built_versions is None:
+            return True
+        for table in self.tables:
+            # A commit without row deltas (raw SQL, bulk import, another worker) can't be patched in
+            if self.tracker.version(table) - self.built_versions[table] != self.accounted[table]:
+                return True
+        return len(self.zone_overlay) + len(self.facility_overlay) + sum(map(len, self.dirty.values())) > MAX_OVERLAY
+
+    def refresh(self, session):
+        """Bring the index up to date with the database; cheap when nothing changed"""
+        with self.lock:
+            rebuild = self._needs_rebuild()
+            dirty = {table: set(ids) for table, ids in self.dirty.items()}
+        if rebuild:
+            self.rebuild(session)
+        elif any(dirty.values()):
+            self._apply_dirty(session, dirty)
+
+    def rebuild(self, session):
+        versions = {table: self.tracker.version(table) for table in self.tables}
+        zones = [_zone_record(row) for row in session.execute(text(ZONES_SQL))]
+        facilities = [_facility_record(row) for row in session.execute(text(FACILITIES_SQL))
+                      if row.lat is not None and row.status == 'operational']
+
+        zone_tree = shapely.STRtree([zone['geometry'] for zone in zones]) if zones else None
+        groups = {}
+        for facility_type in [None] + sorted({f['type'] for f in facilities}):
+            members = [f for f in facilities if facility_type is None or f['type'] == facility_type]
+            if not members:
+                continue
+            groups[facility_type] = (cKDTree(np.array([f['xyz'] for f in members])), np.array([f['id'] for f in members]))
+
+        with self.lock:
+            self.zone_tree, self.zone_records, self.zone_overlay = zone_tree, zones, {}
+            self.facility_groups = groups
+            self.facility_records = {f['id']: f for f in facilities}
+            self.facility_overlay = {}
+            self.built_versions = versions
+            self.accounted = defaultdict(int)
+            self.dirty = {table: set() for table in self.tables}
+        logger.info(f"Spatial index built: {len(zones)} zones, {len(facilities)} operational facilities")
+
+    def _apply_dirty(self, session, dirty):
+        zone_ids = list(dirty['flood_risk_zones'])
+        facility_ids = list(dirty['emergency_facilities'])
+        zones = {}
+        facilities = {}
+        if zone_ids:
+            rows = session.execute(text(ZONES_SQL + " WHERE id = ANY(:ids)"), {'ids': zone_ids})
+            zones = {row.id: _zone_record(row) for row in rows}
+        if facility_ids:
+            rows = session.execute(text(FACILITIES_SQL + " WHERE id = ANY(:ids)"), {'ids': facility_ids})
+            facilities = {row.id: _facility_record(row) for row in rows if row.lat is not None}
+        with self.lock:
+            for zone_id in zone_ids:
+                self.zone_overlay[zone_id] = zones.get(zone_id)
+            for facility_id in facility_ids:
+                self.facility_overlay[facility_id] = facilities.get(facility_id)
+            self.dirty['flood_risk_zones'].difference_update(zone_ids)
+            self.dirty['emergency_facilities'].difference_update(facility_ids)
+
+    def zones_at(self, lat, lng):
+        """Zones containing the point"""
+        point = shapely.Point(lng, lat)
+        with self.lock:
+            hits = []
+            if self.zone_tree is not None:
+                hits = [self.zone_records[i] for i in self.zone_tree.query(point, predicate='intersects')]
+            hits = [zone for zone in hits if zone['id'] not in self.zone_overlay]
+            hits += [zone for zone in self.zone_overlay.values() if zone and zone['geometry'].intersects(point)]
+        return [{'id': zone['id'], 'zone_name': zone['zone_name'], 'risk_level': zone['risk_level']} for zone in hits]
+
+    def zones_for_points(self, lats, lngs, levels=None):
+        """
+        Zones containing each of many points in one tree query, optionally only
+        zones at the given risk levels. Returns a {zone id: zone} dict per point.
+        """
+        points = shapely.points(np.column_stack((np.asarray(lngs, dtype=float), np.asarray(lats, dtype=float))))
+        found = [{} for _ in range(len(points))]
+
+        def add(position, zone):
+            if levels is None or zone['risk_level'] in levels:
+                found[position][zone['id']] = {'id': zone['id'], 'zone_name': zone['zone_name'], 'risk_level': zone['risk_level']}
+
+        with self.lock:
+            if self.zone_tree is not None and len(points):
+                positions, indices = self.zone_tree.query(points, predicate='intersects')
+                for position, index in zip(positions.tolist(), indices.tolist()):
+                    zone = self.zone_records[index]
+                    if zone['id'] not in self.zone_overlay:
+                        add(position, zone)
+            for zone in self.zone_overlay.values():
+                if zone is not None:
+                    for position in np.flatnonzero(shapely.intersects(zone['geometry'], points)).tolist():
+                        add(position, zone)
+        return found
+
+    def nearest_facilities(self, lat, lng, facility_type=None, k=5):
+        """The k nearest operational facilities (optionally of one type), closest first"""
+        target = unit_vectors([lat], [lng])[0]
+        with self.lock:
+            candidates = []
+            group = self.facility_groups.get(facility_type)
+            if group is not None:
+                tree, ids = group
+                # Over-fetch by the overlay size: overlaid rows are skipped here and re-checked below
+                count = min(len(ids), k + len(self.facility_overlay))
+                if count:
+                    distances, positions = tree.query(target, k=count)
+                    for distance, position in zip(np.atleast_1d(distances), np.atleast_1d(positions)):
+                        facility_id = int(ids[position])
+                        if facility_id not in self.facility_overlay:
+                            candidates.append((distance, self.facility_records[facility_id]))
+            for facility in self.facility_overlay.values():
+                if (facility and facility['status'] == 'operational'
+                        and (facility_type is None or facility['type'] == facility_type)):
+                    candidates.append((np.linalg.norm(facility['xyz'] - target), facility))
+        candidates.sort(key=lambda candidate: candidate[0])
+        return [{
+            'id': facility['id'],
+            'name': facility['name'],
+            'type': facility['type'],
+            'lat': facility['lat'],
+            'lng': facility['lng'],
+            'distance_km': round(float(chord_to_km(distance)), 3)
+        } for distance, facility in candidates[:k]]
@@ -0,0 +1,160 @@
+# server/supply_forecast.py
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import text
+
+# Burn-rate windows in hours; the forecast uses the shortest window with any consumption
+BURN_WINDOWS = (24, 168)
+# Shortest span a rate is averaged over, so a single early reading doesn't look like a huge burn
+MIN_RATE_HOURS = 1.0
+# Each refresh re-reads log rows this recent: ids are taken at insert but rows only become
+# visible at commit, so a slow transaction can commit a lower id after a higher one was read
+REREAD_WINDOW = timedelta(minutes=10)
+
+
+class SupplyForecaster:
+    """
+    Burn rates and time-to-stockout for every supply item, from the
+    supply_quantity_changes log.
+
+    The log is append-only, so each refresh only loads rows stamped since the
+    previous refresh (less REREAD_WINDOW, to catch late commits), skips the ids
+    it already holds and drops rows older than the longest window. Item
+    quantities are reloaded only when supply_items changed. Rates for all items
+    are then recomputed with bincount over the retained events, and the result
+    is cached until new events, an item change or the next minute.
+    """
+
+    def __init__(self, tracker, windows=BURN_WINDOWS):
+        self.tracker = tracker
+        self.windows = tuple(sorted(windows))
+        self.lock = threading.Lock()
+        self.loaded_at = None # time of the previous refresh
+        self.generation = 0 # bumped whenever events are added
+        self.event_ids = np.zeros(0, dtype=np.int64)
+        self.event_items = np.zeros(0, dtype=np.int64)
+        self.event_times = np.zeros(0, dtype='datetime64[s]')
+        self.event_used = np.zeros(0, dtype=float) # units consumed (decreases only)
+        self.items_token = None
+        self.items = None
+        self.result_key = None
+        self.result = None
+
+    def _load_events(self, session, now):
+        horizon = now - timedelta(hours=self.windows[-1])
+        since = horizon if self.loaded_at is None else max(horizon, self.loaded_at - REREAD_WINDOW)
+        rows = session.execute(text("""
+            SELECT id, supply_item_id, changed_at, quantity_before - quantity_after AS used
+            FROM supply_quantity_changes
+            WHERE changed_at >= :since
+              AND quantity_before IS NOT NULL AND quantity_after < quantity_before
+            ORDER BY id
+        """), {'since': since}).all()
+        self.loaded_at = now
+        keep = self.event_times >= np.datetime64(horizon, 's')
+        ids = np.array([row.id for row in rows], dtype=np.int64)
+        new = ~np.isin(ids, self.event_ids[keep])
+        rows = [row for row, is_new in zip(rows, new.tolist()) if is_new]
+        self.event_ids = np.concatenate([self.event_ids[keep], ids[new]])
+        self.event_items = np.concatenate([self.event_items[keep], np.array([row.supply_item_id for row in rows], dtype=np.int64)])
+        self.event_times = np.concatenate([self.event_times[keep], np.array([row.changed_at for row in rows], dtype='datetime64[s]')])
+        self.event_used = np.concatenate([self.event_used[keep], np.array([row.used for row in rows], dtype=float)])
+        if rows:
+            self.generation += 1
+        return len(rows)
+
+    def _load_items(self, session):
+        token = self.tracker.token('supply_items')
+        if token == self.items_token:
+            return
+        rows = session.execute(text("""
+            SELECT s.id, s.facility_id, f.name AS facility_name, s.item_name, s.quantity_current, s.unit,
+                   (SELECT min(c.changed_at) FROM supply_quantity_changes c WHERE c.supply_item_id = s.id) AS first_logged
+            FROM supply_items s LEFT JOIN emergency_facilities f ON f.id = s.facility_id
+            ORDER BY s.id
+        """)).all()
+        self.items = {
+            'ids': np.array([row.id for row in rows], dtype=np.int64),
+            'quantity': np.array([row.quantity_current or 0 for row in rows], dtype=float),
+            'first_logged': np.array([row.first_logged or datetime.utcnow() for row in rows], dtype='datetime64[s]'),
+            'rows': rows
+        }
+        self.items_token = token
+
+    def forecast(self, session):
+        """Per-item burn rates (units/hour per window) and hours to stockout, soonest first"""
+        now = datetime.utcnow().replace(microsecond=0)
+        with self.lock:
+            self._load_events(session, now)
+            self._load_items(session)
+            key = (self.generation, self.items_token, now.replace(second=0))
+            if key != self.result_key:
+                self.result = self._compute(now)
+                self.result_key = key
+            return self.result
+
+    def _compute(self, now):
+        ids = self.items['ids']
+        count = len(ids)
+        if not count:
+            return []
+        now64 = np.datetime64(now, 's')
+        # Event -> item position; events of deleted items fall outside and are dropped
+        positions = np.searchsorted(ids, self.event_items)
+        known = (positions < count) & (ids[np.minimum(positions, count - 1)] == self.event_items)
+        positions, times, used = positions[known], self.event_times[known], self.event_used[known]
+        age_hours = (now64 - self.items['first_logged']).astype(float) / 3600
+
+        rates = {}
+        for window in self.windows:
+            recent = times >= now64 - np.timedelta64(window * 3600, 's')
+            consumed = np.bincount(positions[recent], weights=used[recent], minlength=count)
+            # Items logged for less than the window are averaged over their history only
+            rates[window] = consumed / np.clip(age_hours, MIN_RATE_HOURS, window)
+
+        rate = np.zeros(count)
+        for window in reversed(self.windows):
+            rate = np.where(rates[window] > 0, rates[window], rate)
+        with np.errstate(divide='ignore'):
+            hours_left = np.where(rate > 0, self.items['quantity'] / rate, np.inf)
+
+        results = []
+        for index in np.argsort(hours_left, kind='stable').tolist():
+            row = self.items['rows'][index]
+            hours = float(hours_left[index])
+            finite = np.isfinite(hours)
+            results.append({
+                'supply_id': row.id,
+                'facility_id': row.facility_id,
+                'facility_name': row.facility_name,
+                'item_name': row.item_name,
+                'unit': row.unit,
+                'quantity_current': row.quantity_current,
+                'burn_rates': {f'{window}h': round(float(rates[window][index]), 3) for window in self.windows},
+                'hours_to_stockout': round(hours, 1) if finite else None,
+                'stockout_at': (now + timedelta(hours=hours)).isoformat() if finite else None
+            })
+        return results
+
+
+def summarize_by_facility(items):
+    """Per facility and item name: total quantity and burn rate, and when that total runs out"""
+    groups = {}
+    for item in items:
+        key = (item['facility_id'], item['item_name'])
+        group = groups.setdefault(key, {
+            'facility_id': item['facility_id'],
+            'facility_name': item['facility_name'],
+            'item_name': item['item_name'],
+            'quantity_current': 0,
+            'burn_rate': 0.0,
+            'hours_to_stockout': None
+        })
+        group['quantity_current'] += item['quantity_current'] or 0
+        group['burn_rate'] += next((rate for rate in item['burn_rates'].values() if rate > 0), 0.0)
+    for group in groups.values():
+        group['burn_rate'] = round(group['burn_rate'], 3)
+        if group['burn_rate'] > 0:
+            group['hours_to_stockout'] = round(group['quantity_current'] / group['burn_rate'], 1)
+    return sorted(groups.values(), key=lambda g: (g['hours_to_stockout'] is None, g['hours_to_stockout'] or 0))
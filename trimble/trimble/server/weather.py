@@ -0,0 +1,325 @@
+# server/weather.py
+import abc
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Readings are fetched once per grid cell of this size (degrees); the provider's data is coarser anyway
+LOCATION_PRECISION = 2
+
+
+class RateLimiter:
+    """Async token bucket allowing `rate` calls per second with bursts of `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RainfallProvider(abc.ABC):
+    """
+    Source of rainfall readings (mm over the last hour) for a coordinate.
+    Subclasses implement fetch(); session() supplies the HTTP client that
+    RainfallClient keeps open and passes to every fetch.
+    """
+    name = 'base'
+    concurrency = 10
+    rate_per_second = None # None = no rate limit
+
+    def session(self):
+        """A new HTTP client (created on the fetch loop), or None when fetch() needs none"""
+        return None
+
+    @abc.abstractmethod
+    async def fetch(self, http, lat, lon):
+        """Rainfall in mm for one coordinate; raises on failure"""
+
+
+class OpenWeatherMapProvider(RainfallProvider):
+    name = 'openweathermap'
+    url = 'https://api.openweathermap.org/data/2.5/weather'
+
+    def __init__(self, api_key, concurrency=10, rate_per_second=1.0, timeout=5):
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.timeout = timeout
+
+    def session(self):
+        import aiohttp
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    async def fetch(self, http, lat, lon):
+        params = {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'}
+        async with http.get(self.url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return data.get('rain', {}).get('1h', 0)
+
+
+class StubRainfallProvider(RainfallProvider):
+    """
+    Local provider for tests and offline runs: rainfall comes from a callable
+    (lat, lon) -> mm, or a constant.
+    """
+    name = 'stub'
+
+    def __init__(self, rainfall=0.0, concurrency=50):
+        self.rainfall = rainfall
+        self.concurrency = concurrency
+
+    async def fetch(self, http, lat, lon):
+        return self.rainfall(lat, lon) if callable(self.rainfall) else self.rainfall
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing provider. After `threshold` consecutive failures the
+    circuit opens for a backoff period (doubling on every re-open, up to
+    max_backoff); then one trial call is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=3, backoff=30, max_backoff=900):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.opened_at = None
+        self.opened_wall = None
+        self.current_backoff = backoff
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.current_backoff:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """Whether a call may go out now"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.opened_wall = None
+            self.current_backoff = self.backoff
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial:
+                # The trial call failed: back off for longer
+                self.current_backoff = min(self.current_backoff * 2, self.max_backoff)
+                self._open()
+            elif self.opened_at is None and self.failures >= self.threshold:
+                self._open()
+            self.trial = False
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.opened_wall = datetime.now()
+
+    def retry_at(self):
+        """When the next trial call may go out (None while the circuit is closed)"""
+        if self.opened_wall is None:
+            return None
+        return self.opened_wall + timedelta(seconds=self.current_backoff)
+
+
+class CachedReading:
+    """
+    Stale-while-revalidate holder for a provider reading. get() never waits on
+    the provider: it returns the last good value and, once that is older than
+    max_age, starts a single background refresh (if the circuit allows one).
+    Failures keep the last good value and record the error instead of
+    replacing it with a made-up reading.
+    """
+
+    def __init__(self, fetch, max_age=600, breaker=None):
+        self.fetch = fetch
+        self.max_age = max_age
+        self.breaker = breaker or CircuitBreaker()
+        self.value = None
+        self.updated = None # wall clock time of the last good reading
+        self.fetched_at = None # monotonic time of the last good reading
+        self.error = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > self.max_age
+
+    def get(self):
+        with self.lock:
+            start = self.is_stale() and not self.refreshing and self.breaker.allow()
+            if start:
+                self.refreshing = True
+        if start:
+            threading.Thread(target=self._refresh, name='rainfall-refresh', daemon=True).start()
+        return self.snapshot()
+
+    def refresh(self):
+        """Fetch now (from the poller thread); returns the new value or None"""
+        with self.lock:
+            if self.refreshing or not self.breaker.allow():
+                return None
+            self.refreshing = True
+        return self._refresh()
+
+    def _refresh(self):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            logger.warning(f"Rainfall refresh failed: {e}")
+            self.error = str(e)
+            self.breaker.record_failure()
+            return None
+        else:
+            self.value = value
+            self.updated = datetime.now()
+            self.fetched_at = time.monotonic()
+            self.error = None
+            self.breaker.record_success()
+            return value
+        finally:
+            self.refreshing = False
+
+    def version(self):
+        """Changes whenever the snapshot (apart from its age) does"""
+        return (self.updated, self.error, self.breaker.state, self.is_stale())
+
+    def snapshot(self):
+        return {
+            'value': self.value,
+            'last_updated': self.updated.isoformat() if self.updated else None,
+            'stale': self.is_stale(),
+            'error': self.error,
+            'circuit': self.breaker.state,
+            'retry_at': self.breaker.retry_at().isoformat() if self.breaker.retry_at() else None
+        }
+
+
+def provider_from_env():
+    """RAINFALL_PROVIDER=stub selects the stub (STUB_RAINFALL_MM sets its value); otherwise OpenWeatherMap"""
+    if os.getenv('RAINFALL_PROVIDER', 'openweathermap') == 'stub':
+        return StubRainfallProvider(float(os.getenv('STUB_RAINFALL_MM', '0')))
+    api_key = os.getenv('OPENWEATHER_API_KEY')
+    if not api_key:
+        return None
+    return OpenWeatherMapProvider(
+        api_key,
+        concurrency=int(os.getenv('OPENWEATHER_CONCURRENCY', '10')),
+        rate_per_second=float(os.getenv('OPENWEATHER_RATE_LIMIT', '1.0'))
+    )
+
+
+async def fetch_rainfall(provider, locations, http=None):
+    """
+    Fetch rainfall for many locations ({key: (lat, lon)}) concurrently, at most
+    provider.concurrency requests in flight and within the provider's rate limit.
+    Locations sharing a grid cell share one request. Returns {key: mm or None}.
+    http is the client from provider.session(); see RainfallClient.
+    """
+    cells = {}
+    for key, (lat, lon) in locations.items():
+        cells.setdefault((round(lat, LOCATION_PRECISION), round(lon, LOCATION_PRECISION)), []).append(key)
+
+    semaphore = asyncio.Semaphore(provider.concurrency)
+    limiter = RateLimiter(provider.rate_per_second) if provider.rate_per_second else None
+
+    async def fetch_cell(cell):
+        async with semaphore:
+            if limiter:
+                await limiter.acquire()
+            try:
+                return await provider.fetch(http, *cell)
+            except Exception as e:
+                logger.warning(f"{provider.name} rainfall fetch failed for {cell}: {e}")
+                return None
+
+    values = await asyncio.gather(*(fetch_cell(cell) for cell in cells))
+    return {key: value for cell, value in zip(cells, values) for key in cells[cell]}
+
+
+class RainfallClient:
+    """
+    Runs fetch_rainfall for a provider on one long-lived event loop in a daemon
+    thread. The provider's HTTP session lives on that loop, so its connection
+    pool is reused from one poll cycle to the next instead of being rebuilt
+    (and the TLS handshakes repeated) on every cycle. fetch() blocks the caller.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.loop = None
+        self.http = None # only touched on the loop
+        self.lock = threading.Lock()
+
+    def _loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name='rainfall-http', daemon=True).start()
+            return self.loop
+
+    async def _fetch(self, locations):
+        if self.http is None or getattr(self.http, 'closed', False):
+            self.http = self.provider.session()
+        return await fetch_rainfall(self.provider, locations, self.http)
+
+    def fetch(self, locations):
+        """{key: mm or None} for {key: (lat, lon)}"""
+        return asyncio.run_coroutine_threadsafe(self._fetch(locations), self._loop()).result()
+
+    def close(self):
+        """Close the HTTP session and stop the loop"""
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+
+        async def shutdown():
+            if self.http is not None:
+                await self.http.close()
+                self.http = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
@@ -1,11 +1,12 @@
 // src/App.js
 import React from 'react';
-import { BrowserRouter as Router, Routes, Route, Navigate } from 'react-router-dom';
+import { BrowserRouter as Router, Routes, Route, Navigate, useLocation } from 'react-router-dom';
 import Login from './components/Login';
 import Dashboard from './components/Dashboard';
 import MapViewer from './components/MapViewer';
 import Resources from './components/Resources';
 import Response from './components/Response';
+import AlertSystem from './components/AlertBar';
 
 // Role-based wrapper component
 const RoleRoute = ({ children, allowedRoles }) => {
@@ -16,9 +17,21 @@ const RoleRoute = ({ children, allowedRoles }) => {
   return children;
 };
 
+// Live alerts on every page once signed in: command/admin get every zone's alerts,
+// field devices the alerts of the zones they are in
+const Alerts = () => {
+  const location = useLocation();
+  const user = JSON.parse(localStorage.getItem('user'));
+  if (!user || location.pathname === '/') {
+    return null;
+  }
+  return <AlertSystem followLocation={user.role === 'field'} />;
+};
+
 function App() {
   return (
     <Router>
+      <Alerts />
       <Routes>
         <Route path="/" element={<Login />} />
         <Route path="/dashboard" element={<Dashboard />} />
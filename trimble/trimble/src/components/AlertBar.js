@@ -1,12 +1,59 @@
 // src/components/AlertBar.js
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { io } from 'socket.io-client';
 
-const AlertSystem = () => {
+// Zone alerts and geofence events can arrive through both a zone room and a role room
+const alertKey = (alert) => `${alert.zone_id}|${alert.severity}|${alert.timestamp}`;
+const geofenceKey = (t) => `geofence|${t.vehicle_id}|${t.zone_id}|${t.event}|${t.recorded_at}`;
+
+// Ids of the flood zones the device is in, looked up again whenever it moves ~100 m
+const useLocationZones = (enabled) => {
+  const [zones, setZones] = useState([]);
+
+  useEffect(() => {
+    if (!enabled || !navigator.geolocation) {
+      return undefined;
+    }
+    let lastKey = null;
+    const watchId = navigator.geolocation.watchPosition(async ({ coords }) => {
+      const key = `${coords.latitude.toFixed(3)},${coords.longitude.toFixed(3)}`;
+      if (key === lastKey) {
+        return;
+      }
+      lastKey = key;
+      try {
+        const response = await fetch(`/api/zones/at?lat=${coords.latitude}&lng=${coords.longitude}`, {
+          credentials: 'include'
+        });
+        if (response.ok) {
+          const data = await response.json();
+          setZones(data.zones.map(zone => zone.id));
+        }
+      } catch (error) {
+        console.error('Error looking up zones for alerts:', error);
+      }
+    }, (error) => {
+      console.error('Location unavailable for zone alerts:', error.message);
+    }, { maximumAge: 60000 });
+    return () => navigator.geolocation.clearWatch(watchId);
+  }, [enabled]);
+
+  return zones;
+};
+
+// zones: ids of the flood zones this user watches (viewport or assignment);
+// followLocation: watch the zones the device is in instead (field devices)
+const AlertSystem = ({ zones = [], followLocation = false }) => {
   const [alerts, setAlerts] = useState([]);
+  const socketRef = useRef(null);
+  const seenRef = useRef(new Set());
+  const locationZones = useLocationZones(followLocation);
+  const zoneKey = (followLocation ? locationZones : zones).join(',');
 
   useEffect(() => {
-    const socket = io('http://localhost:5001/alerts');
+    // Credentials let the server put this socket in its role room
+    const socket = io('http://localhost:5001/alerts', { withCredentials: true });
+    socketRef.current = socket;
     
     socket.on('alert', (alert) => {
       setAlerts(prev => [alert, ...prev.slice(0, 5)]);
@@ -19,9 +66,64 @@ const AlertSystem = () => {
       }
     });
 
-    return () => socket.disconnect();
+    // Zone alerts arrive batched, one event per alert cycle
+    socket.on('zone_alerts', (incoming) => {
+      const zoneAlerts = incoming.filter(alert => !seenRef.current.has(alertKey(alert)));
+      if (zoneAlerts.length === 0) {
+        return;
+      }
+      if (seenRef.current.size > 1000) {
+        seenRef.current.clear();
+      }
+      zoneAlerts.forEach(alert => seenRef.current.add(alertKey(alert)));
+      setAlerts(prev => [...zoneAlerts, ...prev].slice(0, 6));
+
+      if (Notification.permission === 'granted' && zoneAlerts.length > 0) {
+        new Notification('Flood Alert', {
+          body: zoneAlerts.length === 1 ? zoneAlerts[0].message : `${zoneAlerts.length} zones at high flood risk`
+        });
+      }
+    });
+
+    // Vehicles entering or leaving high/extreme zones (command/admin, and watchers of the zone)
+    socket.on('geofence', (transitions) => {
+      const entries = transitions.filter(t => t.event === 'enter' && !seenRef.current.has(geofenceKey(t)));
+      entries.forEach(t => seenRef.current.add(geofenceKey(t)));
+      const vehicleAlerts = entries.map(t => ({
+        severity: t.risk_level,
+        message: `Vehicle ${t.vehicle_id} entered ${t.zone_name} (${t.risk_level} risk)`,
+        timestamp: t.recorded_at,
+        recommendation: 'Confirm the crew is aware of the flood risk'
+      }));
+      if (vehicleAlerts.length > 0) {
+        setAlerts(prev => [...vehicleAlerts, ...prev].slice(0, 6));
+      }
+    });
+
+    return () => {
+      socketRef.current = null;
+      socket.disconnect();
+    };
   }, []);
 
+  // Join the rooms of the watched zones; rooms are dropped on reconnect, so join again then
+  useEffect(() => {
+    const socket = socketRef.current;
+    const ids = zoneKey ? zoneKey.split(',').map(Number) : [];
+    if (!socket || ids.length === 0) {
+      return undefined;
+    }
+    const subscribe = () => socket.emit('subscribe_zones', { zones: ids });
+    if (socket.connected) {
+      subscribe();
+    }
+    socket.on('connect', subscribe);
+    return () => {
+      socket.off('connect', subscribe);
+      socket.emit('unsubscribe_zones', { zones: ids });
+    };
+  }, [zoneKey]);
+
   return (
     <div className="alert-container">
       {alerts.map((alert, i) => (
@@ -33,4 +135,6 @@ const AlertSystem = () => {
       ))}
     </div>
   );
-};
\ No newline at end of file
+};
+
+export default AlertSystem;
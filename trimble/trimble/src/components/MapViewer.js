@@ -722,13 +722,22 @@ export default function MapViewer() {
                 status: 'DATA ERROR',
                 detail: 'Check connection'
             };
+        } else if (rainData && rainData.rain_last_hour == null) {
+            return {
+                icon: '❔',
+                text: 'No rainfall reading yet',
+                status: 'NO DATA',
+                detail: rainData.provider_error || null
+            };
         } else if (rainData) {
             const icon = rainData.rain_last_hour > 10 ? '⚠️' : rainData.rain_last_hour > 5 ? '🟠' : '✅';
             return {
                 icon: icon,
                 text: `Rainfall: ${rainData.rain_last_hour} mm/h`,
                 status: rainData.forecast?.risk?.toUpperCase() || 'MONITORING',
-                detail: rainData.forecast?.action || null
+                detail: rainData.stale
+                    ? `Last reading ${rainData.last_updated ? new Date(rainData.last_updated).toLocaleTimeString() : ''} (provider ${rainData.circuit === 'closed' ? 'refreshing' : 'unavailable'})`
+                    : rainData.forecast?.action || null
             };
         } else {
             return {
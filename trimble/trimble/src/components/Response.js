@@ -59,23 +59,32 @@ const Response = () => {
     }
   };
         
-  // Fetch actions from API
+  // Fetch actions from API, following X-Next-Cursor until the last page
   const fetchActions = async () => {
     setLoading(true);
     try {
-      const response = await fetch('/api/response-actions', {
-        method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-      });
-     
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-     
-      const data = await response.json();
-      setActiveActions(data);
+      const actions = [];
+      let after = null;
+      do {
+        const url = after
+          ? `/api/response-actions?limit=500&after=${encodeURIComponent(after)}`
+          : '/api/response-actions?limit=500';
+        const response = await fetch(url, {
+          method: 'GET',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+        });
+
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        actions.push(...await response.json());
+        after = response.headers.get('X-Next-Cursor');
+      } while (after);
+
+      setActiveActions(actions);
       setError('');
     } catch (err) {
       console.error('Error fetching actions:', err);
@@ -0,0 +1,74 @@
+# tests/test_gps.py
+"""GPS fix parsing and the GpsBuffer retry bookkeeping (no database needed)"""
+from datetime import datetime
+import pytest
+
+try:
+    from server.gps import GpsBuffer, MAX_VEHICLE_ID, parse_fix
+except ImportError as e: # missing dependencies
+    pytest.skip(f"gps module not importable: {e}", allow_module_level=True)
+
+
+def test_parse_fix_normalizes_timestamps_to_naive_utc():
+    fix = parse_fix({'vehicle_id': '3', 'lat': 13.08, 'lng': 80.27, 'timestamp': '2024-11-30T10:15:02+05:30',
+                     'speed': 12.5, 'heading': 270})
+    assert fix == (3, 13.08, 80.27, datetime(2024, 11, 30, 4, 45, 2), 12.5, 270.0)
+    assert parse_fix({'vehicle_id': 3, 'lat': 0, 'lng': 0, 'timestamp': '2024-11-30T10:15:02Z'})[3] \
+        == datetime(2024, 11, 30, 10, 15, 2)
+    assert parse_fix({'vehicle_id': 3, 'lat': 0, 'lng': 0, 'timestamp': 0})[3] == datetime(1970, 1, 1)
+    assert parse_fix({'vehicle_id': 3, 'lat': 0, 'lng': 0})[4:] == (None, None)
+
+
+@pytest.mark.parametrize('fix', [
+    None,
+    [3, 13.08, 80.27],
+    {'lat': 13.08, 'lng': 80.27},
+    {'vehicle_id': True, 'lat': 13.08, 'lng': 80.27},
+    {'vehicle_id': 0, 'lat': 13.08, 'lng': 80.27},
+    {'vehicle_id': MAX_VEHICLE_ID + 1, 'lat': 13.08, 'lng': 80.27},
+    {'vehicle_id': 3, 'lat': 91, 'lng': 80.27},
+    {'vehicle_id': 3, 'lat': 13.08, 'lng': 'east'},
+    {'vehicle_id': 3, 'lat': 13.08, 'lng': 80.27, 'speed': float('nan')},
+    {'vehicle_id': 3, 'lat': 13.08, 'lng': 80.27, 'heading': 'inf'},
+    {'vehicle_id': 3, 'lat': 13.08, 'lng': 80.27, 'timestamp': 'yesterday'},
+    {'vehicle_id': 3, 'lat': 13.08, 'lng': 80.27, 'timestamp': 1e20}
+])
+def test_parse_fix_rejects_invalid_fixes(fix):
+    assert parse_fix(fix) is None
+
+
+class FailingSession:
+    """Stands in for db.session with a database that rejects every write"""
+
+    def __init__(self):
+        self.rollbacks = 0
+
+    def execute(self, *args, **kwargs):
+        raise RuntimeError('database unavailable')
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_add_counts_rejected_fixes_and_refuses_when_full():
+    buffer = GpsBuffer(max_buffered=2)
+    assert buffer.add([{'vehicle_id': 1, 'lat': 0, 'lng': 0}, {'vehicle_id': 1}]) == (1, 1)
+    assert buffer.add([{'vehicle_id': 2, 'lat': 0, 'lng': 0}] * 2) is None
+    assert buffer.buffered() == 1
+
+
+def test_failed_flushes_are_retried_then_dropped():
+    buffer = GpsBuffer(max_attempts=3)
+    buffer.add([{'vehicle_id': 1, 'lat': 0, 'lng': 0}, {'vehicle_id': 2, 'lat': 0, 'lng': 0}])
+    session = FailingSession()
+    for attempt in range(2):
+        with pytest.raises(RuntimeError):
+            buffer.flush(session)
+        assert buffer.buffered() == 2
+    buffer.add([{'vehicle_id': 3, 'lat': 0, 'lng': 0}])
+    with pytest.raises(RuntimeError):
+        buffer.flush(session)
+    # The first batch has failed three times; the newer fix gets more attempts
+    assert buffer.dropped == 2
+    assert buffer.buffered() == 1
+    assert session.rollbacks == 3
@@ -0,0 +1,71 @@
+# tests/test_grid_aggregate.py
+"""Square-grid binning and totals (no database needed)"""
+from types import SimpleNamespace
+import pytest
+
+try:
+    import numpy as np
+    from server.grid_aggregate import METRICS, build_grid, grid_span
+except ImportError as e: # missing dependencies
+    pytest.skip(f"grid aggregation not importable: {e}", allow_module_level=True)
+
+
+def make_points(facilities=(), vehicles=()):
+    """facilities: (lat, lng, is_shelter, personnel, supply_units); vehicles: (lat, lng)"""
+    facilities = np.array(facilities, dtype=float).reshape(-1, 5)
+    vehicles = np.array(vehicles, dtype=float).reshape(-1, 2)
+    return SimpleNamespace(
+        facility_lat=facilities[:, 0], facility_lng=facilities[:, 1], shelter=facilities[:, 2],
+        personnel=facilities[:, 3], supply_units=facilities[:, 4],
+        vehicle_lat=vehicles[:, 0], vehicle_lng=vehicles[:, 1]
+    )
+
+
+def as_cells(grid):
+    cols, rows, totals = grid
+    return {(int(col), int(row)): {metric: int(totals[metric][i]) for metric in METRICS}
+            for i, (col, row) in enumerate(zip(cols, rows))}
+
+
+def test_totals_per_cell():
+    points = make_points(
+        facilities=[(13.081, 80.271, 1, 4, 100), (13.089, 80.279, 0, 2, 50), (13.101, 80.271, 1, 0, 0)],
+        vehicles=[(13.085, 80.275), (13.085, 80.275), (13.201, 80.201)]
+    )
+    cells = as_cells(build_grid(points, 0.01))
+    assert cells == {
+        (8027, 1308): {'facilities': 2, 'shelters': 1, 'available_vehicles': 2, 'personnel': 6, 'supply_units': 150},
+        (8027, 1310): {'facilities': 1, 'shelters': 1, 'available_vehicles': 0, 'personnel': 0, 'supply_units': 0},
+        (8020, 1320): {'facilities': 0, 'shelters': 0, 'available_vehicles': 1, 'personnel': 0, 'supply_units': 0}
+    }
+
+
+def test_negative_coordinates_bin_downwards():
+    cells = as_cells(build_grid(make_points(vehicles=[(-0.5, -0.5), (0.5, 0.5)]), 1.0))
+    assert set(cells) == {(-1, -1), (0, 0)}
+
+
+def test_totals_match_inputs_on_random_points():
+    rng = np.random.default_rng(7)
+    count = 5000
+    facilities = np.column_stack((rng.uniform(12.8, 13.3, count), rng.uniform(80.0, 80.4, count),
+                                  rng.integers(0, 2, count), rng.integers(0, 20, count), rng.integers(0, 500, count)))
+    vehicles = np.column_stack((rng.uniform(12.8, 13.3, count), rng.uniform(80.0, 80.4, count)))
+    cols, rows, totals = build_grid(make_points(facilities, vehicles), 0.05)
+    assert len(set(zip(cols.tolist(), rows.tolist()))) == len(cols)
+    assert totals['facilities'].sum() == count
+    assert totals['available_vehicles'].sum() == count
+    assert totals['shelters'].sum() == facilities[:, 2].sum()
+    assert totals['supply_units'].sum() == facilities[:, 4].sum()
+
+
+def test_empty_dataset():
+    cols, rows, totals = build_grid(make_points(), 0.01)
+    assert len(cols) == len(rows) == 0
+    assert all(len(totals[metric]) == 0 for metric in METRICS)
+
+
+def test_grid_span():
+    assert grid_span([80.005, 13.005, 80.095, 13.045], 0.01) == 50
+    assert grid_span([80.005, 13.005, 80.005, 13.005], 0.01) == 1
+    assert grid_span([-180, -90, 180, 90], 0.001) > 10_000
@@ -0,0 +1,124 @@
+# tests/test_rainfall_cache.py
+"""CircuitBreaker and stale-while-revalidate CachedReading, fed by the stub provider (no network needed)"""
+import threading
+import time
+import pytest
+
+from server.weather import CachedReading, CircuitBreaker, RainfallClient, StubRainfallProvider
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail('timed out waiting for the background refresh')
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def client():
+    """RainfallClient over a stub whose reading the test can change, hold back (gate) or make fail"""
+    state = {'mm': 3.0, 'fail': False, 'gate': threading.Event()}
+    state['gate'].set()
+
+    def rainfall(lat, lon):
+        state['gate'].wait(5)
+        if state['fail']:
+            raise RuntimeError('provider down')
+        return state['mm']
+
+    client = RainfallClient(StubRainfallProvider(rainfall))
+    client.state = state
+    yield client
+    client.close()
+
+
+def city_fetch(client):
+    """Like AlertService.fetch_city_rainfall: a failed request is an error, not a reading"""
+    def fetch():
+        value = client.fetch({'city': (13.08, 80.27)})['city']
+        if value is None:
+            raise RuntimeError('no reading')
+        return value
+    return fetch
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_backoff():
+    breaker = CircuitBreaker(threshold=2, backoff=0.05, max_backoff=1)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    assert breaker.retry_at() is not None
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    assert breaker.allow() # the single trial call
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.retry_at() is None
+
+
+def test_failed_trial_doubles_the_backoff():
+    breaker = CircuitBreaker(threshold=1, backoff=0.05, max_backoff=0.15)
+    breaker.record_failure()
+    for expected in (0.1, 0.15, 0.15):
+        time.sleep(breaker.current_backoff + 0.01)
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == 'open'
+        assert breaker.current_backoff == pytest.approx(expected)
+
+
+def test_get_serves_the_last_value_and_refreshes_in_the_background(client):
+    reading = CachedReading(city_fetch(client), max_age=0.2)
+    client.state['gate'].clear()
+    first = reading.get()
+    assert first['value'] is None and first['stale']
+    client.state['gate'].set()
+    wait_for(lambda: reading.value == 3.0)
+    assert not reading.get()['stale']
+
+    client.state['mm'] = 9.0
+    client.state['gate'].clear()
+    time.sleep(0.25)
+    stale = reading.get()
+    assert stale['value'] == 3.0 and stale['stale'] # served at once, without waiting on the provider
+    client.state['gate'].set()
+    wait_for(lambda: reading.value == 9.0)
+
+
+def test_failures_keep_the_last_good_value_and_open_the_circuit(client):
+    breaker = CircuitBreaker(threshold=2, backoff=60)
+    reading = CachedReading(city_fetch(client), max_age=0, breaker=breaker)
+    assert reading.refresh() == 3.0
+
+    client.state['fail'] = True
+    assert reading.refresh() is None
+    assert reading.refresh() is None
+    snapshot = reading.snapshot()
+    assert snapshot['value'] == 3.0
+    assert snapshot['error'] and snapshot['circuit'] == 'open' and snapshot['retry_at']
+    # While open, nothing is sent to the provider
+    assert reading.refresh() is None
+    assert breaker.failures == 2
+
+
+def test_only_one_refresh_runs_at_a_time():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 1.0
+
+    reading = CachedReading(slow_fetch, max_age=0)
+    reading.get()
+    assert started.wait(5)
+    for _ in range(5):
+        reading.get()
+    release.set()
+    wait_for(lambda: reading.value == 1.0)
+    assert len(calls) == 1
@@ -0,0 +1,98 @@
+# tests/test_rainfall_providers.py
+"""Concurrent rainfall ingestion driven by the stub provider (no database or network needed)"""
+import asyncio
+import threading
+import pytest
+
+from server.weather import RainfallClient, RainfallProvider, StubRainfallProvider, fetch_rainfall, provider_from_env
+
+
+class CountingProvider(StubRainfallProvider):
+    """Stub that records every call and how many ran at once"""
+
+    def __init__(self, rainfall=0.0, concurrency=50, fail=()):
+        super().__init__(rainfall, concurrency)
+        self.fail = set(fail)
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    async def fetch(self, http, lat, lon):
+        with self.lock:
+            self.calls.append((lat, lon))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if (lat, lon) in self.fail:
+                raise RuntimeError('provider error')
+            return await super().fetch(http, lat, lon)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_provider_must_implement_fetch():
+    with pytest.raises(TypeError):
+        RainfallProvider()
+
+
+def test_locations_in_one_cell_share_a_request():
+    provider = CountingProvider(rainfall=lambda lat, lon: lat)
+    readings = asyncio.run(fetch_rainfall(provider, {1: (13.081, 80.271), 2: (13.0812, 80.2709), 3: (13.5, 80.5)}))
+    assert readings == {1: 13.08, 2: 13.08, 3: 13.5}
+    assert sorted(provider.calls) == [(13.08, 80.27), (13.5, 80.5)]
+
+
+def test_failures_are_none_and_concurrency_is_bounded():
+    provider = CountingProvider(rainfall=4.2, concurrency=3, fail={(13.0, 80.0)})
+    locations = {zone: (13 + zone / 10, 80 + zone / 10) for zone in range(20)}
+    readings = asyncio.run(fetch_rainfall(provider, locations))
+    assert readings[0] is None
+    assert all(readings[zone] == 4.2 for zone in range(1, 20))
+    assert provider.peak <= 3
+
+
+class FakeSession:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_client_reuses_one_loop_and_session():
+    sessions = []
+
+    class SessionProvider(StubRainfallProvider):
+        def session(self):
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        async def fetch(self, http, lat, lon):
+            assert http is sessions[-1]
+            return 1.0
+
+    client = RainfallClient(SessionProvider())
+    assert client.fetch({1: (13.0, 80.0)}) == {1: 1.0}
+    loop = client.loop
+    assert client.fetch({2: (13.1, 80.1)}) == {2: 1.0}
+    assert client.loop is loop
+    assert len(sessions) == 1
+    client.close()
+    assert sessions[0].closed
+
+
+def test_client_close_stops_the_loop():
+    client = RainfallClient(StubRainfallProvider(2.5))
+    assert client.fetch({1: (13.0, 80.0)}) == {1: 2.5}
+    client.close()
+    assert client.loop is None
+
+
+def test_provider_from_env_selects_the_stub(monkeypatch):
+    monkeypatch.setenv('RAINFALL_PROVIDER', 'stub')
+    monkeypatch.setenv('STUB_RAINFALL_MM', '7.5')
+    provider = provider_from_env()
+    assert isinstance(provider, StubRainfallProvider)
+    assert asyncio.run(fetch_rainfall(provider, {1: (13.0, 80.0)})) == {1: 7.5}
@@ -0,0 +1,61 @@
+# tests/test_risk_engine.py
+"""RiskEngine classification and threshold overrides (no database needed)"""
+import pytest
+
+try:
+    import numpy as np
+    from server.risk_engine import RiskEngine, RISK_LEVELS, DEFAULT_THRESHOLDS
+except ImportError as e: # missing dependencies
+    pytest.skip(f"risk engine not importable: {e}", allow_module_level=True)
+
+
+def levels(engine, **windows):
+    return RISK_LEVELS[engine.classify({window: np.array(values, dtype=float) for window, values in windows.items()})].tolist()
+
+
+def test_rate_thresholds_are_exclusive_lower_bounds():
+    engine = RiskEngine()
+    assert levels(engine, rate=[0, 5, 5.1, 10.5, 20, 25]) == ['low', 'low', 'moderate', 'high', 'high', 'extreme']
+
+
+def test_highest_window_wins_and_missing_data_is_low():
+    engine = RiskEngine()
+    assert levels(engine, rate=[1, np.nan, np.nan], **{'6h': [80, np.nan, 10], '24h': [np.nan, 300, np.nan]}) \
+        == ['high', 'extreme', 'low']
+
+
+def test_classify_one():
+    assert RiskEngine().classify_one(12) == 'high'
+
+
+def test_partial_override_keeps_other_windows():
+    engine = RiskEngine({'rate': [1, 2, 3]})
+    assert levels(engine, rate=[2.5], **{'6h': [50], '24h': [0]}) == ['high']
+    assert engine.thresholds['6h'].tolist() == list(DEFAULT_THRESHOLDS['6h'])
+
+
+def test_from_env_merges_override(monkeypatch):
+    monkeypatch.setenv('RISK_THRESHOLDS', '{"24h": [10, 20, 30]}')
+    engine = RiskEngine.from_env()
+    assert engine.classify_one(6) == 'moderate'
+    assert levels(engine, **{'24h': [25]}) == ['high']
+
+
+@pytest.mark.parametrize('thresholds', [
+    {'rate': [5, 10]},
+    {'rate': [5, 20, 10]},
+    {'rate': [5, 5, 10]},
+    {'rate': [5, 10, 'heavy']},
+    {'rate': [5, 10, float('nan')]},
+    {'1h': [5, 10, 20]}
+])
+def test_invalid_thresholds_are_rejected(thresholds):
+    with pytest.raises(ValueError):
+        RiskEngine(thresholds)
+
+
+@pytest.mark.parametrize('raw', ['{"rate": [5, 10', '[5, 10, 20]', '{"rate": [20, 10, 5]}'])
+def test_from_env_reports_invalid_override(monkeypatch, raw):
+    monkeypatch.setenv('RISK_THRESHOLDS', raw)
+    with pytest.raises(ValueError, match='RISK_THRESHOLDS'):
+        RiskEngine.from_env()
@@ -0,0 +1,70 @@
+# tests/test_scaling.py
+"""Leader election and the broker-free filesystem message queue (no database needed)"""
+import json
+import queue
+import threading
+import time
+import pytest
+
+from server.scaling import (AdvisoryLockElection, AlwaysLeader, FileLockElection, election_from_env,
+                            socketio_client_manager, fcntl)
+
+needs_flock = pytest.mark.skipif(fcntl is None, reason='flock is POSIX only')
+
+
+@needs_flock
+def test_file_lock_elects_a_single_leader(tmp_path):
+    path = str(tmp_path / 'alerts.lock')
+    first, second = FileLockElection(path), FileLockElection(path)
+    assert first.acquire()
+    assert first.acquire() # still the leader on the next check
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    assert not first.acquire()
+    second.release()
+
+
+def test_election_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv('ALERT_LEADER_ELECTION', raising=False)
+    assert isinstance(election_from_env(None, False), AlwaysLeader)
+    assert isinstance(election_from_env(None, True), AdvisoryLockElection)
+    monkeypatch.setenv('ALERT_LEADER_ELECTION', 'none')
+    assert isinstance(election_from_env(None, True), AlwaysLeader)
+    if fcntl is not None:
+        monkeypatch.setenv('ALERT_LEADER_ELECTION', f"file:{tmp_path / 'alerts.lock'}")
+        assert isinstance(election_from_env(None, True), FileLockElection)
+
+
+def test_single_process_has_no_message_queue():
+    assert socketio_client_manager(None) is None
+
+
+def test_filesystem_queue_relays_between_workers(tmp_path):
+    pytest.importorskip('socketio')
+    pytest.importorskip('kombu')
+    url = f'filesystem://{tmp_path}'
+    sender, receiver = socketio_client_manager(url), socketio_client_manager(url)
+    received = queue.Queue()
+
+    def listen():
+        for message in receiver._listen():
+            received.put(message)
+
+    threading.Thread(target=listen, daemon=True).start()
+    # The receiver's queue is bound asynchronously: publish until a message gets through
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        sender._publish({'method': 'emit', 'event': 'alert', 'data': {'severity': 'high'}})
+        try:
+            message = received.get(timeout=0.5)
+            break
+        except queue.Empty:
+            continue
+    else:
+        pytest.fail('no message relayed through the filesystem queue')
+    if isinstance(message, (str, bytes)):
+        message = json.loads(message)
+    assert message['event'] == 'alert'
+    # Fanout bindings live with the queue, not in the working directory
+    assert (tmp_path / 'control').is_dir()
@@ -0,0 +1,102 @@
+# tests/test_shelter_allocation.py
+"""Greedy shelter allocation with its repair rounds (no database needed)"""
+from types import SimpleNamespace
+import pytest
+
+try:
+    import numpy as np
+    from server.shelter_allocation import CANDIDATE_SHELTERS, AllocationProblem, allocate
+except ImportError as e: # missing dependencies
+    pytest.skip(f"shelter allocation not importable: {e}", allow_module_level=True)
+
+
+class Result(list):
+    def all(self):
+        return self
+
+
+class FakeSession:
+    """Answers AllocationProblem's zone and shelter queries"""
+
+    def __init__(self, zones, shelters):
+        self.zones = [SimpleNamespace(id=i, zone_name=f'Zone {i}', risk_level=level, lat=lat, lng=lng)
+                      for i, (level, lat, lng) in enumerate(zones, start=1)]
+        self.shelters = [SimpleNamespace(id=100 + i, name=f'Shelter {100 + i}', capacity_overall=capacity, lat=lat, lng=lng)
+                         for i, (capacity, lat, lng) in enumerate(shelters)]
+
+    def execute(self, statement, params=None):
+        return Result(self.zones if 'flood_risk_zones' in str(statement) else self.shelters)
+
+
+def problem(zones, shelters):
+    return AllocationProblem(FakeSession(zones, shelters))
+
+
+def by_pair(result):
+    return {(a['zone_id'], a['shelter_id']): a['people'] for a in result['assignments']}
+
+
+def test_zones_go_to_their_nearest_shelter():
+    p = problem(zones=[('high', 13.00, 80.20), ('extreme', 13.10, 80.30)],
+                shelters=[(100, 13.10, 80.31), (100, 13.00, 80.21)])
+    result = allocate(p, {1: 60, 2: 40})
+    assert by_pair(result) == {(1, 101): 60, (2, 100): 40}
+    assert result['total_unassigned'] == 0
+    assert result['total_person_km'] == pytest.approx(sum(a['people'] * a['distance_km'] for a in result['assignments']))
+
+
+def test_overflow_moves_to_the_next_shelter_and_the_rest_is_unassigned():
+    p = problem(zones=[('high', 13.00, 80.20)], shelters=[(30, 13.00, 80.21), (20, 13.00, 80.25)])
+    result = allocate(p, {1: 70})
+    assert by_pair(result) == {(1, 100): 30, (1, 101): 20}
+    assert result['unassigned'] == [{'zone_id': 1, 'zone_name': 'Zone 1', 'people': 20}]
+    assert [s['assigned'] for s in result['shelters']] == [30, 20]
+
+
+def test_only_the_requested_levels_evacuate():
+    p = problem(zones=[('low', 13.00, 80.20), ('high', 13.01, 80.20)], shelters=[(100, 13.00, 80.21)])
+    assert by_pair(allocate(p, {1: 10, 2: 10})) == {(2, 100): 10}
+    assert by_pair(allocate(p, {1: 10, 2: 10}, levels=('low',))) == {(1, 100): 10}
+
+
+def test_repair_reaches_shelters_beyond_the_candidates():
+    extra = 5
+    shelters = [(1, 13.0, 80.2 + 0.001 * i) for i in range(CANDIDATE_SHELTERS + extra)]
+    p = problem(zones=[('high', 13.0, 80.2)], shelters=shelters)
+    result = allocate(p, {1: CANDIDATE_SHELTERS + extra})
+    assert result['total_assigned'] == CANDIDATE_SHELTERS + extra
+    assert result['total_unassigned'] == 0
+
+
+def test_no_shelters():
+    p = problem(zones=[('high', 13.0, 80.2)], shelters=[])
+    result = allocate(p, {1: 10})
+    assert result['assignments'] == [] and result['total_unassigned'] == 10
+
+
+@pytest.mark.parametrize('seed, shelter_capacity', [(1, (50, 400)), (2, (5, 40)), (3, (200, 2000))])
+def test_invariants_on_random_cities(seed, shelter_capacity):
+    rng = np.random.default_rng(seed)
+    zone_count, shelter_count = 300, 120
+    zones = [(level, lat, lng) for level, lat, lng in zip(
+        rng.choice(['low', 'moderate', 'high', 'extreme'], zone_count),
+        rng.uniform(12.8, 13.3, zone_count), rng.uniform(80.0, 80.4, zone_count))]
+    shelters = list(zip(rng.integers(*shelter_capacity, shelter_count).tolist(),
+                        rng.uniform(12.8, 13.3, shelter_count), rng.uniform(80.0, 80.4, shelter_count)))
+    p = problem(zones, shelters)
+    populations = {zone_id: int(people) for zone_id, people in enumerate(rng.integers(0, 3000, zone_count), start=1)}
+    result = allocate(p, populations)
+
+    evacuating = {i + 1 for i, (level, _, _) in enumerate(zones) if level in ('high', 'extreme')}
+    demand = sum(populations[zone_id] for zone_id in evacuating)
+    capacity = sum(capacity for capacity, _, _ in shelters)
+    per_zone, per_shelter = {}, {}
+    for (zone_id, shelter_id), people in by_pair(result).items():
+        assert zone_id in evacuating and people > 0
+        per_zone[zone_id] = per_zone.get(zone_id, 0) + people
+        per_shelter[shelter_id] = per_shelter.get(shelter_id, 0) + people
+    assert all(per_zone[zone_id] <= populations[zone_id] for zone_id in per_zone)
+    assert all(per_shelter[100 + i] <= capacity for i, (capacity, _, _) in enumerate(shelters) if 100 + i in per_shelter)
+    # Nobody waits while a shelter has room
+    assert result['total_assigned'] == min(demand, capacity)
+    assert result['total_assigned'] + result['total_unassigned'] == demand
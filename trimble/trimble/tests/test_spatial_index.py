@@ -0,0 +1,131 @@
+# tests/test_spatial_index.py
+"""Point-in-zone and nearest-facility lookups and their incremental refresh (no database needed)"""
+import math
+from types import SimpleNamespace
+import pytest
+
+try:
+    import shapely
+    from server.changes import ChangeTracker, row_change
+    from server.spatial_index import SpatialIndex
+except ImportError as e: # missing dependencies
+    pytest.skip(f"spatial index not importable: {e}", allow_module_level=True)
+
+
+class FakeSession:
+    """Answers the index's two SELECTs (optionally filtered by id) from in-memory rows"""
+
+    def __init__(self):
+        self.zones = {}
+        self.facilities = {}
+        self.queries = []
+
+    def add_zone(self, zone_id, name, risk_level, bounds):
+        self.zones[zone_id] = SimpleNamespace(id=zone_id, zone_name=name, risk_level=risk_level,
+                                              wkb=shapely.to_wkb(shapely.box(*bounds)))
+
+    def add_facility(self, facility_id, name, facility_type, lat, lng, status='operational'):
+        self.facilities[facility_id] = SimpleNamespace(id=facility_id, name=name, type=facility_type,
+                                                       status=status, lat=lat, lng=lng)
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.queries.append(sql)
+        rows = self.zones if 'flood_risk_zones' in sql else self.facilities
+        ids = (params or {}).get('ids')
+        return [row for row_id, row in rows.items() if ids is None or row_id in ids]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def setup():
+    session = FakeSession()
+    session.add_zone(1, 'Adyar', 'high', (80.24, 13.00, 80.27, 13.03))
+    session.add_zone(2, 'Mylapore', 'low', (80.26, 13.02, 80.29, 13.05))
+    session.add_facility(10, 'Central Shelter', 'shelter', 13.08, 80.27)
+    session.add_facility(11, 'South Shelter', 'shelter', 13.01, 80.25)
+    session.add_facility(12, 'General Hospital', 'hospital', 13.05, 80.28)
+    session.add_facility(13, 'Closed Shelter', 'shelter', 13.011, 80.251, status='closed')
+    tracker = ChangeTracker()
+    index = SpatialIndex(tracker)
+    index.refresh(session)
+    return session, tracker, index
+
+
+def commit(tracker, table, *ids):
+    """What ChangeTracker does after an ORM commit touching these rows"""
+    tracker.row_subscribers[0]([row_change(table, row_id, 'updated') for row_id in ids])
+    tracker._bump({table})
+
+
+def zone_ids(zones):
+    return sorted(zone['id'] for zone in zones)
+
+
+def test_zones_at(setup):
+    _, _, index = setup
+    assert zone_ids(index.zones_at(13.01, 80.25)) == [1]
+    assert zone_ids(index.zones_at(13.025, 80.265)) == [1, 2]
+    assert index.zones_at(13.2, 80.1) == []
+
+
+def test_zones_for_points_filters_levels(setup):
+    _, _, index = setup
+    found = index.zones_for_points([13.025, 13.04, 13.2], [80.265, 80.28, 80.1], levels={'high', 'extreme'})
+    assert [sorted(zones) for zones in found] == [[1], [], []]
+
+
+def test_nearest_facilities(setup):
+    _, _, index = setup
+    nearest = index.nearest_facilities(13.0, 80.24, k=3)
+    assert [f['id'] for f in nearest] == [11, 12, 10] # the closed shelter is left out
+    assert nearest[0]['distance_km'] == pytest.approx(haversine_km(13.0, 80.24, 13.01, 80.25), abs=0.001)
+    assert [f['id'] for f in index.nearest_facilities(13.0, 80.24, facility_type='hospital')] == [12]
+    assert index.nearest_facilities(13.0, 80.24, facility_type='depot') == []
+
+
+def test_committed_rows_are_patched_in_without_a_rebuild(setup):
+    session, tracker, index = setup
+    session.add_facility(14, 'New Shelter', 'shelter', 13.0, 80.241)
+    session.facilities[11].status = 'closed'
+    session.add_zone(3, 'Besant Nagar', 'extreme', (80.23, 12.99, 80.25, 13.01))
+    commit(tracker, 'emergency_facilities', 11, 14)
+    commit(tracker, 'flood_risk_zones', 3)
+    session.queries.clear()
+    index.refresh(session)
+    assert all('ANY(:ids)' in sql for sql in session.queries)
+    assert [f['id'] for f in index.nearest_facilities(13.0, 80.24, facility_type='shelter')] == [14, 10]
+    assert zone_ids(index.zones_at(13.0, 80.245)) == [1, 3]
+
+
+def test_deleted_rows_disappear(setup):
+    session, tracker, index = setup
+    del session.zones[1]
+    del session.facilities[11]
+    commit(tracker, 'flood_risk_zones', 1)
+    commit(tracker, 'emergency_facilities', 11)
+    index.refresh(session)
+    assert index.zones_at(13.01, 80.25) == []
+    assert 11 not in [f['id'] for f in index.nearest_facilities(13.0, 80.24)]
+
+
+def test_writes_without_row_deltas_rebuild(setup):
+    session, tracker, index = setup
+    session.add_zone(4, 'Imported', 'moderate', (80.0, 13.1, 80.1, 13.2))
+    tracker.bump('flood_risk_zones') # e.g. import-geodata or another worker
+    session.queries.clear()
+    index.refresh(session)
+    assert not any('ANY(:ids)' in sql for sql in session.queries)
+    assert zone_ids(index.zones_at(13.15, 80.05)) == [4]
+
+
+def test_refresh_is_free_when_nothing_changed(setup):
+    session, _, index = setup
+    session.queries.clear()
+    index.refresh(session)
+    assert session.queries == []
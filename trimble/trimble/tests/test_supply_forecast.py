@@ -0,0 +1,132 @@
+# tests/test_supply_forecast.py
+"""Burn rates and time-to-stockout from the quantity log (no database needed)"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+
+try:
+    from server.changes import ChangeTracker
+    from server.supply_forecast import SupplyForecaster, summarize_by_facility
+except ImportError as e: # missing dependencies
+    pytest.skip(f"supply forecaster not importable: {e}", allow_module_level=True)
+
+
+class Result(list):
+    def all(self):
+        return self
+
+
+class FakeSession:
+    """Answers the forecaster's log and item queries from in-memory rows"""
+
+    def __init__(self):
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.items = []
+        self.events = []
+
+    def add_item(self, item_id, quantity, logged_hours_ago, facility_id=1, item_name='Water'):
+        self.items.append(SimpleNamespace(
+            id=item_id, facility_id=facility_id, facility_name=f'Facility {facility_id}', item_name=item_name,
+            quantity_current=quantity, unit='liters', first_logged=self.now - timedelta(hours=logged_hours_ago)
+        ))
+
+    def log(self, event_id, item_id, used, hours_ago):
+        self.events.append(SimpleNamespace(id=event_id, supply_item_id=item_id, used=used,
+                                           changed_at=self.now - timedelta(hours=hours_ago)))
+
+    def execute(self, statement, params=None):
+        if 'quantity_before - quantity_after' in str(statement):
+            return Result(sorted((e for e in self.events if e.changed_at >= params['since']), key=lambda e: e.id))
+        return Result(sorted(self.items, key=lambda item: item.id))
+
+
+def forecast_by_id(forecaster, session):
+    return {item['supply_id']: item for item in forecaster.forecast(session)}
+
+
+@pytest.fixture
+def setup():
+    return FakeSession(), ChangeTracker()
+
+
+def test_shortest_window_with_consumption_sets_the_rate(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=100, logged_hours_ago=48)
+    session.log(1, 1, used=30, hours_ago=20)
+    session.log(2, 1, used=18, hours_ago=2)
+    session.log(3, 1, used=48, hours_ago=30) # only in the 168h window
+    item = forecast_by_id(SupplyForecaster(tracker), session)[1]
+    assert item['burn_rates'] == {'24h': 2.0, '168h': 2.0}
+    assert item['hours_to_stockout'] == pytest.approx(50.0, abs=0.1)
+    assert item['stockout_at'] is not None
+
+
+def test_falls_back_to_the_longer_window(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=36, logged_hours_ago=100)
+    session.log(1, 1, used=72, hours_ago=72)
+    item = forecast_by_id(SupplyForecaster(tracker), session)[1]
+    assert item['burn_rates']['24h'] == 0
+    assert item['burn_rates']['168h'] == pytest.approx(0.72, abs=0.001)
+    assert item['hours_to_stockout'] == pytest.approx(50.0, abs=0.1)
+
+
+def test_new_items_average_over_their_history(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=50, logged_hours_ago=2)
+    session.log(1, 1, used=10, hours_ago=1)
+    item = forecast_by_id(SupplyForecaster(tracker), session)[1]
+    assert item['burn_rates']['24h'] == pytest.approx(5.0, abs=0.01)
+    assert item['hours_to_stockout'] == pytest.approx(10.0, abs=0.1)
+
+
+def test_idle_items_come_last_and_deleted_items_are_ignored(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=10, logged_hours_ago=48)
+    session.add_item(2, quantity=10, logged_hours_ago=48)
+    session.log(1, 2, used=24, hours_ago=1)
+    session.log(2, 99, used=500, hours_ago=1) # item 99 no longer exists
+    items = SupplyForecaster(tracker).forecast(session)
+    assert [item['supply_id'] for item in items] == [2, 1]
+    assert items[1]['hours_to_stockout'] is None and items[1]['stockout_at'] is None
+
+
+def test_late_commits_are_picked_up_once(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=1000, logged_hours_ago=48)
+    session.log(1, 1, used=12, hours_ago=3)
+    session.log(3, 1, used=12, hours_ago=1)
+    forecaster = SupplyForecaster(tracker)
+    assert forecast_by_id(forecaster, session)[1]['burn_rates']['24h'] == pytest.approx(1.0)
+    # id 2 was taken before id 3 but committed after the previous refresh read the log
+    session.log(2, 1, used=24, hours_ago=0.05)
+    assert forecast_by_id(forecaster, session)[1]['burn_rates']['24h'] == pytest.approx(2.0)
+    assert forecast_by_id(forecaster, session)[1]['burn_rates']['24h'] == pytest.approx(2.0)
+    assert sorted(forecaster.event_ids.tolist()) == [1, 2, 3]
+
+
+def test_item_changes_reload_quantities(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=48, logged_hours_ago=48)
+    session.log(1, 1, used=24, hours_ago=1)
+    forecaster = SupplyForecaster(tracker)
+    assert forecast_by_id(forecaster, session)[1]['hours_to_stockout'] == pytest.approx(48.0, abs=0.1)
+    session.items[0].quantity_current = 24
+    tracker.bump('supply_items')
+    assert forecast_by_id(forecaster, session)[1]['hours_to_stockout'] == pytest.approx(24.0, abs=0.1)
+
+
+def test_summarize_by_facility(setup):
+    session, tracker = setup
+    session.add_item(1, quantity=30, logged_hours_ago=48, facility_id=1)
+    session.add_item(2, quantity=30, logged_hours_ago=48, facility_id=1)
+    session.add_item(3, quantity=5, logged_hours_ago=48, facility_id=2, item_name='Rice')
+    session.log(1, 1, used=24, hours_ago=1)
+    session.log(2, 2, used=24, hours_ago=1)
+    groups = summarize_by_facility(SupplyForecaster(tracker).forecast(session))
+    assert groups == [
+        {'facility_id': 1, 'facility_name': 'Facility 1', 'item_name': 'Water', 'quantity_current': 60,
+         'burn_rate': 2.0, 'hours_to_stockout': 30.0},
+        {'facility_id': 2, 'facility_name': 'Facility 2', 'item_name': 'Rice', 'quantity_current': 5,
+         'burn_rate': 0.0, 'hours_to_stockout': None}
+    ]